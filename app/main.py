@@ -59,6 +59,35 @@ app.include_router(cognitive_api.router, prefix="/v8", tags=["v8-cognitive"])
 app.include_router(os_api.router, prefix="/os", tags=["v9-os"])
 
 
+@app.on_event("startup")
+async def start_cache_maintenance():
+    """Bật thread sweep định kỳ của cache (dọn entry hết hạn trong bộ nhớ và trên đĩa)."""
+    from app.services.cache_manager import start_cache_sweeper
+    start_cache_sweeper()
+
+
+@app.on_event("shutdown")
+async def stop_cache_maintenance():
+    """Dừng thread sweep của cache khi app tắt."""
+    from app.services.cache_manager import stop_cache_sweeper
+    stop_cache_sweeper()
+
+
+@app.on_event("startup")
+async def attach_shared_datasets():
+    """Build (worker đầu tiên) hoặc attach các dataset dùng chung khi bật DATASTORM_SHARED_DATASET."""
+    from modules.data_pipeline.shared_dataset import shared_mode_enabled
+    if not shared_mode_enabled():
+        return
+    try:
+        from app.services.data_loader import load_supply_chain_data, load_weather_data
+        # Cùng biến thể mà dashboard đọc (get_cached_data), để request đầu tiên dùng lại được
+        load_supply_chain_data(compact=True)
+        load_weather_data()
+    except Exception as e:
+        print(f"⚠️ Không thể attach shared dataset khi khởi động: {e}")
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Trang chủ, redirect đến dashboard."""
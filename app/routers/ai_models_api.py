@@ -9,35 +9,112 @@ import json
 import random
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
+from app.services.cache_manager import dependencies_changed, record_file_dependency
+from app.services.downsampling import downsample_records
+from modules.data_pipeline import shared_dataset
+from modules.data_pipeline.columnar_store import source_token
 from modules.data_pipeline.global_dataset_loader import (
     DEFAULT_DATASET_PATH,
+    catch_up_global,
+    global_store_build,
     load_global_dataset,
 )
+from modules.data_pipeline.incremental_ingest import Delta, apply_delta, register_delta_listener
 from modules.self_learning.drift_detector import ModelDriftDetector
 
 router = APIRouter()
 
 DATA_CACHE_TS: Optional[datetime] = None
 DATA_CACHE: Optional[pd.DataFrame] = None
+DRIFT_FRAME_CACHE: Dict[str, Tuple[datetime, pd.DataFrame]] = {}
+# Chữ ký của file merged lúc DATA_CACHE / DRIFT_FRAME_CACHE được load
+DATASET_DEPENDENCIES: Dict[str, Any] = {}
+# Store build DATA_CACHE was loaded from (see catch_up_global)
+DATA_CACHE_BUILD: Optional[str] = None
 REQUIRED_DRIFT_COLS = ["Late_delivery_risk", "weather_risk_index", "temp_mean_7d"]
 SAMPLE_DRIFT_FILE = Path(DEFAULT_DATASET_PATH).parents[1] / "sample" / "drift_sample.json"
 
 
+def _catch_up_dataset() -> bool:
+    """Fold in rows another process (the nightly ingest script) appended to the store; False = reload."""
+    if DATA_CACHE is None or shared_dataset.shared_mode_enabled():
+        return False
+    delta = catch_up_global(len(DATA_CACHE), DATA_CACHE_BUILD, str(DEFAULT_DATASET_PATH))
+    if delta is None:
+        return False
+    _apply_global_delta(delta)
+    return True
+
+
+def _drop_caches_if_dataset_changed() -> None:
+    """
+    The merged CSV changed on disk: fold in the rows appended to the store since the
+    load, or drop in-process copies (CSV rewritten) instead of waiting for the TTL.
+    """
+    global DATA_CACHE, DATASET_DEPENDENCIES  # pylint: disable=global-statement
+    if DATASET_DEPENDENCIES and dependencies_changed(DATASET_DEPENDENCIES) and not _catch_up_dataset():
+        DATA_CACHE = None
+        DRIFT_FRAME_CACHE.clear()
+        DATASET_DEPENDENCIES = {}
+    if not DATASET_DEPENDENCIES:
+        DATASET_DEPENDENCIES = record_file_dependency(DEFAULT_DATASET_PATH)
+
+
 def _load_dataset_cached() -> pd.DataFrame:
-    global DATA_CACHE_TS, DATA_CACHE  # pylint: disable=global-statement
+    global DATA_CACHE_TS, DATA_CACHE, DATA_CACHE_BUILD  # pylint: disable=global-statement
+    if shared_dataset.shared_mode_enabled():
+        df = shared_dataset.get_or_build(
+            "global_merged",
+            source_token(DEFAULT_DATASET_PATH),
+            lambda: load_global_dataset(str(DEFAULT_DATASET_PATH)),
+        )
+        # Shallow copy: callers may add columns without touching the shared buffers.
+        return df.copy(deep=False)
+    _drop_caches_if_dataset_changed()
     if DATA_CACHE is None or DATA_CACHE_TS is None or (datetime.utcnow() - DATA_CACHE_TS).seconds > 600:
         DATA_CACHE = load_global_dataset(str(DEFAULT_DATASET_PATH))
+        DATA_CACHE_BUILD = global_store_build(str(DEFAULT_DATASET_PATH))
         DATA_CACHE_TS = datetime.utcnow()
     return DATA_CACHE.copy()
 
 
+def _apply_global_delta(delta: Delta) -> None:
+    """Fold rows ingested into the global dataset into the in-process caches."""
+    global DATA_CACHE, DATASET_DEPENDENCIES  # pylint: disable=global-statement
+    if DATA_CACHE is not None and not shared_dataset.shared_mode_enabled():
+        DATA_CACHE = apply_delta(DATA_CACHE, delta).sort_values("record_date", kind="stable", ignore_index=True)
+    DRIFT_FRAME_CACHE.clear()
+    # The appended bytes are folded in; the CSV's new signature is the one DATA_CACHE reflects
+    DATASET_DEPENDENCIES = record_file_dependency(DEFAULT_DATASET_PATH)
+
+
+register_delta_listener("global_merged", _apply_global_delta)
+
+
+def _load_drift_frame(region: str) -> pd.DataFrame:
+    """Drift columns of one region only; projection and region filter are pushed into the loader."""
+    key = region.upper()
+    _drop_caches_if_dataset_changed()
+    entry = DRIFT_FRAME_CACHE.get(key)
+    if entry is None or (datetime.utcnow() - entry[0]).seconds > 600:
+        columns = ["Region"] + REQUIRED_DRIFT_COLS
+        df = load_global_dataset(
+            str(DEFAULT_DATASET_PATH), columns=columns, filters=[("Region", "==", key)], compact=True
+        )
+        if df.empty:
+            df = load_global_dataset(str(DEFAULT_DATASET_PATH), columns=columns, compact=True)
+        entry = (datetime.utcnow(), df)
+        DRIFT_FRAME_CACHE[key] = entry
+    return entry[1].copy()
+
+
 def _load_drift_sample_defaults() -> Dict[str, float]:
     if SAMPLE_DRIFT_FILE.exists():
         try:
@@ -73,11 +150,8 @@ async def monitoring_drift_check(payload: DriftCheckRequest):
     """
 
     defaults = _load_drift_sample_defaults()
-    df = _load_dataset_cached()
-    df = _ensure_required_columns(df, defaults)
-
-    region_mask = df["Region"].fillna("GLOBAL_OTHER").str.upper() == payload.region.upper()
-    region_df = df[region_mask] if region_mask.any() else df
+    region_df = _load_drift_frame(payload.region)
+    region_df = _ensure_required_columns(region_df, defaults)
 
     user_values = {
         "Late_delivery_risk": payload.late_delivery_risk,
@@ -141,12 +215,15 @@ class DigitalTwinRequest(BaseModel):
     scenario: str = Field("normal", description="Tên kịch bản: normal, demand_surge, weather_storm...")
     duration_days: int = Field(30, ge=1, le=180)
     region: str = "GLOBAL"
+    max_points: int = Field(30, ge=3, le=180, description="Số điểm tối đa của timeline (LTTB)")
 
 
 @router.post("/api/digital-twin/run")
 async def digital_twin_quick_run(payload: DigitalTwinRequest):
     """
     Lightweight simulation summary for the AI dashboard.
+
+    The timeline covers the whole duration, downsampled to ``max_points`` days with LTTB.
     """
 
     scenario_presets = {
@@ -184,7 +261,9 @@ async def digital_twin_quick_run(payload: DigitalTwinRequest):
         "region": payload.region,
         "duration_days": payload.duration_days,
         "recommended_buffer_percent": round(inventory_buffer, 1),
-        "timeline": timeline[:30],
+        "timeline": downsample_records(
+            timeline, [[point["fulfillment_rate"] for point in timeline]], payload.max_points
+        ),
         "key_metrics": {
             "disruption_index": round(base["disruption"], 3),
             "supply_demand_gap": round(base["disruption"] * 0.4, 3),
@@ -4,15 +4,23 @@ Cung cấp các endpoint để hiển thị dashboard và API lấy dữ liệu.
 """
 
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from starlette.templating import Jinja2Templates
 import os
 import sys
+from typing import Optional
 
 # Thêm thư mục app vào path
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
 
-from app.services.data_loader import load_supply_chain_data, load_weather_data
+from app.services.data_loader import (
+    SUPPLY_CHAIN_FILE,
+    catch_up_supply_chain,
+    ingest_supply_chain_appends,
+    load_supply_chain_data,
+    load_weather_data,
+    supply_chain_store_build
+)
 from app.services.analytics import (
     calculate_supply_chain_kpis,
     get_top_products,
@@ -25,7 +33,23 @@ from app.services.analytics import (
     calculate_advanced_metrics,
     analyze_seasonality
 )
-from app.services.cache_manager import clear_cache, invalidate_cache_pattern
+from app.services.aggregate_cube import SOURCE_COLUMNS, AggregateCube, approximate_mode, build_aggregate_cube
+from app.services.cache_manager import (
+    clear_cache,
+    dependencies_changed,
+    frame_dependencies,
+    get_cache_stats,
+    invalidate_cache_pattern,
+    record_file_dependency,
+    render_prometheus
+)
+from app.services.downsampling import DEFAULT_MAX_POINTS, downsample_time_series
+from app.services.filter_index import build_filter_index, filter_rows
+from app.services.join_index import build_join_index
+from app.services.sections import run_blocking, run_sections
+from app.services.serialization import to_records
+from modules.data_pipeline.incremental_ingest import apply_delta, register_delta_listener
+from modules.data_pipeline.shared_dataset import shared_mode_enabled
 import pandas as pd
 
 router = APIRouter()
@@ -36,96 +60,172 @@ templates = Jinja2Templates(directory=templates_dir)
 
 # Cache dữ liệu (có thể cải thiện bằng Redis hoặc cache khác)
 _data_cache = None
+# Chữ ký các file nguồn của _data_cache: file đổi thì nối phần mới hoặc load lại
+_data_cache_dependencies = {}
+# Lần build columnar cache mà frame supply trong _data_cache được load từ đó
+_data_cache_supply_build = None
+
+
+def _catch_up_supply() -> bool:
+    """
+    Nối các dòng mà process khác (script ingest hằng đêm) đã ghi thêm vào columnar cache
+    compact, thay vì load lại toàn bộ. False nếu không nối được (file khác cũng đổi,
+    CSV bị ghi lại, store bị build lại hoặc chưa được ingest).
+    """
+    global _data_cache_dependencies
+    
+    changed = [path for path, signature in _data_cache_dependencies.items()
+               if dependencies_changed({path: signature})]
+    if changed != [os.path.abspath(SUPPLY_CHAIN_FILE)] or shared_mode_enabled():
+        return False
+    delta = catch_up_supply_chain(len(_data_cache['supply']), _data_cache_supply_build, compact=True)
+    if delta is None:
+        return False
+    if delta.empty:
+        _data_cache_dependencies = record_file_dependency(*_data_cache_dependencies)
+    else:
+        _apply_supply_delta(delta)
+    return True
 
 
 def get_cached_data():
-    """Lấy dữ liệu từ cache hoặc load mới."""
-    global _data_cache
+    """Lấy dữ liệu từ cache hoặc load mới (CSV chỉ được ghi thêm thì nối phần mới, còn lại load lại)."""
+    global _data_cache, _data_cache_dependencies, _data_cache_supply_build
+    
+    if _data_cache is not None and dependencies_changed(_data_cache_dependencies) and not _catch_up_supply():
+        _data_cache = None
     
     if _data_cache is None:
         try:
-            supply_df = load_supply_chain_data()
+            # Dạng compact: category cho các cột chuỗi, groupby nhanh hơn và tốn ít RAM hơn
+            supply_df = load_supply_chain_data(compact=True)
             weather_df = load_weather_data()
             _data_cache = {
                 'supply': supply_df,
                 'weather': weather_df
             }
+            _data_cache_dependencies = {**frame_dependencies(supply_df), **frame_dependencies(weather_df)}
+            _data_cache_supply_build = supply_chain_store_build(compact=True)
+            # Dựng sẵn index cho các filter của dashboard và join supply - thời tiết
+            build_filter_index(supply_df)
+            build_join_index(supply_df, weather_df)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Lỗi khi load dữ liệu: {str(e)}")
     
     return _data_cache
 
 
+def _apply_supply_delta(delta):
+    """Nối các dòng mới được ingest vào dữ liệu dashboard đang cache thay vì load lại."""
+    global _data_cache, _data_cache_dependencies
+    
+    if _data_cache is None or delta.variant != 'normalized-compact':
+        return
+    if shared_mode_enabled():
+        # Segment dùng chung được publish lại theo token mới; attach lại ở request sau
+        _data_cache = None
+        return
+    previous = _data_cache['supply']
+    supply = apply_delta(previous, delta)
+    # Cube của dữ liệu mới = cube cũ gộp với cube của các dòng vừa ingest
+    delta_cube = AggregateCube.from_frame(delta.rows.reindex(columns=previous.columns))
+    build_aggregate_cube.cache_put(build_aggregate_cube(previous).merge(delta_cube), supply)
+    _data_cache = {**_data_cache, 'supply': supply}
+    # Phần ghi thêm vào CSV đã được nối vào: cập nhật chữ ký để không load lại
+    _data_cache_dependencies = record_file_dependency(*_data_cache_dependencies)
+
+
+register_delta_listener('supply_chain', _apply_supply_delta)
+
+
+def _filter_options(supply_df: pd.DataFrame) -> dict:
+    """Danh sách countries/categories/trạng thái và khoảng ngày cho bộ lọc (từ các ô của cube)."""
+    cube = build_aggregate_cube(supply_df)
+    date_range = {'min': None, 'max': None}
+    if 'order date (DateOrders)' in supply_df.columns:
+        min_date, max_date = cube.date_bounds()
+        date_range = {
+            'min': min_date.strftime('%Y-%m-%d') if pd.notna(min_date) else None,
+            'max': max_date.strftime('%Y-%m-%d') if pd.notna(max_date) else None
+        }
+    return {
+        'countries': cube.dimension_values('Order Country'),
+        'categories': cube.dimension_values('Category Name'),
+        'delivery_statuses': cube.dimension_values('Delivery Status'),
+        'date_range': date_range
+    }
+
+
+def _dashboard_sections(supply_df: pd.DataFrame, weather_df: pd.DataFrame, names, approximate: bool = False,
+                        max_points: int = DEFAULT_MAX_POINTS):
+    """
+    Các section độc lập của dashboard (tên -> hàm tính), chỉ lấy ``names``; chuỗi thời gian
+    được giảm còn tối đa ``max_points`` điểm (LTTB).
+    """
+    sections = {
+        'kpis': lambda: calculate_supply_chain_kpis(supply_df, approximate=approximate),
+        'top_products': lambda: get_top_products(supply_df, top_n=10, by='Sales'),
+        'top_countries': lambda: get_top_countries(supply_df, top_n=10, by='Sales', approximate=approximate),
+        'time_series': lambda: downsample_time_series(
+            get_time_series_data(supply_df, freq='M', approximate=approximate), max_points
+        ),
+        'weather_stats': lambda: calculate_weather_stats(weather_df),
+        'weather_correlation': lambda: analyze_weather_delivery_correlation(supply_df, weather_df),
+        'advanced_metrics': lambda: calculate_advanced_metrics(supply_df, approximate=approximate),
+        'seasonality': lambda: analyze_seasonality(supply_df),
+        'sample_orders': lambda: get_sample_orders(supply_df, n=50),
+        'filters': lambda: _filter_options(supply_df),
+    }
+    return {name: sections[name] for name in names}
+
+
+# Giá trị của section quá hạn: trang vẫn render, phần đó hiển thị rỗng
+SECTION_DEFAULTS = {
+    'kpis': {},
+    'top_products': [],
+    'top_countries': [],
+    'time_series': {},
+    'weather_stats': {},
+    'weather_correlation': {},
+    'advanced_metrics': {},
+    'seasonality': {},
+    'sample_orders': [],
+    'filters': {'countries': [], 'categories': [], 'delivery_statuses': [], 'date_range': {'min': None, 'max': None}},
+}
+
+
 @router.get("/", response_class=HTMLResponse)
 async def dashboard_page(request: Request):
     """
     Trang dashboard chính.
     Hiển thị KPI, biểu đồ và bảng dữ liệu.
+    
+    Các section được tính song song trên thread pool (``run_sections``), không chặn
+    event loop; section quá hạn được bỏ trống và liệt kê trong ``unavailable_sections``.
+    Chế độ xấp xỉ theo ``approximate_mode()`` (biến môi trường).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        weather_df = data_cache['weather']
-        
-        # Tính toán KPI
-        kpis = calculate_supply_chain_kpis(supply_df)
-        
-        # Top products và countries
-        top_products = get_top_products(supply_df, top_n=10, by='Sales')
-        top_countries = get_top_countries(supply_df, top_n=10, by='Sales')
-        
-        # Time series data
-        time_series = get_time_series_data(supply_df, freq='M')
-        
-        # Delivery status distribution
-        delivery_status_dist = kpis.get('delivery_status_distribution', {})
-        
-        # Weather stats
-        weather_stats = calculate_weather_stats(weather_df)
-        
-        # Weather correlation (nếu có thể)
-        weather_correlation = analyze_weather_delivery_correlation(supply_df, weather_df)
-        
-        # Advanced metrics và seasonality
-        advanced_metrics = calculate_advanced_metrics(supply_df)
-        seasonality = analyze_seasonality(supply_df)
-        
-        # Sample orders
-        sample_orders = get_sample_orders(supply_df, n=50)
-        
-        # Lấy danh sách countries và categories cho filter
-        countries = sorted(supply_df['Order Country'].dropna().unique().tolist()) if 'Order Country' in supply_df.columns else []
-        categories = sorted(supply_df['Category Name'].dropna().unique().tolist()) if 'Category Name' in supply_df.columns else []
-        delivery_statuses = sorted(supply_df['Delivery Status'].dropna().unique().tolist()) if 'Delivery Status' in supply_df.columns else []
-        
-        # Date range
-        if 'order date (DateOrders)' in supply_df.columns:
-            supply_df['order date (DateOrders)'] = pd.to_datetime(supply_df['order date (DateOrders)'], errors='coerce')
-            min_date = supply_df['order date (DateOrders)'].min()
-            max_date = supply_df['order date (DateOrders)'].max()
-            date_range = {
-                'min': min_date.strftime('%Y-%m-%d') if pd.notna(min_date) else None,
-                'max': max_date.strftime('%Y-%m-%d') if pd.notna(max_date) else None
-            }
-        else:
-            date_range = {'min': None, 'max': None}
+        data_cache = await run_blocking(get_cached_data)
+        sections, timed_out = await run_sections(
+            _dashboard_sections(data_cache['supply'], data_cache['weather'], SECTION_DEFAULTS, approximate_mode()),
+            defaults=SECTION_DEFAULTS
+        )
+        kpis = sections['kpis']
         
         context = {
             "request": request,
             "kpis": kpis,
-            "top_products": top_products,
-            "top_countries": top_countries,
-            "time_series": time_series,
-            "delivery_status_dist": delivery_status_dist,
-            "weather_stats": weather_stats,
-            "weather_correlation": weather_correlation,
-            "advanced_metrics": advanced_metrics,
-            "seasonality": seasonality,
-            "sample_orders": sample_orders,
-            "countries": countries,
-            "categories": categories,
-            "delivery_statuses": delivery_statuses,
-            "date_range": date_range
+            "top_products": sections['top_products'],
+            "top_countries": sections['top_countries'],
+            "time_series": sections['time_series'],
+            "delivery_status_dist": kpis.get('delivery_status_distribution', {}),
+            "weather_stats": sections['weather_stats'],
+            "weather_correlation": sections['weather_correlation'],
+            "advanced_metrics": sections['advanced_metrics'],
+            "seasonality": sections['seasonality'],
+            "sample_orders": sections['sample_orders'],
+            **sections['filters'],
+            "unavailable_sections": timed_out
         }
         
         return templates.TemplateResponse("dashboard.html", context)
@@ -135,292 +235,341 @@ async def dashboard_page(request: Request):
 
 
 @router.get("/api/data")
-async def get_dashboard_data():
+async def get_dashboard_data(approximate: Optional[bool] = None, max_points: int = DEFAULT_MAX_POINTS):
     """
     API endpoint trả về dữ liệu JSON cho frontend.
+    ``approximate``: đếm phân biệt/quantile bằng sketch (mặc định theo biến môi trường).
+    ``max_points``: số điểm tối đa mỗi chuỗi thời gian (LTTB; < 3 = giữ nguyên).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        weather_df = data_cache['weather']
-        
-        # Tính toán tất cả metrics
-        kpis = calculate_supply_chain_kpis(supply_df)
-        top_products = get_top_products(supply_df, top_n=10, by='Sales')
-        top_countries = get_top_countries(supply_df, top_n=10, by='Sales')
-        time_series = get_time_series_data(supply_df, freq='M')
-        delivery_status_dist = kpis.get('delivery_status_distribution', {})
-        weather_stats = calculate_weather_stats(weather_df)
-        weather_correlation = analyze_weather_delivery_correlation(supply_df, weather_df)
+        data_cache = await run_blocking(get_cached_data)
+        names = ['kpis', 'top_products', 'top_countries', 'time_series', 'weather_stats', 'weather_correlation']
+        sections, timed_out = await run_sections(
+            _dashboard_sections(
+                data_cache['supply'], data_cache['weather'], names, approximate_mode(approximate), max_points
+            ),
+            defaults=SECTION_DEFAULTS
+        )
         
         return {
-            "kpis": kpis,
-            "top_products": top_products,
-            "top_countries": top_countries,
-            "time_series": time_series,
-            "delivery_status_dist": delivery_status_dist,
-            "weather_stats": weather_stats,
-            "weather_correlation": weather_correlation
+            **sections,
+            "delivery_status_dist": sections['kpis'].get('delivery_status_distribution', {}),
+            "unavailable_sections": timed_out
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy dữ liệu: {str(e)}")
 
 
+def _filtered_data(country, category, delivery_status, start_date, end_date, approximate, max_points):
+    """KPI, top, chuỗi thời gian của các dòng khớp filter (chạy trên pool, ngoài event loop)."""
+    supply_df = get_cached_data()['supply']
+
+    # Chỉ lấy các dòng khớp và các cột analytics cần
+    filtered_df = filter_rows(
+        supply_df, SOURCE_COLUMNS,
+        country=country, category=category, delivery_status=delivery_status,
+        start_date=start_date, end_date=end_date
+    )
+
+    # Tính lại KPI với dữ liệu đã lọc
+    approximate = approximate_mode(approximate)
+    kpis = calculate_supply_chain_kpis(filtered_df, approximate=approximate)
+    top_products = get_top_products(filtered_df, top_n=10, by='Sales')
+    top_countries = get_top_countries(filtered_df, top_n=10, by='Sales', approximate=approximate)
+    time_series = downsample_time_series(
+        get_time_series_data(filtered_df, freq='M', approximate=approximate), max_points
+    )
+    delivery_status_dist = kpis.get('delivery_status_distribution', {})
+
+    return {
+        "kpis": kpis,
+        "top_products": top_products,
+        "top_countries": top_countries,
+        "time_series": time_series,
+        "delivery_status_dist": delivery_status_dist,
+        "filtered_rows": len(filtered_df)
+    }
+
+
 @router.get("/api/filter")
 async def get_filtered_data(
     country: str = None,
     category: str = None,
     delivery_status: str = None,
     start_date: str = None,
-    end_date: str = None
+    end_date: str = None,
+    approximate: Optional[bool] = None,
+    max_points: int = DEFAULT_MAX_POINTS
 ):
     """
     API endpoint để lấy dữ liệu đã lọc.
-    Tối ưu: sử dụng boolean indexing thay vì copy DataFrame.
+    Tối ưu: chọn dòng qua filter index (chỉ duyệt các dòng khớp) thay vì mask cả DataFrame.
+    ``approximate``: đếm phân biệt bằng sketch (mặc định theo biến môi trường).
+    ``max_points``: số điểm tối đa mỗi chuỗi thời gian (LTTB; < 3 = giữ nguyên).
     """
     try:
-        import pandas as pd
-        
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        
-        # Tạo mask để filter (không copy DataFrame)
-        mask = pd.Series([True] * len(supply_df), index=supply_df.index)
-        
-        # Áp dụng filters với boolean indexing
-        if country and 'Order Country' in supply_df.columns:
-            mask = mask & (supply_df['Order Country'] == country)
-        
-        if category and 'Category Name' in supply_df.columns:
-            mask = mask & (supply_df['Category Name'] == category)
-        
-        if delivery_status and 'Delivery Status' in supply_df.columns:
-            mask = mask & (supply_df['Delivery Status'] == delivery_status)
-        
-        if start_date or end_date:
-            if 'order date (DateOrders)' in supply_df.columns:
-                date_col = pd.to_datetime(supply_df['order date (DateOrders)'], errors='coerce')
-                if start_date:
-                    mask = mask & (date_col >= pd.to_datetime(start_date))
-                if end_date:
-                    mask = mask & (date_col <= pd.to_datetime(end_date))
-        
-        # Apply mask (chỉ tạo view, không copy)
-        filtered_df = supply_df[mask]
-        
-        # Tính lại KPI với dữ liệu đã lọc
-        kpis = calculate_supply_chain_kpis(filtered_df)
-        top_products = get_top_products(filtered_df, top_n=10, by='Sales')
-        top_countries = get_top_countries(filtered_df, top_n=10, by='Sales')
-        time_series = get_time_series_data(filtered_df, freq='M')
-        delivery_status_dist = kpis.get('delivery_status_distribution', {})
-        
-        return {
-            "kpis": kpis,
-            "top_products": top_products,
-            "top_countries": top_countries,
-            "time_series": time_series,
-            "delivery_status_dist": delivery_status_dist,
-            "filtered_rows": len(filtered_df)
-        }
-        
+        return await run_blocking(lambda: _filtered_data(
+            country, category, delivery_status, start_date, end_date, approximate, max_points
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi khi lọc dữ liệu: {str(e)}")
+
+
+def _filtered_kpis(country, category, delivery_status, start_date, end_date, approximate):
+    """KPI của các dòng khớp filter."""
+    supply_df = get_cached_data()['supply']
+    filtered_df = filter_rows(
+        supply_df, SOURCE_COLUMNS,
+        country=country, category=category, delivery_status=delivery_status,
+        start_date=start_date, end_date=end_date
+    )
+    return {
+        "kpis": calculate_supply_chain_kpis(filtered_df, approximate=approximate_mode(approximate)),
+        "filtered_rows": len(filtered_df)
+    }
+
+
+@router.get("/api/filter/kpis")
+async def get_filtered_kpis(
+    country: str = None,
+    category: str = None,
+    delivery_status: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    approximate: Optional[bool] = None
+):
+    """
+    API endpoint chỉ trả KPI cho tổ hợp filter (giao các index rồi tổng hợp các dòng khớp).
+    """
+    try:
+        return await run_blocking(lambda: _filtered_kpis(
+            country, category, delivery_status, start_date, end_date, approximate
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lọc dữ liệu: {str(e)}")
 
 
+def _advanced_metrics(approximate):
+    """Advanced metrics và seasonality của toàn bộ dữ liệu."""
+    data_cache = get_cached_data()
+    supply_df = data_cache['supply']
+
+    advanced_metrics = calculate_advanced_metrics(supply_df, approximate=approximate_mode(approximate))
+    seasonality = analyze_seasonality(supply_df)
+
+    return {
+        "advanced_metrics": advanced_metrics,
+        "seasonality": seasonality
+    }
+
+
 @router.get("/api/advanced-metrics")
-async def get_advanced_metrics():
+async def get_advanced_metrics(approximate: Optional[bool] = None):
     """
     API endpoint trả về advanced metrics và seasonality analysis.
+    ``approximate``: đếm khách hàng/độ tập trung doanh thu bằng sketch (mặc định theo biến môi trường).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        
-        advanced_metrics = calculate_advanced_metrics(supply_df)
-        seasonality = analyze_seasonality(supply_df)
-        
-        return {
-            "advanced_metrics": advanced_metrics,
-            "seasonality": seasonality
-        }
+        return await run_blocking(lambda: _advanced_metrics(approximate))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi tính advanced metrics: {str(e)}")
 
 
+def _correlation_matrix():
+    """Ma trận tương quan supply - thời tiết trên các cặp (customer, ngày) khớp."""
+    data_cache = get_cached_data()
+    supply_df = data_cache['supply']
+    weather_df = data_cache['weather']
+
+    # Các cặp (customer, ngày) khớp lấy từ join index dựng sẵn
+    join = build_join_index(supply_df, weather_df)
+    if not join.available:
+        return {"error": "Thiếu cột cần thiết để join"}
+    if len(join) == 0:
+        return {"error": "Không thể join được dữ liệu"}
+
+    # Select numeric columns for correlation
+    numeric_cols = ['Sales', 'Benefit per order', 'Late_delivery_risk',
+                   'Days for shipping (real)', 'Days for shipment (scheduled)']
+    weather_cols = ['temperature_2m_mean', 'precipitation_sum',
+                    'wind_speed_10m_mean', 'relative_humidity_2m_mean']
+    available_cols = [col for col in numeric_cols if col in supply_df.columns] + \
+                     [col for col in weather_cols if col in weather_df.columns]
+
+    if len(available_cols) > 1:
+        corr_matrix = join.aligned(supply_df, weather_df).correlation_matrix(available_cols)
+        return {
+            "correlation_matrix": corr_matrix.to_dict(),
+            "columns": available_cols
+        }
+
+    return {"error": "Không đủ dữ liệu để tính correlation matrix"}
+
+
 @router.get("/api/correlation-matrix")
 async def get_correlation_matrix():
     """
     API endpoint trả về correlation matrix giữa các biến.
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        weather_df = data_cache['weather']
-        
-        # Merge data
-        merged = analyze_weather_delivery_correlation(supply_df, weather_df)
-        if 'error' in merged:
-            return {"error": merged['error']}
-        
-        # Select numeric columns for correlation
-        numeric_cols = ['Sales', 'Benefit per order', 'Late_delivery_risk',
-                       'Days for shipping (real)', 'Days for shipment (scheduled)']
-        
-        # Try to get merged data
-        supply_date_col = 'order date (DateOrders)'
-        supply_customer_col = 'Order Customer Id'
-        weather_date_col = 'order_date'
-        weather_customer_col = 'customer_id'
-        
-        if (supply_date_col in supply_df.columns and 
-            supply_customer_col in supply_df.columns and
-            weather_date_col in weather_df.columns and
-            weather_customer_col in weather_df.columns):
-            
-            supply_df[supply_date_col] = pd.to_datetime(supply_df[supply_date_col], errors='coerce')
-            weather_df[weather_date_col] = pd.to_datetime(weather_df[weather_date_col], errors='coerce')
-            
-            supply_df['order_date_only'] = supply_df[supply_date_col].dt.date
-            weather_df['order_date_only'] = weather_df[weather_date_col].dt.date
-            
-            merged_df = supply_df.merge(
-                weather_df,
-                left_on=[supply_customer_col, 'order_date_only'],
-                right_on=[weather_customer_col, 'order_date_only'],
-                how='inner'
-            )
-            
-            if len(merged_df) > 0:
-                # Calculate correlation matrix
-                corr_cols = numeric_cols + ['temperature_2m_mean', 'precipitation_sum', 
-                                           'wind_speed_10m_mean', 'relative_humidity_2m_mean']
-                available_cols = [col for col in corr_cols if col in merged_df.columns]
-                
-                if len(available_cols) > 1:
-                    corr_matrix = merged_df[available_cols].corr()
-                    return {
-                        "correlation_matrix": corr_matrix.to_dict(),
-                        "columns": available_cols
-                    }
-        
-        return {"error": "Không đủ dữ liệu để tính correlation matrix"}
-        
+        return await run_blocking(_correlation_matrix)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi tính correlation matrix: {str(e)}")
 
 
+def _scatter_data():
+    """Điểm scatter nhiệt độ - giao trễ (tối đa 1000 điểm)."""
+    data_cache = get_cached_data()
+    supply_df = data_cache['supply']
+    weather_df = data_cache['weather']
+
+    # Các cặp (customer, ngày) khớp lấy từ join index dựng sẵn
+    merged = build_join_index(supply_df, weather_df).aligned(supply_df, weather_df)
+
+    if len(merged) > 0 and 'temperature_2m_mean' in weather_df.columns and 'Late_delivery_risk' in supply_df.columns:
+        # Limit to 1000 points for performance (cắt trước khi chuyển sang JSON)
+        scatter_data = merged.frame(['temperature_2m_mean', 'Late_delivery_risk']).dropna().head(1000)
+        scatter_list = to_records(
+            scatter_data, default='float', rename={'temperature_2m_mean': 'x', 'Late_delivery_risk': 'y'}
+        )
+        return {"data": scatter_list}
+
+    return {"data": [], "error": "Không đủ dữ liệu"}
+
+
 @router.get("/api/scatter-data")
 async def get_scatter_data():
     """
     API endpoint trả về dữ liệu cho scatter plot (Temperature vs Late Delivery).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        weather_df = data_cache['weather']
-        
-        # Merge data
-        supply_date_col = 'order date (DateOrders)'
-        supply_customer_col = 'Order Customer Id'
-        weather_date_col = 'order_date'
-        weather_customer_col = 'customer_id'
-        
-        if (supply_date_col in supply_df.columns and 
-            supply_customer_col in supply_df.columns and
-            weather_date_col in weather_df.columns and
-            weather_customer_col in weather_df.columns):
-            
-            supply_df[supply_date_col] = pd.to_datetime(supply_df[supply_date_col], errors='coerce')
-            weather_df[weather_date_col] = pd.to_datetime(weather_df[weather_date_col], errors='coerce')
-            
-            supply_df['order_date_only'] = supply_df[supply_date_col].dt.date
-            weather_df['order_date_only'] = weather_df[weather_date_col].dt.date
-            
-            merged_df = supply_df.merge(
-                weather_df,
-                left_on=[supply_customer_col, 'order_date_only'],
-                right_on=[weather_customer_col, 'order_date_only'],
-                how='inner'
-            )
-            
-            if len(merged_df) > 0 and 'temperature_2m_mean' in merged_df.columns and 'Late_delivery_risk' in merged_df.columns:
-                scatter_data = merged_df[['temperature_2m_mean', 'Late_delivery_risk']].dropna()
-                scatter_list = [
-                    {'x': float(row['temperature_2m_mean']), 'y': float(row['Late_delivery_risk'])}
-                    for _, row in scatter_data.iterrows()
-                ]
-                return {"data": scatter_list[:1000]}  # Limit to 1000 points for performance
-        
-        return {"data": [], "error": "Không đủ dữ liệu"}
-        
+        return await run_blocking(_scatter_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy scatter data: {str(e)}")
 
 
+def _boxplot_data():
+    """Phân bố Sales theo danh mục cho box plot."""
+    data_cache = get_cached_data()
+    supply_df = data_cache['supply']
+
+    if 'Category Name' in supply_df.columns and 'Sales' in supply_df.columns:
+        # Group by category and get sales values
+        categories = supply_df['Category Name'].dropna().unique()[:10]  # Top 10
+        boxplot_data = []
+
+        for category in categories:
+            category_sales = supply_df[supply_df['Category Name'] == category]['Sales'].dropna().tolist()
+            if len(category_sales) > 0:
+                boxplot_data.append({
+                    'category': str(category),
+                    'values': [float(x) for x in category_sales[:100]]  # Limit per category
+                })
+
+        return {"data": boxplot_data}
+
+    return {"data": [], "error": "Không đủ dữ liệu"}
+
+
 @router.get("/api/boxplot-data")
 async def get_boxplot_data():
     """
     API endpoint trả về dữ liệu cho box plot (Sales distribution by category).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        
-        if 'Category Name' in supply_df.columns and 'Sales' in supply_df.columns:
-            # Group by category and get sales values
-            categories = supply_df['Category Name'].dropna().unique()[:10]  # Top 10
-            boxplot_data = []
-            
-            for category in categories:
-                category_sales = supply_df[supply_df['Category Name'] == category]['Sales'].dropna().tolist()
-                if len(category_sales) > 0:
-                    boxplot_data.append({
-                        'category': str(category),
-                        'values': [float(x) for x in category_sales[:100]]  # Limit per category
-                    })
-            
-            return {"data": boxplot_data}
-        
-        return {"data": [], "error": "Không đủ dữ liệu"}
-        
+        return await run_blocking(_boxplot_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy boxplot data: {str(e)}")
 
 
+def _waterfall_data():
+    """Tổng Benefit theo danh mục cho waterfall chart."""
+    data_cache = get_cached_data()
+    supply_df = data_cache['supply']
+
+    if 'Category Name' in supply_df.columns and 'Benefit per order' in supply_df.columns:
+        # Group by category and sum benefit
+        category_benefit = supply_df.groupby('Category Name', observed=True)['Benefit per order'].sum().sort_values(ascending=False).head(10)
+
+        waterfall_data = []
+        cumulative = 0
+
+        for category, benefit in category_benefit.items():
+            waterfall_data.append({
+                'label': str(category),
+                'value': float(benefit),
+                'cumulative': float(cumulative)
+            })
+            cumulative += benefit
+
+        return {"data": waterfall_data}
+
+    return {"data": [], "error": "Không đủ dữ liệu"}
+
+
 @router.get("/api/waterfall-data")
 async def get_waterfall_data():
     """
     API endpoint trả về dữ liệu cho waterfall chart (Profit breakdown).
     """
     try:
-        data_cache = get_cached_data()
-        supply_df = data_cache['supply']
-        
-        if 'Category Name' in supply_df.columns and 'Benefit per order' in supply_df.columns:
-            # Group by category and sum benefit
-            category_benefit = supply_df.groupby('Category Name')['Benefit per order'].sum().sort_values(ascending=False).head(10)
-            
-            waterfall_data = []
-            cumulative = 0
-            
-            for category, benefit in category_benefit.items():
-                waterfall_data.append({
-                    'label': str(category),
-                    'value': float(benefit),
-                    'cumulative': float(cumulative)
-                })
-                cumulative += benefit
-            
-            return {"data": waterfall_data}
-        
-        return {"data": [], "error": "Không đủ dữ liệu"}
-        
+        return await run_blocking(_waterfall_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy waterfall data: {str(e)}")
 
 
+def _ingest_new_orders():
+    """Ingest phần ghi thêm của CSV chuỗi cung ứng và cập nhật dữ liệu đang cache."""
+    global _data_cache
+
+    delta = ingest_supply_chain_appends(compact=True)
+    if delta is None:
+        # Đã build lại toàn bộ: load lại ở request sau
+        _data_cache = None
+        return {"status": "success", "mode": "rebuild", "new_rows": None}
+    return {
+        "status": "success",
+        "mode": "incremental",
+        "new_rows": len(delta.rows),
+        "watermark": delta.watermark
+    }
+
+
+@router.post("/api/data/ingest")
+async def ingest_new_orders():
+    """
+    API endpoint ingest các dòng mới được ghi thêm vào file CSV chuỗi cung ứng (admin function).
+    
+    Chỉ parse phần dữ liệu mới; dữ liệu dashboard đang cache được cập nhật bằng delta.
+    """
+    try:
+        return await run_blocking(_ingest_new_orders)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi khi ingest dữ liệu mới: {str(e)}")
+
+
+@router.get("/cache/stats")
+async def cache_stats(format: str = "json"):
+    """
+    Thống kê cache: tổng quan và theo từng hàm @cached (hit, miss, eviction,
+    histogram thời gian tính, bytes đang giữ, phân bố tuổi entry).
+    
+    ``?format=prometheus`` trả về cùng số liệu theo định dạng text của Prometheus.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format phải là 'json' hoặc 'prometheus'")
+    return get_cache_stats()
+
+
+@router.get("/cache/metrics")
+async def cache_metrics():
+    """Thống kê cache theo từng hàm dạng Prometheus (để scrape)."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @router.post("/api/cache/clear")
 async def clear_data_cache():
     """
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
 
 from engines.digital_twin.core import DigitalTwinEngine
 from engines.digital_twin.state import WarehouseState, TransportState
+from app.services.downsampling import downsample_records
 
 router = APIRouter()
 
@@ -41,6 +42,11 @@ class SimulationRequest(BaseModel):
     transport_routes: List[TransportRouteConfig]
     duration_hours: int = 168  # 1 week
     initial_weather: Optional[Dict[str, Dict[str, float]]] = None
+    max_points: Optional[int] = None  # Số bước tối đa trả về (LTTB); None = mọi bước
+
+
+# Chỉ số theo bước dùng để chọn các bước giữ lại khi giảm điểm
+TIMELINE_METRICS = ['active_orders', 'total_orders', 'delivered_orders', 'late_orders', 'on_time_rate']
 
 
 @router.post("/simulate")
@@ -49,7 +55,8 @@ async def run_simulation(request: SimulationRequest):
     Chạy Digital Twin simulation.
     
     Returns:
-        Simulation results
+        Simulation results (giảm còn tối đa ``max_points`` bước nếu có, ``total_steps``
+        vẫn là số bước đã mô phỏng)
     """
     try:
         engine = DigitalTwinEngine()
@@ -70,12 +77,17 @@ async def run_simulation(request: SimulationRequest):
         
         # Get final state
         final_state = engine.get_state()
+        total_steps = len(results)
+        
+        if request.max_points is not None:
+            columns = [[step['state_summary'][metric] for step in results] for metric in TIMELINE_METRICS]
+            results = downsample_records(results, columns, request.max_points)
         
         return {
             "status": "success",
             "simulation_results": results,
             "final_state": final_state.get_state_summary(),
-            "total_steps": len(results)
+            "total_steps": total_steps
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Simulation error: {str(e)}")
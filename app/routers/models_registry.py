@@ -10,6 +10,8 @@ from fastapi.responses import JSONResponse
 from starlette.templating import Jinja2Templates
 import json
 
+from app.services.cache_manager import cached, record_file_dependency
+
 BASE_DIR = Path(__file__).parent.parent.parent
 REGISTRY_PATH = BASE_DIR / "data" / "model_registry.json"
 templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
@@ -17,7 +19,9 @@ templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templa
 router = APIRouter()
 
 
+@cached(ttl=86400, persist=False)  # Invalidated when model_registry.json changes on disk
 def load_registry() -> List[Dict]:
+    record_file_dependency(REGISTRY_PATH)
     if not REGISTRY_PATH.exists():
         raise FileNotFoundError(f"Registry file not found at {REGISTRY_PATH}")
     try:
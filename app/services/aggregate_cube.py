@@ -0,0 +1,651 @@
+"""
+Cube tổng hợp sẵn (OLAP) phía sau các KPI của dashboard.
+
+Dữ liệu chuỗi cung ứng được gom một lần theo các chiều (quốc gia, danh mục, trạng
+thái giao hàng, phương thức vận chuyển, ngày đặt hàng). Mỗi ô giữ các measure cộng
+được (tổng và số giá trị của Sales, Benefit, ..., số dòng, số dòng giao đúng hạn,
+thời điểm đặt hàng sớm/muộn nhất) cùng các hash phân biệt của Order Id / Customer Id
+để đếm phân biệt chính xác (hợp các tập hash theo nhóm). Các hàm trong ``analytics`` trả lời từ cube
+nên mỗi lần render chỉ duyệt các ô, không duyệt lại các dòng gốc.
+
+Cube gộp được (``merge``): dữ liệu ingest thêm chỉ cần dựng cube cho các dòng mới rồi
+gộp vào cube cũ.
+
+Chuỗi thời gian đọc ``DailyRollup``: tổng và hash đơn hàng theo ngày, dựng cùng cube
+và gộp cùng cube khi ingest; chuỗi theo tuần/tháng/quý gộp các ngày khi được yêu cầu.
+
+Chế độ xấp xỉ (tuỳ chọn, ``approximate=True``): mỗi ô còn giữ HyperLogLog thưa của
+Order Id / Customer Id và histogram bucket log của Sales. Khi truy vấn, các sketch được
+gộp theo nhóm nên chi phí phụ thuộc số ô x kích thước sketch, không phụ thuộc số dòng;
+kết quả kèm ``error_bounds`` (sai số tương đối ~95%).
+"""
+
+import os
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.cache_manager import cached
+from app.services.date_parser import ensure_datetime
+from app.services.kpi_engine import Metric, compute
+from app.services.serialization import to_records
+from app.services.sketches import (
+    hll_estimate,
+    hll_registers,
+    hll_relative_error,
+    log_bucket_index,
+    log_bucket_value
+)
+
+DATE_COLUMN = 'order date (DateOrders)'
+
+# Chiều -> các cột nguồn theo thứ tự ưu tiên
+DIMENSIONS = {
+    'country': ('Order Country', 'Customer Country'),
+    'category': ('Category Name', 'Product Name'),
+    'status': ('Delivery Status',),
+    'shipping_mode': ('Shipping Mode',),
+}
+DAY = 'day'
+CELL_KEYS = list(DIMENSIONS) + [DAY]
+
+# Measure cộng được -> cột nguồn; mỗi measure có cột ``<tên>_sum`` và ``<tên>_count``
+MEASURES = {
+    'sales': 'Sales',
+    'benefit': 'Benefit per order',
+    'profit_ratio': 'Order Item Profit Ratio',
+    'late': 'Late_delivery_risk',
+    'shipping_real': 'Days for shipping (real)',
+    'shipping_scheduled': 'Days for shipment (scheduled)',
+}
+MEASURES_BY_COLUMN = {column: name for name, column in MEASURES.items()}
+
+# Đếm phân biệt -> cột nguồn
+DISTINCT = {
+    'orders': 'Order Id',
+    'customers': 'Customer Id',
+}
+
+# Tổng theo ngày và đếm phân biệt theo ngày của ``DailyRollup`` (phục vụ chuỗi thời gian)
+ROLLUP_TOTALS = ('rows', 'sales_sum', 'late_sum')
+ROLLUP_DISTINCT = ('orders',)
+
+# Mọi cột cube có thể đọc (lấy tập con cột trước khi dựng cube cho một phần dữ liệu)
+SOURCE_COLUMNS = (
+    [column for candidates in DIMENSIONS.values() for column in candidates]
+    + [DATE_COLUMN] + list(MEASURES.values()) + list(DISTINCT.values())
+)
+
+# Chế độ xấp xỉ: bật mặc định qua biến môi trường, hoặc theo từng request
+APPROXIMATE_ENV = "DATASTORM_APPROXIMATE_ANALYTICS"
+# Số bit chọn thanh ghi của HyperLogLog theo ô (2^12 thanh ghi, sai số chuẩn ~1.6%)
+HLL_PRECISION = 12
+# Sai số tương đối của histogram bucket log cho Sales
+SALES_BUCKET_ALPHA = 0.01
+# Số lần sai số chuẩn trong ``error_bounds`` (~95%)
+ERROR_BOUND_Z = 2.0
+
+# Cột sắp xếp của top sản phẩm/quốc gia -> measure trong cube
+TOP_BY = {
+    'Sales': 'sales_sum',
+    'Benefit per order': 'benefit_sum',
+}
+
+
+def _id_hashes(ids: pd.Series) -> np.ndarray:
+    """Hash 64-bit của các id (id số được hash như float để int16/int64 trùng nhau)."""
+    if pd.api.types.is_numeric_dtype(ids.dtype):
+        return pd.util.hash_array(ids.to_numpy(dtype='float64'))
+    return pd.util.hash_array(ids.astype(object).to_numpy())
+
+
+def _distinct_pairs(groups: np.ndarray, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Các cặp (nhóm, hash) phân biệt, sắp theo nhóm rồi theo hash."""
+    order = np.lexsort((hashes, groups))
+    groups, hashes = groups[order], hashes[order]
+    # Sau khi sắp, cặp trùng nằm liền nhau
+    distinct = np.ones(len(groups), dtype=bool)
+    distinct[1:] = (groups[1:] != groups[:-1]) | (hashes[1:] != hashes[:-1])
+    return groups[distinct], hashes[distinct]
+
+
+def approximate_mode(requested: Optional[bool] = None) -> bool:
+    """Chế độ xấp xỉ của một request: theo tham số nếu có, không thì theo ``APPROXIMATE_ENV``."""
+    if requested is not None:
+        return bool(requested)
+    return os.environ.get(APPROXIMATE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _register_maxima(groups: np.ndarray, registers: np.ndarray, rho: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """HLL thưa theo nhóm: các bộ (nhóm, thanh ghi, rho lớn nhất) phân biệt, sắp theo nhóm."""
+    # rho < 64 nên (khoá << 6) | rho sắp theo khoá rồi theo rho; lấy phần tử cuối mỗi khoá
+    combined = np.unique(((groups.astype(np.int64) << HLL_PRECISION) + registers) << 6 | rho.astype(np.int64))
+    keys = combined >> 6
+    last = np.append(keys[1:] != keys[:-1], True) if len(keys) else np.empty(0, dtype=bool)
+    keys, rho = keys[last], (combined[last] & 63).astype(np.uint8)
+    return keys >> HLL_PRECISION, keys & ((1 << HLL_PRECISION) - 1), rho
+
+
+def _bucket_totals(groups: np.ndarray, buckets: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Histogram thưa theo nhóm: các bộ (nhóm, bucket, tổng số đếm) phân biệt."""
+    totals = pd.DataFrame({'group': groups, 'bucket': buckets, 'count': counts}).groupby(
+        ['group', 'bucket'], sort=True
+    )['count'].sum()
+    return (totals.index.get_level_values('group').to_numpy(), totals.index.get_level_values('bucket').to_numpy(),
+            totals.to_numpy())
+
+
+def _rows_within_share(values: np.ndarray, counts: np.ndarray, share: float) -> int:
+    """
+    Số dòng (giá trị sắp giảm dần) có tổng tích luỹ <= ``share`` * tổng, tính từ bảng
+    giá trị -> số lần xuất hiện thay vì sắp xếp từng dòng.
+    """
+    order = np.argsort(-values, kind='stable')
+    values, counts = values[order], counts[order].astype('float64')
+    target = share * float((values * counts).sum())
+    before = np.concatenate([[0.0], np.cumsum(values * counts)[:-1]])
+    fits = np.zeros(len(values))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (target - before) / values
+    positive, negative = values > 0, values < 0
+    fits[positive] = np.clip(np.floor(ratio[positive]), 0, counts[positive])
+    zero = values == 0
+    fits[zero] = np.where(before[zero] <= target, counts[zero], 0)
+    # Giá trị âm: tổng tích luỹ giảm dần, các dòng từ vị trí ceil(ratio) trở đi thoả mãn
+    first = np.maximum(np.ceil(ratio[negative]), 1)
+    fits[negative] = np.clip(counts[negative] - first + 1, 0, counts[negative])
+    return int(fits.sum())
+
+
+
+def _distinct_group_counts(groups: np.ndarray, hashes: np.ndarray, n_groups: int) -> np.ndarray:
+    """Số hash phân biệt (chính xác) theo nhóm từ các cặp (nhóm, hash); nhóm -1 bị bỏ qua."""
+    keep = groups >= 0
+    groups, _ = _distinct_pairs(groups[keep], hashes[keep])
+    return np.bincount(groups, minlength=n_groups).astype('int64')
+
+
+def _hll_group_counts(groups: np.ndarray, registers: np.ndarray, rho: np.ndarray, n_groups: int) -> np.ndarray:
+    """Ước lượng HyperLogLog theo nhóm từ các bộ (nhóm, thanh ghi, rho); nhóm -1 bị bỏ qua."""
+    if not n_groups:
+        return np.empty(0, dtype='int64')
+    keep = groups >= 0
+    m = 1 << HLL_PRECISION
+    matrix = np.zeros((n_groups, m), dtype=np.uint8)
+    np.maximum.at(matrix.reshape(-1), groups[keep] * m + registers[keep], rho[keep])
+    return hll_estimate(matrix)
+
+
+class DailyRollup:
+    """
+    Tổng theo ngày của cube (số dòng, tổng Sales, số dòng trễ hạn) cùng hash Order Id phân
+    biệt và HyperLogLog theo ngày.
+
+    Dựng một lần từ các ô khi dựng cube và gộp cùng cube (``merge``) khi ingest thêm
+    dữ liệu. Chuỗi theo tuần/tháng/quý gộp các ngày (vài nghìn dòng) thay vì các ô.
+    """
+
+    def __init__(self, days: np.ndarray, totals: Dict[str, np.ndarray],
+                 distinct: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 approx: Dict[str, Tuple[np.ndarray, ...]]):
+        self.days = days  # datetime64[ns] tăng dần, không trùng
+        self.totals = totals  # cột -> mảng theo ngày
+        self.distinct = distinct  # tên -> (ngày, hash) như ``AggregateCube.distinct``
+        self.approx = approx  # tên -> (ngày, thanh ghi, rho)
+
+    @classmethod
+    def from_cells(cls, cells: pd.DataFrame, distinct: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                   approx: Dict[str, Tuple[np.ndarray, ...]]) -> 'DailyRollup':
+        """Gom các ô (và sketch theo ô) của cube theo ngày."""
+        day_values = cells[DAY].to_numpy(dtype='datetime64[ns]')
+        dated = ~np.isnat(day_values)
+        days, day_codes = np.unique(day_values[dated], return_inverse=True)
+        labels = np.full(len(cells), -1, dtype='int64')
+        labels[dated] = day_codes
+        totals = {
+            column: np.bincount(day_codes, weights=cells[column].to_numpy(dtype='float64')[dated], minlength=len(days))
+            for column in ROLLUP_TOTALS if column in cells.columns
+        }
+        rollup_distinct, rollup_approx = {}, {}
+        for name in ROLLUP_DISTINCT:
+            if name in distinct:
+                cell_ids, hashes = distinct[name]
+                groups = labels[cell_ids]
+                keep = groups >= 0
+                rollup_distinct[name] = _distinct_pairs(groups[keep], hashes[keep])
+            if name in approx:
+                cell_ids, registers, rho = approx[name]
+                groups = labels[cell_ids]
+                keep = groups >= 0
+                rollup_approx[name] = _register_maxima(groups[keep], registers[keep], rho[keep])
+        return cls(days, totals, rollup_distinct, rollup_approx)
+
+    def merge(self, other: 'DailyRollup') -> 'DailyRollup':
+        """Rollup của hợp hai phần dữ liệu (không sửa rollup hiện tại)."""
+        days = np.union1d(self.days, other.days)
+        parts = [(rollup, np.searchsorted(days, rollup.days)) for rollup in (self, other)]
+        totals = {}
+        for column in ROLLUP_TOTALS:
+            present = [(rollup.totals[column], positions) for rollup, positions in parts if column in rollup.totals]
+            if present:
+                totals[column] = sum(np.bincount(positions, weights=values, minlength=len(days))
+                                     for values, positions in present)
+        distinct, approx = {}, {}
+        for name in ROLLUP_DISTINCT:
+            present = [(rollup.distinct[name], positions) for rollup, positions in parts if name in rollup.distinct]
+            if present:
+                distinct[name] = _distinct_pairs(
+                    np.concatenate([positions[sketch[0]] for sketch, positions in present]),
+                    np.concatenate([sketch[1] for sketch, _ in present]),
+                )
+            present = [(rollup.approx[name], positions) for rollup, positions in parts if name in rollup.approx]
+            if present:
+                approx[name] = _register_maxima(
+                    np.concatenate([positions[sketch[0]] for sketch, positions in present]),
+                    *(np.concatenate([sketch[i] for sketch, _ in present]) for i in (1, 2)),
+                )
+        return DailyRollup(days, totals, distinct, approx)
+
+    def periods(self, freq: str) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """Các kỳ ``freq`` phủ khoảng ngày (kể cả kỳ trống) và kỳ của từng ngày."""
+        # Các ngày đã sắp: resample số ngày mỗi kỳ rồi lặp chỉ số kỳ theo số đó
+        per_period = pd.Series(1, index=pd.DatetimeIndex(self.days)).resample(freq).count()
+        labels = np.repeat(np.arange(len(per_period), dtype='int64'), per_period.to_numpy())
+        return per_period.index, labels
+
+    def period_totals(self, column: str, labels: np.ndarray, n_periods: int) -> np.ndarray:
+        return np.bincount(labels, weights=self.totals[column], minlength=n_periods)
+
+    def distinct_counts(self, name: str, labels: np.ndarray, n_periods: int, approximate: bool = False) -> np.ndarray:
+        """Số giá trị phân biệt của ``name`` mỗi kỳ (``labels[i]`` là kỳ của ngày i)."""
+        if approximate and name in self.approx:
+            day_ids, registers, rho = self.approx[name]
+            return _hll_group_counts(labels[day_ids], registers, rho, n_periods)
+        day_ids, hashes = self.distinct[name]
+        return _distinct_group_counts(labels[day_ids], hashes, n_periods)
+
+
+class AggregateCube:
+    """
+    Các ô tổng hợp (một dòng mỗi tổ hợp chiều) và hash phân biệt theo ô.
+
+    ``sources`` ghi cột nguồn của từng chiều/measure/đếm phân biệt (None nếu dataset
+    không có cột đó); các truy vấn bỏ qua phần tương ứng giống như khi tính trên dòng.
+    """
+
+    def __init__(self, cells: pd.DataFrame, distinct: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 sources: Dict[str, Optional[str]], sales_values: Optional[pd.Series],
+                 approx: Optional[Dict[str, Tuple[np.ndarray, ...]]] = None,
+                 daily: Optional[DailyRollup] = None):
+        self.cells = cells
+        self.distinct = distinct
+        self.sources = sources
+        self.sales_values = sales_values
+        # Sketch theo ô của chế độ xấp xỉ: tên -> (ô, thanh ghi, rho) hoặc 'sales' -> (ô, bucket, số đếm)
+        self.approx = approx or {}
+        # Rollup theo ngày cho chuỗi thời gian: dựng từ các ô nếu không được truyền vào (``merge`` truyền bản đã gộp)
+        self.daily = daily if daily is not None else DailyRollup.from_cells(cells, distinct, self.approx)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'AggregateCube':
+        """Dựng cube từ DataFrame chuỗi cung ứng (một lần duyệt các dòng)."""
+        sources: Dict[str, Optional[str]] = {}
+        data = {}
+        for dim, candidates in DIMENSIONS.items():
+            column = next((c for c in candidates if c in df.columns), None)
+            sources[dim] = column
+            # Giữ kiểu category của frame compact: groupby trên mã category nhanh hơn
+            data[dim] = df[column].reset_index(drop=True) if column else np.full(len(df), np.nan, dtype=object)
+        if DATE_COLUMN in df.columns:
+            dates = ensure_datetime(df, DATE_COLUMN)
+            sources[DAY] = DATE_COLUMN
+        else:
+            dates = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+            sources[DAY] = None
+        data[DAY] = dates.dt.normalize().to_numpy()
+        data['date'] = dates.to_numpy()
+        for name, column in MEASURES.items():
+            sources[name] = column if column in df.columns else None
+            if sources[name]:
+                data[name] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        if sources['shipping_real'] and sources['shipping_scheduled']:
+            data['on_time'] = (data['shipping_real'] <= data['shipping_scheduled']).astype('int64')
+        cells, codes = cls._aggregate(pd.DataFrame(data), sources)
+
+        distinct, approx = {}, {}
+        for name, column in DISTINCT.items():
+            sources[name] = column if column in df.columns else None
+            if sources[name]:
+                valid = df[column].notna().to_numpy()
+                hashes = _id_hashes(df[column][valid])
+                distinct[name] = _distinct_pairs(codes[valid], hashes)
+                approx[name] = _register_maxima(codes[valid], *hll_registers(hashes, HLL_PRECISION))
+
+        sales_values = None
+        if sources['sales']:
+            sales_values = pd.Series(data['sales']).value_counts(dropna=True)
+            valid = ~np.isnan(data['sales'])
+            approx['sales'] = _bucket_totals(
+                codes[valid], log_bucket_index(data['sales'][valid], SALES_BUCKET_ALPHA), np.ones(valid.sum(), np.int64)
+            )
+        return cls(cells, distinct, sources, sales_values, approx)
+
+    @staticmethod
+    def _cell_metrics(columns, sources: Dict[str, Optional[str]]) -> List[Metric]:
+        """Metric của một ô: từ các dòng (cột measure thô) hoặc từ các ô (cột ``rows``, ``*_sum``, ...)."""
+        by = tuple(CELL_KEYS)
+        from_cells = 'rows' in columns
+        metrics = [Metric('rows', 'sum', 'rows', by) if from_cells else Metric('rows', 'size', by=by)]
+        for name in MEASURES:
+            if not sources[name]:
+                continue
+            if from_cells:
+                metrics.append(Metric(f'{name}_sum', 'sum', f'{name}_sum', by))
+                metrics.append(Metric(f'{name}_count', 'sum', f'{name}_count', by))
+            else:
+                metrics.append(Metric(f'{name}_sum', 'sum', name, by))
+                metrics.append(Metric(f'{name}_count', 'count', name, by))
+        if 'on_time' in columns:
+            metrics.append(Metric('on_time', 'sum', 'on_time', by))
+        metrics.append(Metric('date_min', 'min', 'date_min' if from_cells else 'date', by))
+        metrics.append(Metric('date_max', 'max', 'date_max' if from_cells else 'date', by))
+        return metrics
+
+    @classmethod
+    def _aggregate(cls, frame: pd.DataFrame, sources: Dict[str, Optional[str]]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Gom ``frame`` (dòng hoặc ô) theo ô trong một lần duyệt; trả về các ô và mã ô của từng dòng."""
+        result = compute(frame, cls._cell_metrics(frame.columns, sources))
+        return result.table(CELL_KEYS), result.codes[tuple(CELL_KEYS)]
+
+    def merge(self, other: 'AggregateCube') -> 'AggregateCube':
+        """Cube của hợp hai phần dữ liệu (không sửa cube hiện tại)."""
+        sources = {name: self.sources.get(name) or other.sources.get(name) for name in self.sources}
+        merged, codes = self._aggregate(pd.concat([self.cells, other.cells], ignore_index=True), sources)
+
+        distinct = {}
+        for name in DISTINCT:
+            groups, hashes = [], []
+            for cube, offset in ((self, 0), (other, len(self.cells))):
+                if name in cube.distinct:
+                    cell_ids, cube_hashes = cube.distinct[name]
+                    groups.append(codes[cell_ids + offset])
+                    hashes.append(cube_hashes)
+            if groups:
+                distinct[name] = _distinct_pairs(np.concatenate(groups), np.concatenate(hashes))
+
+        sales_values = self.sales_values
+        if other.sales_values is not None:
+            sales_values = other.sales_values if sales_values is None else sales_values.add(
+                other.sales_values, fill_value=0
+            )
+
+        approx = {}
+        for name in list(DISTINCT) + ['sales']:
+            parts = [(cube.approx[name], offset) for cube, offset in ((self, 0), (other, len(self.cells)))
+                     if name in cube.approx]
+            if not parts:
+                continue
+            cell_ids = np.concatenate([codes[part[0] + offset] for part, offset in parts])
+            first, second = (np.concatenate([part[i] for part, _ in parts]) for i in (1, 2))
+            combine = _bucket_totals if name == 'sales' else _register_maxima
+            approx[name] = combine(cell_ids, first, second)
+        return AggregateCube(merged, distinct, sources, sales_values, approx, self.daily.merge(other.daily))
+
+    @property
+    def total_rows(self) -> int:
+        return int(self.cells['rows'].sum())
+
+    def _mean(self, name: str, cells: Optional[pd.DataFrame] = None) -> float:
+        cells = self.cells if cells is None else cells
+        count = cells[f'{name}_count'].sum()
+        return float(cells[f'{name}_sum'].sum() / count) if count else float('nan')
+
+    def distinct_counts(self, name: str, labels: np.ndarray, n_groups: int, approximate: bool = False) -> np.ndarray:
+        """
+        Số giá trị phân biệt của ``name`` theo nhóm: ``labels[i]`` là nhóm của ô i
+        (-1 = bỏ qua ô đó). ``approximate`` gộp HyperLogLog của các ô thay vì hợp các tập hash.
+        """
+        if approximate and name in self.approx:
+            cell_ids, registers, rho = self.approx[name]
+            return _hll_group_counts(labels[cell_ids], registers, rho, n_groups)
+        cell_ids, hashes = self.distinct[name]
+        return _distinct_group_counts(labels[cell_ids], hashes, n_groups)
+
+    def distinct_total(self, name: str, approximate: bool = False) -> int:
+        return int(self.distinct_counts(name, np.zeros(len(self.cells), dtype='int64'), 1, approximate)[0])
+
+    def error_bound(self, name: str) -> Optional[float]:
+        """
+        Sai số tương đối của chế độ xấp xỉ: đếm phân biệt ``name`` (~95%, theo sai số
+        chuẩn của HyperLogLog) hoặc 'sales' (sai số tối đa của giá trị Sales theo bucket).
+        """
+        if name not in self.approx:
+            return None
+        if name == 'sales':
+            return SALES_BUCKET_ALPHA
+        return float(ERROR_BOUND_Z * hll_relative_error(HLL_PRECISION))
+
+    def dimension_values(self, column: str) -> List:
+        """Các giá trị (đã sắp) của chiều lấy từ cột ``column``; [] nếu không có chiều đó."""
+        for dim in DIMENSIONS:
+            if self.sources[dim] == column:
+                return sorted(self.cells[dim].dropna().unique().tolist())
+        return []
+
+    def date_bounds(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        return self.cells['date_min'].min(), self.cells['date_max'].max()
+
+    def kpis(self, approximate: bool = False) -> Dict:
+        """
+        Như ``analytics.calculate_supply_chain_kpis`` trên các dòng gốc; ``approximate``
+        đếm đơn bằng HyperLogLog và thêm ``error_bounds``.
+        """
+        cells = self.cells
+        rows = self.total_rows
+        kpis = {}
+
+        if self.sources['sales']:
+            kpis['total_sales'] = float(cells['sales_sum'].sum())
+            kpis['avg_sales_per_order'] = self._mean('sales')
+
+        if self.sources['benefit']:
+            kpis['total_benefit'] = float(cells['benefit_sum'].sum())
+            kpis['avg_benefit_per_order'] = self._mean('benefit')
+
+        if self.sources['profit_ratio']:
+            kpis['avg_profit_ratio'] = self._mean('profit_ratio')
+
+        if 'orders' in self.distinct:
+            kpis['total_orders'] = self.distinct_total('orders', approximate)
+            kpis['total_order_items'] = rows
+
+        if self.sources['late']:
+            late_count = int(cells['late_sum'].sum())
+            kpis['late_delivery_count'] = late_count
+            kpis['late_delivery_rate'] = float((late_count / rows * 100) if rows > 0 else 0)
+            kpis['on_time_delivery_rate'] = float(100 - kpis['late_delivery_rate'])
+
+        if self.sources['status']:
+            distribution = cells.groupby('status', observed=True)['rows'].sum().sort_values(ascending=False)
+            kpis['delivery_status_distribution'] = {str(k): int(v) for k, v in distribution.items() if v > 0}
+
+        if self.sources['shipping_real']:
+            kpis['avg_shipping_days'] = self._mean('shipping_real')
+            kpis['avg_scheduled_days'] = self._mean('shipping_scheduled') if self.sources['shipping_scheduled'] else None
+
+        if approximate and 'orders' in self.approx:
+            kpis['error_bounds'] = {'total_orders': self.error_bound('orders')}
+
+        return kpis
+
+    def top_categories(self, top_n: int = 10, by: str = 'Sales') -> Optional[List[Dict]]:
+        """Như ``analytics.get_top_products``; None nếu ``by`` không phải measure của cube."""
+        if by not in TOP_BY:
+            return None
+        if not self.sources[MEASURES_BY_COLUMN[by]] or not self.sources['category']:
+            return []
+        totals = self._totals_by('category')
+        totals = totals.sort_values(by=TOP_BY[by], ascending=False).head(top_n)
+        response = pd.DataFrame({
+            'category': totals.index,
+            'sales': totals.get('sales_sum', 0.0),
+            'benefit': totals.get('benefit_sum', 0.0),
+            'value': totals[TOP_BY[by]],
+        })
+        return to_records(response, {'category': 'str'}, default='float')
+
+    def top_countries(self, top_n: int = 10, by: str = 'Sales', approximate: bool = False) -> List[Dict]:
+        """
+        Như ``analytics.get_top_countries`` (``by``: 'Sales', 'Benefit per order', 'orders');
+        ``approximate`` đếm đơn bằng HyperLogLog và thêm ``error_bounds`` vào mỗi quốc gia.
+        """
+        if not self.sources['country']:
+            return []
+        totals = self._totals_by('country')
+        if 'orders' in self.distinct:
+            codes, uniques = pd.factorize(self.cells['country'])
+            orders = self.distinct_counts('orders', codes, len(uniques), approximate)
+            totals['orders'] = pd.Series(orders, index=uniques).reindex(totals.index).fillna(0).astype('int64')
+
+        if by in ('orders', 'Order Id') and 'orders' in totals.columns:
+            sort_col = 'orders'
+        elif by in TOP_BY and TOP_BY[by] in totals.columns:
+            sort_col = TOP_BY[by]
+        else:
+            return []
+        totals = totals.sort_values(by=sort_col, ascending=False).head(top_n)
+        response = pd.DataFrame({
+            'country': totals.index,
+            'sales': totals.get('sales_sum', 0.0),
+            'benefit': totals.get('benefit_sum', 0.0),
+            'orders': totals.get('orders', 0),
+            'value': totals[sort_col],
+        })
+        records = to_records(response, {'country': 'str', 'orders': 'int'}, default='float')
+        if approximate and 'orders' in self.approx:
+            for record in records:
+                record['error_bounds'] = {'orders': self.error_bound('orders')}
+        return records
+
+    def _totals_by(self, dim: str) -> pd.DataFrame:
+        columns = [c for c in ('sales_sum', 'benefit_sum') if c in self.cells.columns]
+        return self.cells.groupby(dim, observed=True)[columns].sum()
+
+    def time_series(self, freq: str = 'M', approximate: bool = False) -> Optional[Dict]:
+        """
+        Như ``analytics.get_time_series_data``; None nếu ``freq`` mịn hơn một ngày
+        (cube gom theo ngày nên không trả lời được). ``approximate`` đếm đơn mỗi kỳ bằng
+        HyperLogLog và thêm ``error_bounds``.
+        """
+        offset = pd.tseries.frequencies.to_offset(freq)
+        if isinstance(offset, pd.offsets.Tick) and offset.nanos < pd.Timedelta(days=1).value:
+            return None
+        # Gộp rollup theo ngày (dựng sẵn, cập nhật khi ingest) theo kỳ thay vì duyệt các ô
+        daily = self.daily
+        if not self.sources[DAY] or len(daily.days) == 0:
+            return {}
+        periods, labels = daily.periods(freq)
+        n_periods = len(periods)
+
+        time_series = {}
+        if self.sources['sales']:
+            sales = daily.period_totals('sales_sum', labels, n_periods)
+            time_series['sales'] = {str(k): float(v) for k, v in zip(periods, sales)}
+
+        if self.sources['late']:
+            rows, late = daily.period_totals('rows', labels, n_periods), daily.period_totals('late_sum', labels, n_periods)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.where(rows > 0, late / rows * 100, 0.0)
+            time_series['late_delivery_rate'] = {str(k): float(v) for k, v in zip(periods, rate)}
+
+        if 'orders' in daily.distinct:
+            orders = daily.distinct_counts('orders', labels, n_periods, approximate)
+            time_series['orders_count'] = {str(k): int(v) for k, v in zip(periods, orders)}
+            if approximate and 'orders' in daily.approx:
+                time_series['error_bounds'] = {'orders_count': self.error_bound('orders')}
+
+        return time_series
+
+    def advanced_metrics(self, approximate: bool = False) -> Dict:
+        """
+        Như ``analytics.calculate_advanced_metrics`` trên các dòng gốc; ``approximate`` đếm
+        khách hàng bằng HyperLogLog, tính độ tập trung doanh thu từ histogram bucket log
+        của Sales và thêm ``error_bounds``.
+        """
+        cells = self.cells
+        rows = self.total_rows
+        metrics = {}
+        error_bounds = {}
+
+        if 'customers' in self.distinct:
+            customers = self.distinct_total('customers', approximate)
+            metrics['unique_customers'] = customers
+            metrics['avg_orders_per_customer'] = float(rows / customers) if customers > 0 else 0
+            if approximate and 'customers' in self.approx:
+                error_bounds['unique_customers'] = error_bounds['avg_orders_per_customer'] = self.error_bound('customers')
+
+        if self.sources['category'] == 'Category Name':
+            categories = int(cells['category'].nunique())
+            metrics['unique_categories'] = categories
+            metrics['category_diversity'] = float(categories / rows * 100) if rows > 0 else 0
+
+        if self.sources[DAY]:
+            first, last = self.date_bounds()
+            date_range = (last - first).days if pd.notna(first) and pd.notna(last) else 0
+            metrics['data_span_days'] = int(date_range)
+            metrics['avg_orders_per_day'] = float(rows / date_range) if date_range > 0 else 0
+
+        if 'on_time' in cells.columns:
+            on_time = int(cells['on_time'].sum())
+            metrics['on_time_delivery_count'] = on_time
+            metrics['on_time_delivery_rate'] = float((on_time / rows * 100) if rows > 0 else 0)
+
+        if self.sales_values is not None and cells['sales_sum'].sum() > 0:
+            if approximate and 'sales' in self.approx:
+                _, buckets, counts = self.approx['sales']
+                buckets, inverse = np.unique(buckets, return_inverse=True)
+                values, counts = log_bucket_value(buckets, SALES_BUCKET_ALPHA), np.bincount(inverse, weights=counts)
+                error_bounds['revenue_concentration_p80'] = self.error_bound('sales')
+            else:
+                values, counts = self.sales_values.index.to_numpy(dtype='float64'), self.sales_values.to_numpy()
+            p80_orders = _rows_within_share(values, counts, 0.8)
+            metrics['revenue_concentration_p80'] = float((p80_orders / rows * 100) if rows > 0 else 0)
+
+        if approximate and error_bounds:
+            metrics['error_bounds'] = error_bounds
+
+        return metrics
+
+    def seasonality(self) -> Dict:
+        """Như ``analytics.analyze_seasonality`` trên các dòng gốc."""
+        if not self.sources[DAY]:
+            return {}
+        dated = self.cells[self.cells[DAY].notna()]
+        if dated.empty or not self.sources['sales']:
+            return {}
+
+        days = pd.DatetimeIndex(dated[DAY])
+        sales = dated['sales_sum'].set_axis(days)
+        seasonality = {}
+
+        monthly_sales = sales.groupby(days.month).sum()
+        seasonality['monthly_sales'] = {int(k): float(v) for k, v in monthly_sales.items()}
+        seasonality['best_month'] = int(monthly_sales.idxmax()) if len(monthly_sales) > 0 else None
+        seasonality['worst_month'] = int(monthly_sales.idxmin()) if len(monthly_sales) > 0 else None
+
+        dow_sales = sales.groupby(days.dayofweek).sum()
+        seasonality['day_of_week_sales'] = {int(k): float(v) for k, v in dow_sales.items()}
+        seasonality['best_day'] = int(dow_sales.idxmax()) if len(dow_sales) > 0 else None
+
+        quarterly_sales = sales.groupby(days.quarter).sum()
+        seasonality['quarterly_sales'] = {int(k): float(v) for k, v in quarterly_sales.items()}
+
+        return seasonality
+
+
+@cached(ttl=86400)  # Cube của một frame (theo token) không đổi; file nguồn đổi thì bị huỷ theo
+def build_aggregate_cube(df: pd.DataFrame) -> AggregateCube:
+    """Cube tổng hợp của ``df`` (dựng một lần cho mỗi phiên bản dữ liệu)."""
+    return AggregateCube.from_frame(df)
@@ -6,8 +6,12 @@ Tính toán các thống kê mô tả, KPI kinh doanh, và phân tích tương q
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional
-from datetime import datetime
+from app.services.aggregate_cube import build_aggregate_cube
 from app.services.cache_manager import cached
+from app.services.date_parser import ensure_datetime, parse_dates
+from app.services.join_index import build_join_index
+from app.services.kpi_engine import Metric, compute
+from app.services.serialization import largest_positions, to_records
 
 
 def calculate_descriptive_stats(df: pd.DataFrame) -> Dict:
@@ -20,72 +24,40 @@ def calculate_descriptive_stats(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary chứa các thống kê
     """
+    # Số ô thiếu của mọi cột trong một lần duyệt
+    result = compute(df, [Metric(col, 'missing', col) for col in df.columns])
+    missing = pd.Series({col: result[col] for col in df.columns}, dtype='int64')
     stats = {
         'total_records': len(df),
         'total_columns': len(df.columns),
-        'missing_values_count': df.isnull().sum().to_dict(),
-        'missing_values_percentage': (df.isnull().sum() / len(df) * 100).round(2).to_dict()
+        'missing_values_count': missing.to_dict(),
+        'missing_values_percentage': (missing / len(df) * 100).round(2).to_dict()
     }
     
     return stats
 
 
-@cached(ttl=1800)  # Cache for 30 minutes
-def calculate_supply_chain_kpis(df: pd.DataFrame) -> Dict:
+@cached(ttl=1800, stale_ttl=1800, refresh_ahead=120)  # Cache for 30 minutes (+30m stale while refreshing)
+def calculate_supply_chain_kpis(df: pd.DataFrame, approximate: bool = False) -> Dict:
     """
     Tính các KPI chính của chuỗi cung ứng.
+    Trả lời từ cube tổng hợp (``build_aggregate_cube``), không duyệt lại các dòng.
     
     Args:
         df: DataFrame chuỗi cung ứng
+        approximate: Đếm đơn bằng sketch của cube (kèm ``error_bounds``)
         
     Returns:
         Dictionary chứa các KPI
     """
-    kpis = {}
-    
-    # Tổng doanh thu
-    if 'Sales' in df.columns:
-        kpis['total_sales'] = float(df['Sales'].sum())
-        kpis['avg_sales_per_order'] = float(df['Sales'].mean())
-    
-    # Tổng lợi nhuận
-    if 'Benefit per order' in df.columns:
-        kpis['total_benefit'] = float(df['Benefit per order'].sum())
-        kpis['avg_benefit_per_order'] = float(df['Benefit per order'].mean())
-    
-    if 'Order Item Profit Ratio' in df.columns:
-        kpis['avg_profit_ratio'] = float(df['Order Item Profit Ratio'].mean())
-    
-    # Số lượng đơn hàng
-    if 'Order Id' in df.columns:
-        kpis['total_orders'] = int(df['Order Id'].nunique())
-        kpis['total_order_items'] = len(df)
-    
-    # Tỉ lệ giao hàng trễ
-    if 'Late_delivery_risk' in df.columns:
-        late_count = int(df['Late_delivery_risk'].sum())
-        total = len(df)
-        kpis['late_delivery_count'] = late_count
-        kpis['late_delivery_rate'] = float((late_count / total * 100) if total > 0 else 0)
-        kpis['on_time_delivery_rate'] = float(100 - kpis['late_delivery_rate'])
-    
-    # Phân bố Delivery Status
-    if 'Delivery Status' in df.columns:
-        delivery_status_dist = df['Delivery Status'].value_counts().to_dict()
-        kpis['delivery_status_distribution'] = {str(k): int(v) for k, v in delivery_status_dist.items()}
-    
-    # Số ngày giao hàng
-    if 'Days for shipping (real)' in df.columns:
-        kpis['avg_shipping_days'] = float(df['Days for shipping (real)'].mean())
-        kpis['avg_scheduled_days'] = float(df['Days for shipment (scheduled)'].mean()) if 'Days for shipment (scheduled)' in df.columns else None
-    
-    return kpis
+    return build_aggregate_cube(df).kpis(approximate)
 
 
-@cached(ttl=1800)  # Cache for 30 minutes
+@cached(ttl=1800, stale_ttl=1800, refresh_ahead=120)  # Cache for 30 minutes (+30m stale while refreshing)
 def get_top_products(df: pd.DataFrame, top_n: int = 10, by: str = 'Sales') -> List[Dict]:
     """
     Lấy top sản phẩm theo doanh thu hoặc lợi nhuận.
+    Trả lời từ cube tổng hợp khi ``by`` là 'Sales' hoặc 'Benefit per order'.
     
     Args:
         df: DataFrame chuỗi cung ứng
@@ -95,6 +67,10 @@ def get_top_products(df: pd.DataFrame, top_n: int = 10, by: str = 'Sales') -> Li
     Returns:
         List các dictionary chứa thông tin sản phẩm
     """
+    top_products = build_aggregate_cube(df).top_categories(top_n, by)
+    if top_products is not None:
+        return top_products
+    
     if by == 'Sales' and 'Sales' not in df.columns:
         return []
     if by == 'Benefit per order' and 'Benefit per order' not in df.columns:
@@ -112,97 +88,70 @@ def get_top_products(df: pd.DataFrame, top_n: int = 10, by: str = 'Sales') -> Li
     if 'Benefit per order' in df.columns and by != 'Benefit per order':
         agg_dict['Benefit per order'] = 'sum'
     
-    top_products = df.groupby(group_col).agg(agg_dict).reset_index()
+    top_products = df.groupby(group_col, observed=True).agg(agg_dict).reset_index()
     top_products = top_products.sort_values(by=by, ascending=False).head(top_n)
     
-    result = []
-    for _, row in top_products.iterrows():
-        result.append({
-            'category': str(row[group_col]),
-            'sales': float(row.get('Sales', 0)),
-            'benefit': float(row.get('Benefit per order', 0)),
-            'value': float(row[by])
-        })
-    
-    return result
+    response = pd.DataFrame({
+        'category': top_products[group_col],
+        'sales': top_products['Sales'] if 'Sales' in top_products.columns else 0.0,
+        'benefit': top_products['Benefit per order'] if 'Benefit per order' in top_products.columns else 0.0,
+        'value': top_products[by]
+    })
+    return to_records(response, {'category': 'str'}, default='float')
 
 
-@cached(ttl=1800)  # Cache for 30 minutes
-def get_top_countries(df: pd.DataFrame, top_n: int = 10, by: str = 'Sales') -> List[Dict]:
+@cached(ttl=1800, stale_ttl=1800, refresh_ahead=120)  # Cache for 30 minutes (+30m stale while refreshing)
+def get_top_countries(df: pd.DataFrame, top_n: int = 10, by: str = 'Sales', approximate: bool = False) -> List[Dict]:
     """
     Lấy top quốc gia theo số đơn hoặc doanh thu.
+    Trả lời từ cube tổng hợp (``build_aggregate_cube``), không duyệt lại các dòng.
     
     Args:
         df: DataFrame chuỗi cung ứng
         top_n: Số lượng top quốc gia
         by: Tiêu chí sắp xếp ('Sales', 'Benefit per order', hoặc 'orders')
+        approximate: Đếm đơn bằng sketch của cube (kèm ``error_bounds``)
         
     Returns:
         List các dictionary chứa thông tin quốc gia
     """
-    country_col = 'Order Country' if 'Order Country' in df.columns else 'Customer Country'
-    
-    if country_col not in df.columns:
-        return []
-    
-    agg_dict = {}
-    if 'Sales' in df.columns:
-        agg_dict['Sales'] = 'sum'
-    if 'Benefit per order' in df.columns:
-        agg_dict['Benefit per order'] = 'sum'
-    if 'Order Id' in df.columns:
-        agg_dict['Order Id'] = 'nunique'
-    
-    top_countries = df.groupby(country_col).agg(agg_dict).reset_index()
-    
-    if by == 'orders' and 'Order Id' in agg_dict:
-        top_countries = top_countries.sort_values(by='Order Id', ascending=False).head(top_n)
-        sort_col = 'Order Id'
-    elif by in agg_dict:
-        top_countries = top_countries.sort_values(by=by, ascending=False).head(top_n)
-        sort_col = by
-    else:
-        return []
-    
-    result = []
-    for _, row in top_countries.iterrows():
-        result.append({
-            'country': str(row[country_col]),
-            'sales': float(row.get('Sales', 0)),
-            'benefit': float(row.get('Benefit per order', 0)),
-            'orders': int(row.get('Order Id', 0)),
-            'value': float(row[sort_col])
-        })
-    
-    return result
+    return build_aggregate_cube(df).top_countries(top_n, by, approximate)
 
 
-@cached(ttl=1800)  # Cache for 30 minutes
-def get_time_series_data(df: pd.DataFrame, freq: str = 'M') -> Dict:
+@cached(ttl=1800, stale_ttl=1800, refresh_ahead=120)  # Cache for 30 minutes (+30m stale while refreshing)
+def get_time_series_data(df: pd.DataFrame, freq: str = 'M', approximate: bool = False) -> Dict:
     """
     Tổng hợp dữ liệu theo thời gian (theo tháng/quý).
+    Trả lời từ rollup theo ngày của cube tổng hợp (tuần/tháng/quý gộp các ngày);
+    tần suất mịn hơn ngày tính trên các dòng.
     
     Args:
         df: DataFrame chuỗi cung ứng
         freq: Tần suất ('M' = tháng, 'Q' = quý, 'D' = ngày)
+        approximate: Đếm đơn mỗi kỳ bằng sketch của cube (tần suất mịn hơn ngày luôn chính xác)
         
     Returns:
         Dictionary chứa dữ liệu time series
     """
+    time_series = build_aggregate_cube(df).time_series(freq, approximate)
+    if time_series is not None:
+        return time_series
+    
     date_col = 'order date (DateOrders)'
     
     if date_col not in df.columns:
         return {}
     
-    # Đảm bảo cột ngày là datetime
-    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-    df_with_date = df[df[date_col].notna()].copy()
+    # Đảm bảo cột ngày là datetime (không sửa DataFrame dùng chung)
+    dates = ensure_datetime(df, date_col)
+    has_date = dates.notna()
     
-    if len(df_with_date) == 0:
+    if not has_date.any():
         return {}
     
-    # Set index là ngày
-    df_with_date = df_with_date.set_index(date_col)
+    # Set index là ngày, chỉ giữ các cột cần tổng hợp
+    value_cols = [col for col in ['Sales', 'Late_delivery_risk', 'Order Id'] if col in df.columns]
+    df_with_date = df.loc[has_date, value_cols].set_axis(pd.DatetimeIndex(dates[has_date]), axis=0)
     
     # Resample theo tần suất
     time_series = {}
@@ -212,9 +161,8 @@ def get_time_series_data(df: pd.DataFrame, freq: str = 'M') -> Dict:
         time_series['sales'] = {str(k): float(v) for k, v in time_series['sales'].items()}
     
     if 'Late_delivery_risk' in df_with_date.columns:
-        late_rate = df_with_date['Late_delivery_risk'].resample(freq).apply(
-            lambda x: (x.sum() / len(x) * 100) if len(x) > 0 else 0
-        ).to_dict()
+        # Tỷ lệ trễ = trung bình * 100 (tính vector hoá); kỳ không có dòng nào = 0
+        late_rate = (df_with_date['Late_delivery_risk'].resample(freq).mean() * 100).fillna(0).to_dict()
         time_series['late_delivery_rate'] = {str(k): float(v) for k, v in late_rate.items()}
     
     if 'Order Id' in df_with_date.columns:
@@ -234,37 +182,19 @@ def calculate_weather_stats(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary chứa thống kê thời tiết
     """
-    stats = {}
+    # Cột thời tiết -> (khoá kết quả, các thống kê); tính tất cả trong một lần duyệt
+    columns = {
+        'temperature_2m_mean': ('temperature', ('min', 'max', 'mean', 'std')),
+        'precipitation_sum': ('precipitation', ('min', 'max', 'mean', 'std')),
+        'wind_speed_10m_mean': ('wind_speed', ('min', 'max', 'mean')),
+        'relative_humidity_2m_mean': ('humidity', ('min', 'max', 'mean')),
+    }
+    available = {col: spec for col, spec in columns.items() if col in df.columns}
+    result = compute(df, [Metric(f'{col}:{op}', op, col) for col, (_, ops) in available.items() for op in ops])
     
-    if 'temperature_2m_mean' in df.columns:
-        stats['temperature'] = {
-            'min': float(df['temperature_2m_mean'].min()),
-            'max': float(df['temperature_2m_mean'].max()),
-            'mean': float(df['temperature_2m_mean'].mean()),
-            'std': float(df['temperature_2m_mean'].std())
-        }
-    
-    if 'precipitation_sum' in df.columns:
-        stats['precipitation'] = {
-            'min': float(df['precipitation_sum'].min()),
-            'max': float(df['precipitation_sum'].max()),
-            'mean': float(df['precipitation_sum'].mean()),
-            'std': float(df['precipitation_sum'].std())
-        }
-    
-    if 'wind_speed_10m_mean' in df.columns:
-        stats['wind_speed'] = {
-            'min': float(df['wind_speed_10m_mean'].min()),
-            'max': float(df['wind_speed_10m_mean'].max()),
-            'mean': float(df['wind_speed_10m_mean'].mean())
-        }
-    
-    if 'relative_humidity_2m_mean' in df.columns:
-        stats['humidity'] = {
-            'min': float(df['relative_humidity_2m_mean'].min()),
-            'max': float(df['relative_humidity_2m_mean'].max()),
-            'mean': float(df['relative_humidity_2m_mean'].mean())
-        }
+    stats = {}
+    for col, (key, ops) in available.items():
+        stats[key] = {op: float(result[f'{col}:{op}']) for op in ops}
     
     return stats
 
@@ -283,58 +213,30 @@ def analyze_weather_delivery_correlation(
     Returns:
         Dictionary chứa kết quả phân tích tương quan
     """
-    # Thử join 2 dataset
-    # Join theo customer_id và date
-    supply_date_col = 'order date (DateOrders)'
-    supply_customer_col = 'Order Customer Id'
-    
-    weather_date_col = 'order_date'
-    weather_customer_col = 'customer_id'
-    
-    if (supply_date_col not in supply_df.columns or 
-        supply_customer_col not in supply_df.columns or
-        weather_date_col not in weather_df.columns or
-        weather_customer_col not in weather_df.columns):
+    # Join theo (customer, ngày) qua index dựng sẵn, không merge và không sửa các DataFrame cache
+    join = build_join_index(supply_df, weather_df)
+    if not join.available:
         return {'error': 'Thiếu cột cần thiết để join'}
     
-    # Chuẩn hoá ngày
-    supply_df[supply_date_col] = pd.to_datetime(supply_df[supply_date_col], errors='coerce')
-    weather_df[weather_date_col] = pd.to_datetime(weather_df[weather_date_col], errors='coerce')
-    
-    # Chỉ lấy ngày (bỏ giờ)
-    supply_df['order_date_only'] = supply_df[supply_date_col].dt.date
-    weather_df['order_date_only'] = weather_df[weather_date_col].dt.date
-    
-    # Join
-    merged = supply_df.merge(
-        weather_df,
-        left_on=[supply_customer_col, 'order_date_only'],
-        right_on=[weather_customer_col, 'order_date_only'],
-        how='inner'
-    )
-    
-    if len(merged) == 0:
+    if len(join) == 0:
         return {'error': 'Không thể join được dữ liệu', 'suggestion': 'Kiểm tra lại format ngày và customer_id'}
     
+    merged = join.aligned(supply_df, weather_df)
     correlation_results = {}
     
-    # Tương quan giữa nhiệt độ và tỉ lệ giao trễ
-    if 'Late_delivery_risk' in merged.columns and 'temperature_2m_mean' in merged.columns:
-        corr = merged['Late_delivery_risk'].corr(merged['temperature_2m_mean'])
-        correlation_results['temperature_vs_late_delivery'] = float(corr) if not pd.isna(corr) else None
-    
-    # Tương quan giữa lượng mưa và tỉ lệ giao trễ
-    if 'Late_delivery_risk' in merged.columns and 'precipitation_sum' in merged.columns:
-        corr = merged['Late_delivery_risk'].corr(merged['precipitation_sum'])
-        correlation_results['precipitation_vs_late_delivery'] = float(corr) if not pd.isna(corr) else None
-    
-    # Tương quan giữa tốc độ gió và tỉ lệ giao trễ
-    if 'Late_delivery_risk' in merged.columns and 'wind_speed_10m_mean' in merged.columns:
-        corr = merged['Late_delivery_risk'].corr(merged['wind_speed_10m_mean'])
-        correlation_results['wind_speed_vs_late_delivery'] = float(corr) if not pd.isna(corr) else None
+    # Tương quan giữa nhiệt độ / lượng mưa / tốc độ gió và tỉ lệ giao trễ
+    pairs = {
+        'temperature_vs_late_delivery': 'temperature_2m_mean',
+        'precipitation_vs_late_delivery': 'precipitation_sum',
+        'wind_speed_vs_late_delivery': 'wind_speed_10m_mean',
+    }
+    if 'Late_delivery_risk' in supply_df.columns:
+        for key, column in pairs.items():
+            if column in weather_df.columns:
+                correlation_results[key] = merged.correlation('Late_delivery_risk', column)
     
-    correlation_results['merged_records'] = len(merged)
-    correlation_results['merge_rate'] = float(len(merged) / len(supply_df) * 100) if len(supply_df) > 0 else 0
+    correlation_results['merged_records'] = len(join)
+    correlation_results['merge_rate'] = join.merge_rate
     
     return correlation_results
 
@@ -352,47 +254,27 @@ def get_sample_orders(df: pd.DataFrame, n: int = 50) -> List[Dict]:
     """
     date_col = 'order date (DateOrders)'
     
-    if date_col not in df.columns:
-        # Nếu không có ngày, lấy n dòng đầu
-        sample_df = df.head(n)
-    else:
-        # Sắp xếp theo ngày giảm dần
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-        sample_df = df.sort_values(by=date_col, ascending=False).head(n)
-    
     # Chọn các cột quan trọng
     columns = ['Order Id', 'Order Country', 'Category Name', 'order date (DateOrders)', 
                'Delivery Status', 'Late_delivery_risk', 'Sales']
+    available_columns = [col for col in columns if col in df.columns]
+    column_positions = [df.columns.get_loc(col) for col in available_columns]
     
-    available_columns = [col for col in columns if col in sample_df.columns]
-    sample_df = sample_df[available_columns]
-    
-    result = []
-    for _, row in sample_df.iterrows():
-        record = {}
-        for col in available_columns:
-            value = row[col]
-            if pd.isna(value):
-                record[col] = None
-            elif isinstance(value, (pd.Timestamp, datetime)):
-                record[col] = value.strftime('%Y-%m-%d %H:%M:%S')
-            elif col == 'Sales' and pd.notna(value):
-                # Đảm bảo Sales là float
-                try:
-                    record[col] = float(value)
-                except (ValueError, TypeError):
-                    record[col] = 0.0
-            elif col == 'Late_delivery_risk' and pd.notna(value):
-                # Đảm bảo Late_delivery_risk là int hoặc string
-                try:
-                    record[col] = int(value)
-                except (ValueError, TypeError):
-                    record[col] = str(value)
-            else:
-                record[col] = str(value)
-        result.append(record)
-    
-    return result
+    if date_col not in df.columns:
+        # Nếu không có ngày, lấy n dòng đầu
+        sample_df = df.iloc[:n, column_positions]
+    else:
+        # n ngày lớn nhất bằng argpartition, không sắp xếp toàn bộ frame
+        dates = ensure_datetime(df, date_col)
+        latest = largest_positions(dates.to_numpy(), n)
+        sample_df = df.iloc[latest, column_positions].assign(**{date_col: dates.to_numpy()[latest]})
+    
+    # Chuyển kiểu theo cột: Sales là float, Late_delivery_risk là int, ngày là chuỗi, còn lại là str
+    return to_records(
+        sample_df,
+        {'Sales': 'float', 'Late_delivery_risk': 'int', date_col: 'datetime'},
+        default='str'
+    )
 
 
 def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -409,7 +291,7 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     
     # Time-based features
     if 'order date (DateOrders)' in df.columns:
-        df['order date (DateOrders)'] = pd.to_datetime(df['order date (DateOrders)'], errors='coerce')
+        df['order date (DateOrders)'] = parse_dates(df['order date (DateOrders)'])
         df['order_year'] = df['order date (DateOrders)'].dt.year
         df['order_month'] = df['order date (DateOrders)'].dt.month
         df['order_quarter'] = df['order date (DateOrders)'].dt.quarter
@@ -444,58 +326,25 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def calculate_advanced_metrics(df: pd.DataFrame) -> Dict:
+def calculate_advanced_metrics(df: pd.DataFrame, approximate: bool = False) -> Dict:
     """
     Tính toán các metrics nâng cao.
+    Trả lời từ cube tổng hợp (``build_aggregate_cube``), không duyệt lại các dòng.
     
     Args:
         df: DataFrame chuỗi cung ứng
+        approximate: Đếm khách hàng và độ tập trung doanh thu bằng sketch (kèm ``error_bounds``)
         
     Returns:
         Dictionary chứa advanced metrics
     """
-    metrics = {}
-    
-    # Customer metrics
-    if 'Customer Id' in df.columns:
-        metrics['unique_customers'] = int(df['Customer Id'].nunique())
-        metrics['avg_orders_per_customer'] = float(len(df) / df['Customer Id'].nunique()) if df['Customer Id'].nunique() > 0 else 0
-    
-    # Product metrics
-    if 'Category Name' in df.columns:
-        metrics['unique_categories'] = int(df['Category Name'].nunique())
-        metrics['category_diversity'] = float(df['Category Name'].nunique() / len(df) * 100) if len(df) > 0 else 0
-    
-    # Time-based metrics
-    if 'order date (DateOrders)' in df.columns:
-        df['order date (DateOrders)'] = pd.to_datetime(df['order date (DateOrders)'], errors='coerce')
-        date_range = (df['order date (DateOrders)'].max() - df['order date (DateOrders)'].min()).days
-        metrics['data_span_days'] = int(date_range) if pd.notna(date_range) else 0
-        metrics['avg_orders_per_day'] = float(len(df) / date_range) if date_range > 0 else 0
-    
-    # Delivery performance
-    if 'Days for shipping (real)' in df.columns and 'Days for shipment (scheduled)' in df.columns:
-        on_time = (df['Days for shipping (real)'] <= df['Days for shipment (scheduled)']).sum()
-        metrics['on_time_delivery_count'] = int(on_time)
-        metrics['on_time_delivery_rate'] = float((on_time / len(df) * 100) if len(df) > 0 else 0)
-    
-    # Revenue concentration (Gini-like)
-    if 'Sales' in df.columns:
-        sorted_sales = df['Sales'].sort_values(ascending=False)
-        cumulative_sales = sorted_sales.cumsum()
-        total_sales = sorted_sales.sum()
-        if total_sales > 0:
-            # Calculate what % of orders account for 80% of sales
-            p80_sales = total_sales * 0.8
-            p80_orders = (cumulative_sales <= p80_sales).sum()
-            metrics['revenue_concentration_p80'] = float((p80_orders / len(df) * 100) if len(df) > 0 else 0)
-    
-    return metrics
+    return build_aggregate_cube(df).advanced_metrics(approximate)
 
 
 def analyze_seasonality(df: pd.DataFrame) -> Dict:
     """
     Phân tích tính thời vụ trong dữ liệu.
+    Trả lời từ cube tổng hợp (``build_aggregate_cube``), không duyệt lại các dòng.
     
     Args:
         df: DataFrame chuỗi cung ứng
@@ -503,34 +352,4 @@ def analyze_seasonality(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary chứa seasonality analysis
     """
-    if 'order date (DateOrders)' not in df.columns:
-        return {}
-    
-    df['order date (DateOrders)'] = pd.to_datetime(df['order date (DateOrders)'], errors='coerce')
-    df_with_date = df[df['order date (DateOrders)'].notna()].copy()
-    
-    if len(df_with_date) == 0:
-        return {}
-    
-    seasonality = {}
-    
-    # Monthly seasonality
-    if 'Sales' in df_with_date.columns:
-        monthly_sales = df_with_date.groupby(df_with_date['order date (DateOrders)'].dt.month)['Sales'].sum()
-        seasonality['monthly_sales'] = {int(k): float(v) for k, v in monthly_sales.items()}
-        seasonality['best_month'] = int(monthly_sales.idxmax()) if len(monthly_sales) > 0 else None
-        seasonality['worst_month'] = int(monthly_sales.idxmin()) if len(monthly_sales) > 0 else None
-    
-    # Day of week seasonality
-    if 'Sales' in df_with_date.columns:
-        dow_sales = df_with_date.groupby(df_with_date['order date (DateOrders)'].dt.dayofweek)['Sales'].sum()
-        seasonality['day_of_week_sales'] = {int(k): float(v) for k, v in dow_sales.items()}
-        seasonality['best_day'] = int(dow_sales.idxmax()) if len(dow_sales) > 0 else None
-    
-    # Quarterly seasonality
-    if 'Sales' in df_with_date.columns:
-        quarterly_sales = df_with_date.groupby(df_with_date['order date (DateOrders)'].dt.quarter)['Sales'].sum()
-        seasonality['quarterly_sales'] = {int(k): float(v) for k, v in quarterly_sales.items()}
-    
-    return seasonality
-
+    return build_aggregate_cube(df).seasonality()
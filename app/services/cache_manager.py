@@ -3,96 +3,975 @@ Cache manager với TTL và invalidation support.
 Tối ưu performance bằng cách cache computed metrics.
 """
 
+from collections import OrderedDict
+from contextvars import ContextVar
 from functools import lru_cache, wraps
 from datetime import datetime, timedelta
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import hashlib
+import inspect
 import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from app.services.disk_cache import DiskCache
+
+
+# Ngân sách bộ nhớ của cache toàn cục (MB), có thể đổi bằng biến môi trường
+MAX_BYTES_ENV = "DATASTORM_CACHE_MAX_MB"
+DEFAULT_MAX_MB = 2048
+
+logger = logging.getLogger("cache_manager")
+
+# Tầng cache trên đĩa: bật khi đặt thư mục; dung lượng tối đa (MB)
+DISK_DIR_ENV = "DATASTORM_CACHE_DIR"
+DISK_MAX_MB_ENV = "DATASTORM_CACHE_DISK_MAX_MB"
+DEFAULT_DISK_MAX_MB = 8192
+
+# Chu kỳ (giây) của thread dọn các key đã hết hạn
+SWEEP_INTERVAL_ENV = "DATASTORM_CACHE_SWEEP_SECONDS"
+DEFAULT_SWEEP_INTERVAL = 60
+
+
+# Khoảng thời gian tối thiểu (giây) giữa hai lần stat cùng một file khi kiểm tra dependency
+DEPENDENCY_CHECK_INTERVAL = 1.0
+
+_stat_memo: Dict[str, Tuple[float, Optional[Tuple[int, int]]]] = {}
+
+# Các file được đọc trong lần tính hiện tại của @cached (None = không ở trong @cached)
+_dependency_tracker: ContextVar[Optional[Dict[str, Optional[Tuple[int, int]]]]] = ContextVar(
+    "cache_dependencies", default=None
+)
+
+
+def file_signature(path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) của file, None nếu file không tồn tại."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _current_signature(path: str) -> Optional[Tuple[int, int]]:
+    """``file_signature`` có memo ngắn để lookup dồn dập không stat lại liên tục."""
+    now = time.monotonic()
+    memo = _stat_memo.get(path)
+    if memo is not None and now - memo[0] < DEPENDENCY_CHECK_INTERVAL:
+        return memo[1]
+    signature = file_signature(path)
+    _stat_memo[path] = (now, signature)
+    return signature
+
+
+def record_file_dependency(*paths) -> Dict[str, Optional[Tuple[int, int]]]:
+    """
+    Ghi nhận các file mà lần tính hiện tại đọc (gọi trước khi đọc file).
+
+    Trong một hàm ``@cached`` các file này được lưu cùng entry; khi file thay đổi
+    entry đó và mọi entry dẫn xuất từ nó bị huỷ. Ngoài ``@cached`` chỉ trả về
+    snapshot ``{path: signature}`` (dùng với ``dependencies_changed``).
+    """
+    snapshot = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        _stat_memo[path] = (time.monotonic(), signature)
+        snapshot[path] = signature
+    _record_dependencies(snapshot)
+    return snapshot
+
+
+def _record_dependencies(dependencies: Dict[str, Optional[Tuple[int, int]]]) -> None:
+    tracker = _dependency_tracker.get()
+    if tracker is not None and dependencies:
+        for path, signature in dependencies.items():
+            tracker.setdefault(path, signature)
+
+
+def dependencies_changed(dependencies: Dict[str, Optional[Tuple[int, int]]]) -> bool:
+    """True nếu một file trong snapshot đã thay đổi (dùng cho các cache tự quản lý)."""
+    return any(_current_signature(path) != signature for path, signature in dependencies.items())
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Ước lượng số bytes một giá trị chiếm trong bộ nhớ.
+
+    DataFrame/Series dùng ``memory_usage(deep=True)``, mảng numpy dùng ``nbytes``,
+    dict/list/tuple/set được cộng dồn đệ quy (giới hạn độ sâu).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if _depth >= 8:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
 
 
 class TTLCache:
-    """Simple TTL-based cache."""
+    """
+    TTL cache có giới hạn bộ nhớ.
+
+    Mỗi entry được ước lượng kích thước khi ghi (``estimate_size``); khi tổng vượt
+    ``max_bytes`` (hoặc số entry vượt ``max_entries``) các entry ít được dùng gần đây
+    nhất bị loại (LRU). Key hết hạn bị xoá khi đọc tới, hoặc bởi thread dọn nền
+    (``start_sweeper``). Số lần loại được đếm trong ``evictions``/``expirations``.
+
+    Entry ghi với ``stale_ttl`` được giữ thêm ``stale_ttl`` giây sau khi hết hạn để
+    ``lookup`` có thể trả giá trị cũ trong lúc tính lại (stale-while-revalidate).
+
+    Với ``disk`` (``DiskCache``), mọi ``set`` được ghi xuống đĩa và miss trong bộ nhớ
+    được tra tiếp trên đĩa rồi nạp lại vào bộ nhớ với hạn dùng gốc.
+
+    Entry ghi kèm ``dependencies`` ({path: (mtime_ns, size)}) bị huỷ khi một file trong
+    đó thay đổi: kiểm tra lười lúc đọc (stat, tối đa mỗi DEPENDENCY_CHECK_INTERVAL giây
+    một lần cho mỗi file) và trong ``sweep``. Mọi entry khác phụ thuộc file đó cũng bị
+    huỷ theo.
+
+    ``on_remove(key, reason)`` (nếu đặt) được gọi khi một entry bị loại với reason
+    ``'evicted'``, ``'expired'`` hoặc ``'invalidated'`` (dùng cho thống kê theo hàm).
+    """
     
-    def __init__(self, default_ttl: int = 3600):
+    def __init__(self, default_ttl: int = 3600, max_bytes: Optional[int] = None,
+                 max_entries: Optional[int] = None, disk: Optional[DiskCache] = None):
         """
         Args:
             default_ttl: Default TTL in seconds (default: 1 hour)
+            max_bytes: Ngân sách bộ nhớ (None = không giới hạn)
+            max_entries: Số entry tối đa (None = không giới hạn)
+            disk: Tầng cache trên đĩa phía sau (None = chỉ bộ nhớ)
         """
-        self._cache = {}
-        self._timestamps = {}
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._timestamps: Dict[str, datetime] = {}
+        self._stale_until: Dict[str, datetime] = {}
+        self._sizes: Dict[str, int] = {}
+        self._created: Dict[str, float] = {}
+        self._deps: Dict[str, Dict[str, Optional[Tuple[int, int]]]] = {}
+        self._lock = threading.RLock()
         self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk = disk
+        self.total_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.dependency_invalidations = 0
+        self.disk_errors = 0
+        self.on_remove: Optional[Callable[[str, str], None]] = None
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
+    
+    def _remove(self, key: str, reason: Optional[str] = None) -> None:
+        del self._cache[key]
+        del self._timestamps[key]
+        self._stale_until.pop(key, None)
+        self._deps.pop(key, None)
+        self._created.pop(key, None)
+        self.total_bytes -= self._sizes.pop(key, 0)
+        if reason is not None and self.on_remove is not None:
+            self.on_remove(key, reason)
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired."""
-        if key not in self._cache:
-            return None
-        
-        # Check if expired
-        if datetime.now() > self._timestamps[key]:
-            del self._cache[key]
-            del self._timestamps[key]
-            return None
+        status, value = self.lookup(key)
+        return value if status in ('fresh', 'refresh') else None
+    
+    def lookup(self, key: str, refresh_ahead: float = 0) -> Tuple[str, Any]:
+        """
+        Tra key kèm trạng thái: ``('fresh', v)``, ``('refresh', v)`` khi còn hạn nhưng
+        sắp hết (trong ``refresh_ahead`` giây), ``('stale', v)`` khi đã hết hạn nhưng
+        còn trong cửa sổ stale, hoặc ``('miss', None)``.
+        """
+        with self._lock:
+            if key in self._cache:
+                return self._status(key, refresh_ahead)
+        if self.disk is None:
+            return 'miss', None
         
-        return self._cache[key]
+        try:
+            status, value, expires_at, stale_until, meta = self.disk.lookup(key)
+            meta = json.loads(meta) if status != 'miss' and meta else {}
+        except Exception as exc:  # pylint: disable=broad-except
+            # Index bị khoá/hỏng, blob thiếu/cụt...: coi như miss để hàm được tính lại
+            logger.warning("Could not read %s from disk cache: %s", key, exc)
+            self.disk_errors += 1
+            self._drop_from_disk(key)
+            return 'miss', None
+        if status == 'miss':
+            return 'miss', None
+        dependencies = {path: tuple(sig) if sig else None for path, sig in meta.get('deps', {}).items()}
+        if meta.get('token') is not None:
+            tag_frame(value, meta['token'], dependencies)
+        with self._lock:
+            self._store(key, value, datetime.fromtimestamp(expires_at), datetime.fromtimestamp(stale_until),
+                        dependencies)
+            return self._status(key, refresh_ahead)
+    
+    def _drop_from_disk(self, key: str) -> None:
+        try:
+            self.disk.invalidate(key)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Could not drop %s from disk cache: %s", key, exc)
+    
+    def dependencies(self, key: str) -> Dict[str, Optional[Tuple[int, int]]]:
+        """Các file mà entry ``key`` đã đọc."""
+        with self._lock:
+            return dict(self._deps.get(key, {}))
+    
+    def _changed_dependencies(self, key: str) -> List[str]:
+        return [
+            path for path, signature in self._deps.get(key, {}).items()
+            if _current_signature(path) != signature
+        ]
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set value in cache with TTL."""
+    def invalidate_dependents(self, paths) -> int:
+        """Huỷ mọi entry (bộ nhớ và đĩa) đã đọc một trong các file ``paths``."""
+        paths = {os.path.abspath(path) for path in paths}
+        with self._lock:
+            keys = [key for key, deps in self._deps.items() if paths.intersection(deps)]
+            for key in keys:
+                self._remove(key, 'invalidated')
+            self.dependency_invalidations += len(keys)
+        if self.disk is not None:
+            for key in keys:
+                self.disk.invalidate(key)
+            for key in self.disk.keys_depending_on(paths):
+                self.disk.invalidate(key)
+        return len(keys)
+    
+    def _status(self, key: str, refresh_ahead: float) -> Tuple[str, Any]:
+        changed = self._changed_dependencies(key)
+        if changed:
+            self.invalidate_dependents(changed)
+            return 'miss', None
+        now = datetime.now()
+        expires = self._timestamps[key]
+        if now > expires:
+            if now > self._stale_until.get(key, expires):
+                self._remove(key, 'expired')
+                self.expirations += 1
+                return 'miss', None
+            status = 'stale'
+        elif refresh_ahead and now > expires - timedelta(seconds=refresh_ahead):
+            status = 'refresh'
+        else:
+            status = 'fresh'
+        self._cache.move_to_end(key)
+        return status, self._cache[key]
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, stale_ttl: float = 0,
+            persist: bool = True, dependencies: Optional[Dict[str, Optional[Tuple[int, int]]]] = None):
+        """
+        Set value in cache with TTL (và cửa sổ stale ``stale_ttl`` giây sau khi hết hạn).
+        
+        ``persist`` = ghi cả xuống tầng đĩa (nếu có); ``dependencies`` = các file giá trị
+        được tính từ đó (xem ``record_file_dependency``).
+        """
         ttl = ttl or self.default_ttl
+        expires = datetime.now() + timedelta(seconds=ttl)
+        stale_until = expires + timedelta(seconds=stale_ttl)
+        with self._lock:
+            self._store(key, value, expires, stale_until, dependencies)
+        if self.disk is not None and persist:
+            meta = {'token': frame_token(value), 'deps': dependencies or {}}
+            try:
+                self.disk.set(key, value, expires.timestamp(), stale_until.timestamp(), meta=json.dumps(meta),
+                              dependencies=list(dependencies or {}))
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning("Could not write %s to disk cache: %s", key, exc)
+    
+    def _store(self, key: str, value: Any, expires: datetime, stale_until: datetime,
+               dependencies: Optional[Dict[str, Optional[Tuple[int, int]]]] = None) -> None:
+        size = estimate_size(value)
+        if key in self._cache:
+            self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Lớn hơn cả ngân sách: không cache trong bộ nhớ
+            self.evictions += 1
+            if self.on_remove is not None:
+                self.on_remove(key, 'evicted')
+            return
         self._cache[key] = value
-        self._timestamps[key] = datetime.now() + timedelta(seconds=ttl)
+        self._timestamps[key] = expires
+        if stale_until > expires:
+            self._stale_until[key] = stale_until
+        if dependencies:
+            self._deps[key] = dict(dependencies)
+        self._sizes[key] = size
+        self._created[key] = time.time()
+        self.total_bytes += size
+        self._evict()
+    
+    def _evict(self) -> None:
+        """Loại các entry LRU cho tới khi nằm trong ngân sách."""
+        while self._cache and (
+            (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._cache) > self.max_entries)
+        ):
+            oldest = next(iter(self._cache))
+            self._remove(oldest, 'evicted')
+            self.evictions += 1
+    
+    def sweep(self) -> int:
+        """Xoá mọi key đã hết hạn; trả về số key bị xoá."""
+        now = datetime.now()
+        with self._lock:
+            expired = [
+                key for key, expires in self._timestamps.items()
+                if now > self._stale_until.get(key, expires)
+            ]
+            for key in expired:
+                self._remove(key, 'expired')
+            self.expirations += len(expired)
+            changed = {path for key in list(self._deps) for path in self._changed_dependencies(key)}
+        if changed:
+            self.invalidate_dependents(changed)
+        if self.disk is not None:
+            try:
+                self.disk.sweep()
+            except sqlite3.Error as exc:
+                logger.warning("Disk cache sweep failed: %s", exc)
+        return len(expired)
+    
+    def start_sweeper(self, interval: float = DEFAULT_SWEEP_INTERVAL):
+        """Chạy ``sweep`` định kỳ trong một daemon thread (gọi lại nhiều lần không sao)."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stop.clear()
+
+        def _run():
+            while not self._sweeper_stop.wait(interval):
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=_run, name="ttl-cache-sweeper", daemon=True)
+        self._sweeper.start()
+    
+    def stop_sweeper(self, timeout: Optional[float] = 5.0):
+        """Dừng thread sweep và chờ lượt sweep đang chạy (nếu có) xong."""
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout)
+            self._sweeper = None
+    
+    def keys(self):
+        """Các key trong bộ nhớ và trên đĩa."""
+        with self._lock:
+            keys = list(self._cache.keys())
+        if self.disk is not None:
+            keys += [key for key in self.disk.keys() if key not in self._cache]
+        return keys
+    
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """``(key, bytes, thời điểm ghi)`` của các entry trong bộ nhớ."""
+        with self._lock:
+            return [(key, self._sizes.get(key, 0), self._created.get(key, 0.0)) for key in self._cache]
+    
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'size': len(self._cache),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'dependency_invalidations': self.dependency_invalidations,
+                'disk_errors': self.disk_errors,
+            }
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
     
     def clear(self):
-        """Clear all cache."""
-        self._cache.clear()
-        self._timestamps.clear()
+        """Clear all cache (cả tầng đĩa)."""
+        with self._lock:
+            self._cache.clear()
+            self._timestamps.clear()
+            self._stale_until.clear()
+            self._sizes.clear()
+            self._created.clear()
+            self._deps.clear()
+            self.total_bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
     
     def invalidate(self, key: str):
         """Invalidate specific key."""
-        if key in self._cache:
-            del self._cache[key]
-            del self._timestamps[key]
+        with self._lock:
+            if key in self._cache:
+                self._remove(key, 'invalidated')
+        if self.disk is not None:
+            self.disk.invalidate(key)
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _disk_tier_from_env() -> Optional[DiskCache]:
+    directory = os.environ.get(DISK_DIR_ENV)
+    if not directory:
+        return None
+    try:
+        return DiskCache(directory, max_bytes=int(_env_number(DISK_MAX_MB_ENV, DEFAULT_DISK_MAX_MB) * 1024 * 1024))
+    except (OSError, sqlite3.Error) as exc:
+        logger.warning("Disk cache disabled, cannot open %s: %s", directory, exc)
+        return None
 
 
 # Global cache instance
-_cache = TTLCache(default_ttl=3600)  # 1 hour default
+_cache = TTLCache(
+    default_ttl=3600,  # 1 hour default
+    max_bytes=int(_env_number(MAX_BYTES_ENV, DEFAULT_MAX_MB) * 1024 * 1024),
+    disk=_disk_tier_from_env(),
+)
+
+
+# Số dòng lấy mẫu (rải đều) khi fingerprint một DataFrame chưa được gắn token
+FINGERPRINT_SAMPLE_ROWS = 1000
+
+# id(frame) -> (weakref tới frame, token); entry tự xoá khi frame bị giải phóng.
+# Không dùng df.attrs vì attrs được pandas copy sang các frame dẫn xuất (filter, copy).
+_frame_tokens: Dict[int, tuple] = {}
+_frame_tokens_lock = threading.Lock()
+
+
+def tag_frame(obj, token: str, dependencies: Optional[Dict[str, Optional[Tuple[int, int]]]] = None):
+    """
+    Gắn version token cho một DataFrame/Series (thường do loader gắn).
+
+    Frame đã gắn token được fingerprint bằng token đó (tra dict, không đọc dữ liệu);
+    frame phải được coi là bất biến sau khi gắn. ``dependencies`` là các file frame
+    được đọc từ đó: kết quả @cached tính trên frame này phụ thuộc các file đó.
+    Trả về chính ``obj``.
+    """
+    key = id(obj)
+
+    def _forget(_ref, key=key):
+        with _frame_tokens_lock:
+            entry = _frame_tokens.get(key)
+            if entry is not None and entry[0] is _ref:
+                del _frame_tokens[key]
+
+    with _frame_tokens_lock:
+        _frame_tokens[key] = (weakref.ref(obj, _forget), token, dict(dependencies or {}))
+    return obj
+
+
+def _frame_entry(obj) -> Optional[tuple]:
+    entry = _frame_tokens.get(id(obj))
+    if entry is not None and entry[0]() is obj:
+        return entry
+    return None
+
+
+def frame_token(obj) -> Optional[str]:
+    """Token đã gắn bằng ``tag_frame`` (None nếu chưa gắn)."""
+    entry = _frame_entry(obj)
+    return entry[1] if entry is not None else None
+
+
+def frame_dependencies(obj) -> Dict[str, Optional[Tuple[int, int]]]:
+    """Các file frame được đọc từ đó (theo ``tag_frame``)."""
+    entry = _frame_entry(obj)
+    return dict(entry[2]) if entry is not None else {}
+
+
+def frame_fingerprint(obj) -> str:
+    """
+    Fingerprint rẻ và ổn định của một DataFrame/Series.
+
+    Dùng token đã gắn nếu có; nếu không thì hash shape, tên cột, dtypes và tối đa
+    FINGERPRINT_SAMPLE_ROWS dòng rải đều (kèm index). Frame nhỏ hơn ngưỡng được hash
+    toàn bộ nên không bị trùng key như ``str(df)`` (bị cắt bớt).
+    """
+    token = frame_token(obj)
+    if token is not None:
+        return f"token:{token}"
+    
+    digest = hashlib.blake2b(digest_size=16)
+    columns = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+    dtypes = obj.dtypes.astype(str).tolist() if isinstance(obj, pd.DataFrame) else [str(obj.dtype)]
+    digest.update(repr((type(obj).__name__, obj.shape, columns, dtypes)).encode())
+    
+    n = len(obj)
+    sample = obj
+    if n > FINGERPRINT_SAMPLE_ROWS:
+        sample = obj.iloc[np.linspace(0, n - 1, FINGERPRINT_SAMPLE_ROWS).astype(np.int64)]
+    try:
+        digest.update(pd.util.hash_pandas_object(sample, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Giá trị không hash được (list, dict trong cột object)
+        digest.update(repr(sample.to_dict()).encode())
+    return f"sample:{digest.hexdigest()}"
+
+
+def _key_part(value: Any) -> Any:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return f"<{type(value).__name__} {frame_fingerprint(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [_key_part(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _key_part(v) for k, v in value.items()}
+    return value
 
 
 def cache_key(*args, **kwargs) -> str:
-    """Generate cache key from function arguments."""
+    """Generate cache key from function arguments (DataFrame/Series qua ``frame_fingerprint``)."""
     key_data = {
-        'args': args,
-        'kwargs': sorted(kwargs.items())
+        'args': [_key_part(arg) for arg in args],
+        'kwargs': sorted((k, _key_part(v)) for k, v in kwargs.items())
     }
     key_str = json.dumps(key_data, sort_keys=True, default=str)
     return hashlib.md5(key_str.encode()).hexdigest()
 
 
-def cached(ttl: int = 3600):
+class _Flight:
+    """Một lần tính đang chạy cho một key; các caller khác chờ trên ``done``."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_inflight: Dict[str, _Flight] = {}
+_inflight_lock = threading.Lock()
+
+# (id(event loop), key) -> Future của lần tính đang chạy trên loop đó
+_async_inflight: Dict[tuple, "asyncio.Future"] = {}
+
+
+def _single_flight(key: str, compute: Callable[[], Any]) -> Any:
+    """
+    Chỉ caller đầu tiên của ``key`` chạy ``compute``; các thread khác gọi cùng key
+    trong lúc đó chờ và nhận cùng kết quả (hoặc cùng exception).
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _inflight[key] = flight
+    
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    
+    try:
+        flight.result = compute()
+        return flight.result
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+async def _single_flight_async(key: str, compute: Callable[[], Any]) -> Any:
+    """Như ``_single_flight`` cho coroutine: các task cùng key await chung một Future."""
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), key)
+    future = _async_inflight.get(flight_key)
+    if future is not None:
+        return await asyncio.shield(future)
+    
+    future = loop.create_future()
+    _async_inflight[flight_key] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # tránh cảnh báo "exception was never retrieved" khi không ai chờ
+        raise
+    finally:
+        _async_inflight.pop(flight_key, None)
+
+
+# Thread chạy các lần làm mới nền của stale-while-revalidate
+REFRESH_WORKERS = 2
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+_refresh_tasks: set = set()
+
+
+def _log_refresh_error(key: str, exc: BaseException) -> None:
+    logger.warning("Background refresh of %s failed, keeping stale value: %s", key, exc)
+
+
+def _refresh_in_background(key: str, compute: Callable[[], Any]) -> None:
+    """Tính lại ``key`` trên thread nền, bỏ qua nếu key đang được tính."""
+    with _inflight_lock:
+        if key in _inflight:
+            return
+    
+    def run():
+        try:
+            _single_flight(key, compute)
+        except Exception as exc:  # pylint: disable=broad-except
+            _log_refresh_error(key, exc)
+    
+    _refresh_executor.submit(run)
+
+
+def _refresh_in_background_async(key: str, compute: Callable[[], Any]) -> None:
+    """Như ``_refresh_in_background`` cho coroutine: tạo task trên event loop hiện tại."""
+    loop = asyncio.get_running_loop()
+    if (id(loop), key) in _async_inflight:
+        return
+    task = loop.create_task(_single_flight_async(key, compute))
+    _refresh_tasks.add(task)
+    
+    def done(t):
+        _refresh_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            _log_refresh_error(key, t.exception())
+    
+    task.add_done_callback(done)
+
+
+# Bucket (giây) của histogram thời gian tính và phân bố tuổi entry
+COMPUTE_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+AGE_BUCKETS = (60, 300, 900, 1800, 3600, 7200, 86400)
+
+METRIC_PREFIX = "datastorm_cache"
+
+
+def _bucket_counts(values, bounds) -> List[int]:
+    """Số đếm tích luỹ theo kiểu Prometheus: phần tử i = số giá trị <= bounds[i], cuối cùng là +Inf."""
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+    return counts
+
+
+class FunctionStats:
+    """Bộ đếm của một hàm @cached: hit/miss, entry bị loại và histogram thời gian tính."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.compute_errors = 0
+        self.compute_count = 0
+        self.compute_seconds = 0.0
+        self.compute_buckets = [0] * (len(COMPUTE_TIME_BUCKETS) + 1)
+    
+    def observe_compute(self, seconds: float, error: bool = False) -> None:
+        self.compute_count += 1
+        self.compute_seconds += seconds
+        for i, bound in enumerate(COMPUTE_TIME_BUCKETS):
+            if seconds <= bound:
+                self.compute_buckets[i] += 1
+        self.compute_buckets[-1] += 1
+        if error:
+            self.compute_errors += 1
+
+
+_function_stats: Dict[str, FunctionStats] = {}
+_function_stats_lock = threading.Lock()
+
+_REMOVAL_COUNTERS = {'evicted': 'evictions', 'expired': 'expirations', 'invalidated': 'invalidations'}
+
+
+def _stats_for(name: str) -> FunctionStats:
+    with _function_stats_lock:
+        stats = _function_stats.get(name)
+        if stats is None:
+            stats = _function_stats[name] = FunctionStats(name)
+        return stats
+
+
+def _count(name: str, counter: str) -> None:
+    stats = _stats_for(name)
+    with _function_stats_lock:
+        setattr(stats, counter, getattr(stats, counter) + 1)
+
+
+def _count_lookup(name: str, status: str) -> None:
+    _count(name, {'fresh': 'hits', 'refresh': 'hits', 'stale': 'stale_hits'}.get(status, 'misses'))
+
+
+def _observe_compute(name: str, started: float, error: bool = False) -> None:
+    stats = _stats_for(name)
+    with _function_stats_lock:
+        stats.observe_compute(time.perf_counter() - started, error)
+
+
+def _record_removal(key: str, reason: str) -> None:
+    # Key của @cached có dạng "<tên hàm>:<hash>"; key đặt trực tiếp bằng _cache.set bị bỏ qua
+    name = key.split(':', 1)[0]
+    if name in _function_stats and reason in _REMOVAL_COUNTERS:
+        _count(name, _REMOVAL_COUNTERS[reason])
+
+
+_cache.on_remove = _record_removal
+
+
+def get_function_cache_stats() -> Dict[str, dict]:
+    """
+    Thống kê theo từng hàm @cached: hit (kể cả stale), miss, entry bị loại/hết hạn/huỷ,
+    histogram thời gian tính, số bytes đang giữ và phân bố tuổi các entry trong bộ nhớ.
+    
+    Histogram dùng số đếm tích luỹ (``le`` -> số quan sát <= le) như Prometheus.
+    """
+    now = time.time()
+    held: Dict[str, List[Tuple[int, float]]] = {}
+    for key, size, created in _cache.entries():
+        held.setdefault(key.split(':', 1)[0], []).append((size, now - created))
+    
+    with _function_stats_lock:
+        names = sorted(set(_function_stats) | set(held))
+        snapshot = {}
+        for name in names:
+            stats = _function_stats.get(name) or FunctionStats(name)
+            entries = held.get(name, [])
+            ages = [age for _, age in entries]
+            lookups = stats.hits + stats.stale_hits + stats.misses
+            snapshot[name] = {
+                'hits': stats.hits,
+                'stale_hits': stats.stale_hits,
+                'misses': stats.misses,
+                'hit_ratio': (stats.hits + stats.stale_hits) / lookups if lookups else None,
+                'evictions': stats.evictions,
+                'expirations': stats.expirations,
+                'invalidations': stats.invalidations,
+                'compute': {
+                    'count': stats.compute_count,
+                    'errors': stats.compute_errors,
+                    'sum_seconds': stats.compute_seconds,
+                    'buckets': dict(zip([*map(str, COMPUTE_TIME_BUCKETS), '+Inf'], stats.compute_buckets)),
+                },
+                'entries': len(entries),
+                'bytes': sum(size for size, _ in entries),
+                'age': {
+                    'count': len(ages),
+                    'sum_seconds': sum(ages),
+                    'buckets': dict(zip([*map(str, AGE_BUCKETS), '+Inf'], _bucket_counts(ages, AGE_BUCKETS))),
+                },
+            }
+    return snapshot
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(function_stats: Optional[Dict[str, dict]] = None) -> str:
+    """Thống kê ``get_function_cache_stats`` theo định dạng text exposition của Prometheus."""
+    function_stats = get_function_cache_stats() if function_stats is None else function_stats
+    lines: List[str] = []
+    
+    def metric(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            label_str = ','.join(f'{k}="{_label(str(v))}"' for k, v in labels)
+            lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{label_str}}} {value}")
+    
+    def histogram(name: str, help_text: str, field: str):
+        samples = []
+        for fn, stats in function_stats.items():
+            for bound, count in stats[field]['buckets'].items():
+                samples.append(('_bucket', [('function', fn), ('le', bound)], count))
+            samples.append(('_sum', [('function', fn)], stats[field]['sum_seconds']))
+            samples.append(('_count', [('function', fn)], stats[field]['count']))
+        metric(name, 'histogram', help_text, samples)
+    
+    for field, kind, help_text in (
+        ('hits', 'counter', 'Fresh cache hits.'),
+        ('stale_hits', 'counter', 'Expired entries served while refreshing.'),
+        ('misses', 'counter', 'Lookups that found no usable entry.'),
+        ('evictions', 'counter', 'Entries evicted to stay within the memory budget.'),
+        ('expirations', 'counter', 'Entries dropped after their TTL and stale window.'),
+        ('invalidations', 'counter', 'Entries invalidated explicitly or by a source file change.'),
+    ):
+        name = f"{field}_total" if kind == 'counter' else field
+        metric(name, kind, help_text, [('', [('function', fn)], stats[field]) for fn, stats in function_stats.items()])
+    metric('compute_errors_total', 'counter', 'Computations that raised.',
+           [('', [('function', fn)], stats['compute']['errors']) for fn, stats in function_stats.items()])
+    histogram('compute_seconds', 'Time spent computing values on a miss or refresh.', 'compute')
+    metric('entries', 'gauge', 'Entries held in memory.',
+           [('', [('function', fn)], stats['entries']) for fn, stats in function_stats.items()])
+    metric('bytes', 'gauge', 'Estimated bytes held in memory.',
+           [('', [('function', fn)], stats['bytes']) for fn, stats in function_stats.items()])
+    histogram('entry_age_seconds', 'Age of the entries currently held in memory.', 'age')
+    return '\n'.join(lines) + '\n'
+
+
+def cached(ttl: int = 3600, single_flight: bool = True, stale_ttl: float = 0, refresh_ahead: float = 0,
+           persist: bool = True):
     """
     Decorator để cache function results với TTL.
     
+    Khi cache trống (lúc khởi động, sau ``clear_cache()``), các request đồng thời cùng
+    key không cùng tính lại: với ``single_flight`` chỉ lần gọi đầu tiên tính, các lần
+    gọi khác (thread pool hoặc asyncio task) chờ kết quả đó.
+    
+    Stale-while-revalidate: với ``stale_ttl`` > 0, entry đã hết hạn vẫn được trả ngay
+    trong tối đa ``stale_ttl`` giây trong lúc một tác vụ nền tính lại; với
+    ``refresh_ahead`` > 0, entry còn hạn dưới ``refresh_ahead`` giây cũng được làm mới
+    nền. Request chỉ phải chờ tính lại khi entry đã quá ``ttl + stale_ttl``.
+    
+    File mà hàm đọc (``record_file_dependency``, kể cả qua các hàm @cached lồng nhau
+    hoặc frame đã gắn token truyền vào làm tham số) được lưu cùng entry; entry bị huỷ
+    ngay khi một file trong đó thay đổi, không cần chờ TTL.
+    
+    Hit/miss, số entry bị loại, thời gian tính, bytes đang giữ và tuổi entry được thống
+    kê theo từng hàm (``get_function_cache_stats``, ``render_prometheus``).
+    
+    Khi bật tầng đĩa (``DATASTORM_CACHE_DIR``), kết quả được ghi xuống đĩa và còn dùng
+    được sau restart hoặc từ worker khác trên cùng máy; ``persist=False`` để tắt cho
+    một hàm cụ thể.
+    
     Usage:
         @cached(ttl=1800)  # 30 minutes
         def expensive_function(arg1, arg2):
             ...
+        
+        @cached(ttl=1800, stale_ttl=900, refresh_ahead=120)
+        def dashboard_kpis(df):
+            ...
     """
+    def _store_result(key, result, dependencies, args, kwargs):
+        # Kết quả tính trên frame đã gắn token phụ thuộc các file của frame đó
+        for value in list(args) + list(kwargs.values()):
+            if isinstance(value, (pd.DataFrame, pd.Series)):
+                for path, signature in frame_dependencies(value).items():
+                    dependencies.setdefault(path, signature)
+        if dependencies and frame_token(result) is not None:
+            tag_frame(result, frame_token(result), {**frame_dependencies(result), **dependencies})
+        _cache.set(key, result, ttl=ttl, stale_ttl=stale_ttl, persist=persist, dependencies=dependencies)
+        _record_dependencies(dependencies)
+        return result
+    
     def decorator(func: Callable) -> Callable:
+        _stats_for(func.__name__)
+        
+        def cache_put(value, *args, **kwargs):
+            """Ghi sẵn kết quả cho bộ tham số (khi đã có kết quả tính bằng cách khác)."""
+            _store_result(f"{func.__name__}:{cache_key(*args, **kwargs)}", value, {}, args, kwargs)
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = f"{func.__name__}:{cache_key(*args, **kwargs)}"
+                
+                async def compute():
+                    dependencies: Dict[str, Optional[Tuple[int, int]]] = {}
+                    context = _dependency_tracker.set(dependencies)
+                    started = time.perf_counter()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except BaseException:
+                        _observe_compute(func.__name__, started, error=True)
+                        raise
+                    finally:
+                        _dependency_tracker.reset(context)
+                    _observe_compute(func.__name__, started)
+                    return _store_result(key, result, dependencies, args, kwargs)
+                
+                status, cached_value = _cache.lookup(key, refresh_ahead)
+                _count_lookup(func.__name__, status)
+                if status != 'miss':
+                    _record_dependencies(_cache.dependencies(key))
+                if status == 'fresh':
+                    return cached_value
+                if status in ('stale', 'refresh'):
+                    _refresh_in_background_async(key, compute)
+                    return cached_value
+                
+                if not single_flight:
+                    return await compute()
+                return await _single_flight_async(key, compute)
+            
+            async_wrapper.cache_clear = lambda: _cache.clear()
+            async_wrapper.cache_invalidate = lambda k: _cache.invalidate(k)
+            async_wrapper.cache_put = cache_put
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             key = f"{func.__name__}:{cache_key(*args, **kwargs)}"
             
+            def refresh():
+                dependencies: Dict[str, Optional[Tuple[int, int]]] = {}
+                context = _dependency_tracker.set(dependencies)
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    _observe_compute(func.__name__, started, error=True)
+                    raise
+                finally:
+                    _dependency_tracker.reset(context)
+                _observe_compute(func.__name__, started)
+                return _store_result(key, result, dependencies, args, kwargs)
+            
             # Try to get from cache
-            cached_value = _cache.get(key)
-            if cached_value is not None:
+            status, cached_value = _cache.lookup(key, refresh_ahead)
+            _count_lookup(func.__name__, status)
+            if status != 'miss':
+                _record_dependencies(_cache.dependencies(key))
+            if status == 'fresh':
+                return cached_value
+            if status in ('stale', 'refresh'):
+                _refresh_in_background(key, refresh)
                 return cached_value
             
             # Compute and cache
-            result = func(*args, **kwargs)
-            _cache.set(key, result, ttl=ttl)
-            return result
+            def compute():
+                # Caller trước có thể vừa tính xong trong lúc ta chờ lock
+                value = _cache.get(key)
+                if value is not None:
+                    _record_dependencies(_cache.dependencies(key))
+                    return value
+                return refresh()
+            
+            if not single_flight:
+                return compute()
+            return _single_flight(key, compute)
         
         wrapper.cache_clear = lambda: _cache.clear()
         wrapper.cache_invalidate = lambda k: _cache.invalidate(k)
+        wrapper.cache_put = cache_put
         return wrapper
     return decorator
 
@@ -100,11 +979,22 @@ def cached(ttl: int = 3600):
 def get_cache_stats() -> dict:
     """Get cache statistics."""
     return {
-        'size': len(_cache._cache),
-        'keys': list(_cache._cache.keys())
+        **_cache.stats(),
+        'keys': _cache.keys(),
+        'functions': get_function_cache_stats()
     }
 
 
+def start_cache_sweeper():
+    """Bật sweep định kỳ cho cache toàn cục (gọi từ startup của app; import module không tự chạy thread)."""
+    _cache.start_sweeper(_env_number(SWEEP_INTERVAL_ENV, DEFAULT_SWEEP_INTERVAL))
+
+
+def stop_cache_sweeper():
+    """Dừng sweep định kỳ của cache toàn cục (gọi khi app shutdown)."""
+    _cache.stop_sweeper()
+
+
 def clear_cache():
     """Clear all cache."""
     _cache.clear()
@@ -112,7 +1002,7 @@ def clear_cache():
 
 def invalidate_cache_pattern(pattern: str):
     """Invalidate cache keys matching pattern."""
-    keys_to_remove = [k for k in _cache._cache.keys() if pattern in k]
+    keys_to_remove = [k for k in _cache.keys() if pattern in k]
     for key in keys_to_remove:
         _cache.invalidate(key)
 
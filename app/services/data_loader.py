@@ -5,10 +5,34 @@ Xử lý encoding, chuyển đổi kiểu dữ liệu, và chuẩn hoá format.
 
 import pandas as pd
 import os
-from typing import Tuple, Optional
+from typing import Tuple, Optional, List
 from datetime import datetime
-from app.services.data_normalizer import normalize_dataframe, validate_dataframe
-from app.services.cache_manager import cached
+from app.services.data_normalizer import COUNTRY_ALIASES_FILE, normalize_dataframe, validate_dataframe
+from app.services.cache_manager import cache_key, cached, invalidate_cache_pattern, record_file_dependency, tag_frame
+from app.services.date_parser import parse_date_columns, parse_dates
+from modules.data_pipeline.columnar_store import (
+    Filters,
+    apply_filters,
+    check_filters,
+    is_store_fresh,
+    projection_columns,
+    read_manifest,
+    read_store,
+    source_token,
+    store_dir_for,
+    store_token,
+    write_store,
+)
+from modules.data_pipeline import shared_dataset
+from modules.data_pipeline.dtype_compaction import compact_dataframe
+from modules.data_pipeline.incremental_ingest import (
+    Delta,
+    catch_up_delta,
+    csv_watermark,
+    ingest_appended_rows,
+    store_build,
+)
+from modules.data_pipeline.shared_dataset import shared_mode_enabled
 
 
 # Đường dẫn file dữ liệu
@@ -17,64 +41,215 @@ SUPPLY_CHAIN_FILE = os.path.join(DATA_DIR, 'DataCoSupplyChainDataset.csv')
 WEATHER_FILE = os.path.join(DATA_DIR, 'geocoded_weather.csv')
 
 
-@cached(ttl=7200)  # Cache for 2 hours
-def load_supply_chain_data(file_path: Optional[str] = None, normalize: bool = True) -> pd.DataFrame:
+# Các cột số của dataset chuỗi cung ứng
+SUPPLY_CHAIN_NUMERIC_COLUMNS = [
+    'Days for shipping (real)',
+    'Days for shipment (scheduled)',
+    'Benefit per order',
+    'Sales per customer',
+    'Late_delivery_risk',
+    'Category Id',
+    'Customer Id',
+    'Order Id',
+    'Order Item Quantity',
+    'Order Item Discount',
+    'Order Item Discount Rate',
+    'Order Item Profit Ratio',
+    'Order Item Total',
+    'Sales',
+    'Order Profit Per Order',
+    'Order Item Product Price',
+    'Product Price'
+]
+
+SUPPLY_CHAIN_DATE_COLUMNS = ['order date (DateOrders)', 'shipping date (DateOrders)']
+
+# Số dòng mỗi chunk khi đọc có filter (giới hạn bộ nhớ đỉnh)
+CSV_FILTER_CHUNK_SIZE = 200_000
+
+
+# Tăng khi logic xử lý thay đổi để các columnar cache cũ bị build lại
+SUPPLY_CHAIN_PIPELINE_VERSION = 5
+
+
+def _pipeline_signature() -> dict:
+    """Phiên bản pipeline + bảng alias quốc gia đã dùng để build columnar cache."""
+    aliases = source_token(COUNTRY_ALIASES_FILE) if os.path.exists(COUNTRY_ALIASES_FILE) else None
+    return {'pipeline': {'version': SUPPLY_CHAIN_PIPELINE_VERSION, 'country_aliases': aliases}}
+
+
+def _read_supply_chain_csv(file_path: str, usecols: Optional[List[str]] = None) -> Tuple[pd.DataFrame, str]:
     """
-    Đọc file CSV chuỗi cung ứng với encoding phù hợp.
+    Đọc file CSV gốc, thử lần lượt các encoding phổ biến.
     
     Args:
-        file_path: Đường dẫn file, mặc định dùng SUPPLY_CHAIN_FILE
+        file_path: Đường dẫn file
+        usecols: Chỉ parse các cột này (None = tất cả)
         
     Returns:
-        DataFrame đã được xử lý cơ bản
+        Tuple (DataFrame thô, encoding đã dùng)
     """
-    if file_path is None:
-        file_path = SUPPLY_CHAIN_FILE
-    
-    # Thử các encoding phổ biến
     encodings = ['latin-1', 'utf-8', 'iso-8859-1', 'cp1252']
-    df = None
     
     for encoding in encodings:
         try:
-            df = pd.read_csv(file_path, encoding=encoding, low_memory=False)
+            df = pd.read_csv(
+                file_path,
+                encoding=encoding,
+                low_memory=False,
+                usecols=(lambda c: c in usecols) if usecols is not None else None
+            )
             print(f"✓ Đọc thành công với encoding: {encoding}")
-            break
+            return df, encoding
         except UnicodeDecodeError:
             continue
     
-    if df is None:
-        raise ValueError(f"Không thể đọc file {file_path} với các encoding đã thử")
+    raise ValueError(f"Không thể đọc file {file_path} với các encoding đã thử")
+
+
+def _read_supply_chain_filtered(
+    file_path: str,
+    usecols: Optional[List[str]],
+    filters: Filters,
+    normalize: bool,
+    compact: bool
+) -> pd.DataFrame:
+    """
+    Đọc CSV chuỗi cung ứng theo chunk, xử lý từng chunk và chỉ giữ các dòng khớp ``filters``.
     
-    # Chuyển đổi cột ngày tháng
-    date_columns = ['order date (DateOrders)', 'shipping date (DateOrders)']
-    for col in date_columns:
-        if col in df.columns:
-            # Thử nhiều format ngày khác nhau
-            df[col] = pd.to_datetime(df[col], errors='coerce', infer_datetime_format=True)
+    Bộ nhớ đỉnh chỉ còn một chunk thô cộng phần đã lọc. Format ngày nhận diện ở chunk
+    đầu được dùng lại cho các chunk sau; compact chạy một lần trên kết quả cuối để các
+    cột categorical có chung một bộ category.
+    """
+    encodings = ['latin-1', 'utf-8', 'iso-8859-1', 'cp1252']
+    usecols_arg = (lambda c: c in usecols) if usecols is not None else None
+    
+    for encoding in encodings:
+        kept = []
+        date_formats = None
+        try:
+            for chunk in pd.read_csv(file_path, encoding=encoding, low_memory=False,
+                                     usecols=usecols_arg, chunksize=CSV_FILTER_CHUNK_SIZE):
+                chunk = _prepare_supply_chain_rows(chunk, normalize, False, date_formats)
+                date_formats = chunk.attrs.get('date_formats') or None
+                kept.append(apply_filters(chunk, filters=filters))
+        except UnicodeDecodeError:
+            continue
+        print(f"✓ Đọc thành công với encoding: {encoding}")
+        df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame()
+        df.attrs['date_formats'] = date_formats or {}
+        if compact and not df.empty:
+            df, report = compact_dataframe(df)
+            df.attrs['compaction_report'] = report
+            print(f"✓ Compact dtypes: {report['total_before'] / 1e6:.1f} MB -> {report['total_after'] / 1e6:.1f} MB")
+        return df
+    
+    raise ValueError(f"Không thể đọc file {file_path} với các encoding đã thử")
+
+
+@cached(ttl=86400, stale_ttl=3600, refresh_ahead=300)  # Cache for 24 hours (invalidated when the source files change)
+def load_supply_chain_data(
+    file_path: Optional[str] = None,
+    normalize: bool = True,
+    use_columnar_cache: bool = True,
+    columns: Optional[List[str]] = None,
+    filters: Optional[Filters] = None,
+    compact: bool = False
+) -> pd.DataFrame:
+    """
+    Đọc file CSV chuỗi cung ứng với encoding phù hợp.
+    
+    Kết quả đã xử lý được lưu thành columnar cache (Parquet + manifest) cạnh file CSV;
+    các lần load sau đọc thẳng từ cache và chỉ build lại khi file nguồn thay đổi.
+    Khi bật DATASTORM_SHARED_DATASET, toàn bộ dataset được memory-map từ một segment
+    Arrow dùng chung cho mọi worker thay vì mỗi worker giữ một bản sao riêng.
+    
+    Args:
+        file_path: Đường dẫn file, mặc định dùng SUPPLY_CHAIN_FILE
+        normalize: Có chuẩn hoá dữ liệu không
+        use_columnar_cache: Có dùng/ghi columnar cache không
+        columns: Chỉ lấy các cột này (None = tất cả), được đẩy xuống reader
+        filters: Danh sách điều kiện (cột, op, giá trị) kết hợp AND, ví dụ
+            [('Order Region', '==', 'Western Europe'),
+             ('order date (DateOrders)', '>=', '2017-01-01')]
+        compact: Chuyển chuỗi ít giá trị sang category và downcast cột số
+            (báo cáo bytes trước/sau nằm trong df.attrs['compaction_report'])
+        
+    Returns:
+        DataFrame đã được xử lý cơ bản
+    """
+    if file_path is None:
+        file_path = SUPPLY_CHAIN_FILE
+    
+    # File nguồn (và bảng alias quốc gia khi chuẩn hoá) thay đổi -> cache bị huỷ
+    dependencies = record_file_dependency(file_path, *([COUNTRY_ALIASES_FILE] if normalize else []))
+    if use_columnar_cache and columns is None and filters is None and shared_mode_enabled():
+        df = _load_shared_supply_chain(file_path, normalize, compact)
+    else:
+        df = _load_supply_chain_frame(file_path, normalize, use_columnar_cache, columns, filters, compact)
+    return _tag_loaded_frame(df, dependencies, normalize=normalize, columns=columns, filters=filters, compact=compact)
+
+
+def _tag_loaded_frame(df: pd.DataFrame, dependencies: dict, **params) -> pd.DataFrame:
+    """
+    Gắn version token (chữ ký các file nguồn + tham số load) để @cached của các hàm
+    analytics nhận diện frame bằng tra token thay vì hash dữ liệu, và để kết quả tính
+    trên frame bị huỷ khi file nguồn thay đổi.
+    """
+    return tag_frame(df, cache_key(dependencies, **params), dependencies)
+
+
+def _store_variant(normalize: bool, compact: bool) -> str:
+    """Tên biến thể của columnar cache (mỗi tổ hợp xử lý một store riêng)."""
+    variant = 'normalized' if normalize else 'raw'
+    return f'{variant}-compact' if compact else variant
+
+
+def _load_shared_supply_chain(file_path: str, normalize: bool, compact: bool) -> pd.DataFrame:
+    """Attach segment dùng chung; build columnar cache trước nếu cần."""
+    variant = _store_variant(normalize, compact)
+    store_dir = store_dir_for(file_path, variant)
+    if not is_store_fresh(store_dir, file_path, _pipeline_signature()):
+        _load_supply_chain_frame(file_path, normalize, True, None, None, compact)
+    
+    df = shared_dataset.get_or_build(
+        f'supply_chain_{variant}',
+        store_token(store_dir),
+        lambda: read_store(store_dir)
+    )
+    print(f"✓ Attach shared dataset (memory-mapped): supply_chain_{variant}")
+    return df
+
+
+def _prepare_supply_chain_rows(
+    df: pd.DataFrame,
+    normalize: bool,
+    compact: bool,
+    date_formats: Optional[dict] = None
+) -> pd.DataFrame:
+    """
+    Pipeline xử lý dòng thô: parse ngày, ép kiểu số, normalize, validate, compact.
+    
+    Dùng chung cho lần build đầy đủ và cho các dòng mới được ingest incremental.
+    
+    Args:
+        df: DataFrame thô vừa đọc từ CSV
+        normalize: Có chuẩn hoá dữ liệu không
+        compact: Có compact dtypes không
+        date_formats: Format ngày đã nhận diện ở lần build trước (None = tự nhận diện)
+        
+    Returns:
+        DataFrame đã xử lý (df.attrs['date_formats'] ghi lại format đã dùng)
+    """
+    if date_formats:
+        df.attrs['date_formats'] = dict(date_formats)
+    
+    # Chuyển đổi cột ngày tháng (nhận diện format một lần, parse theo giá trị phân biệt)
+    parse_date_columns(df, SUPPLY_CHAIN_DATE_COLUMNS)
+    formats = df.attrs.get('date_formats', {})
     
     # Chuyển đổi các cột số
-    numeric_columns = [
-        'Days for shipping (real)',
-        'Days for shipment (scheduled)',
-        'Benefit per order',
-        'Sales per customer',
-        'Late_delivery_risk',
-        'Category Id',
-        'Customer Id',
-        'Order Id',
-        'Order Item Quantity',
-        'Order Item Discount',
-        'Order Item Discount Rate',
-        'Order Item Profit Ratio',
-        'Order Item Total',
-        'Sales',
-        'Order Profit Per Order',
-        'Order Item Product Price',
-        'Product Price'
-    ]
-    
-    for col in numeric_columns:
+    for col in SUPPLY_CHAIN_NUMERIC_COLUMNS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
     
@@ -89,16 +264,237 @@ def load_supply_chain_data(file_path: Optional[str] = None, normalize: bool = Tr
     if validation['warnings']:
         print(f"⚠️ Warnings: {validation['warnings']}")
     
+    # Compact dtypes (categorical + downcast)
+    if compact:
+        df, report = compact_dataframe(df)
+        df.attrs['compaction_report'] = report
+        print(f"✓ Compact dtypes: {report['total_before'] / 1e6:.1f} MB -> {report['total_after'] / 1e6:.1f} MB")
+    
+    df.attrs['date_formats'] = formats
     return df
 
 
-@cached(ttl=7200)  # Cache for 2 hours
-def load_weather_data(file_path: Optional[str] = None) -> pd.DataFrame:
+def _store_extra(df: pd.DataFrame, file_path: str) -> dict:
+    """Thông tin ghi thêm vào manifest: chữ ký pipeline, format ngày và watermark cho ingest incremental."""
+    date_col = 'order date (DateOrders)'
+    max_date = df[date_col].max() if date_col in df.columns else None
+    return {
+        **_pipeline_signature(),
+        'date_formats': df.attrs.get('date_formats', {}),
+        'watermark': csv_watermark(file_path, rows=len(df), max_date=max_date)
+    }
+
+
+def ingest_supply_chain_appends(
+    file_path: Optional[str] = None,
+    normalize: bool = True,
+    compact: bool = False
+) -> Optional[Delta]:
+    """
+    Ingest incremental các dòng mới được ghi thêm vào cuối file CSV chuỗi cung ứng.
+    
+    Chỉ phần byte sau watermark của columnar cache được parse, xử lý bằng cùng pipeline
+    và ghi thành một part mới; delta được phát tới các listener đã đăng ký cho
+    'supply_chain'. Nếu file bị ghi lại (không chỉ append) hoặc chưa có cache thì
+    build lại toàn bộ.
+    
+    Args:
+        file_path: Đường dẫn file, mặc định dùng SUPPLY_CHAIN_FILE
+        normalize: Biến thể cache normalized/raw
+        compact: Biến thể cache compact
+        
+    Returns:
+        Delta các dòng mới (có thể rỗng), None nếu đã phải build lại toàn bộ
+    """
+    if file_path is None:
+        file_path = SUPPLY_CHAIN_FILE
+    
+    variant = _store_variant(normalize, compact)
+    store_dir = store_dir_for(file_path, variant)
+    manifest = read_manifest(store_dir)
+    signature = _pipeline_signature()
+    
+    delta = None
+    if manifest is not None and all(manifest.get(k) == v for k, v in signature.items()):
+        delta = ingest_appended_rows(
+            'supply_chain',
+            variant,
+            store_dir,
+            file_path,
+            prepare=lambda raw, m: _prepare_supply_chain_rows(raw, normalize, compact, m.get('date_formats')),
+            date_column='order date (DateOrders)'
+        )
+    
+    if delta is None:
+        print(f"⚠️ Không ingest incremental được {file_path}, build lại columnar cache")
+        _load_supply_chain_frame(file_path, normalize, True, None, None, compact)
+    elif delta.empty:
+        return delta
+    else:
+        print(f"✓ Ingest {len(delta.rows)} dòng mới vào {store_dir}")
+    
+    # Kết quả @cached cũ không còn đúng; lần load sau đọc lại từ columnar cache
+    invalidate_cache_pattern('load_supply_chain_data:')
+    return delta
+
+
+def supply_chain_store_build(
+    file_path: Optional[str] = None,
+    normalize: bool = True,
+    compact: bool = False
+) -> Optional[str]:
+    """Định danh lần build columnar cache hiện tại (ghi lại cùng frame vừa load để dùng với ``catch_up_supply_chain``)."""
+    return store_build(store_dir_for(file_path or SUPPLY_CHAIN_FILE, _store_variant(normalize, compact)))
+
+
+def catch_up_supply_chain(
+    loaded_rows: int,
+    build: Optional[str],
+    file_path: Optional[str] = None,
+    normalize: bool = True,
+    compact: bool = False
+) -> Optional[Delta]:
+    """
+    Các dòng được ghi thêm vào columnar cache sau khi một frame đã được load từ đó.
+    
+    Dùng cho cache trong process khác với process chạy ingest (ví dụ server khi script
+    ingest hằng đêm chạy riêng): chỉ đọc các part mới thay vì load lại toàn bộ.
+    
+    Args:
+        loaded_rows: Số dòng của frame đang cache
+        build: ``supply_chain_store_build(...)`` ghi lại lúc load frame
+        file_path: Đường dẫn file, mặc định dùng SUPPLY_CHAIN_FILE
+        normalize: Biến thể cache normalized/raw
+        compact: Biến thể cache compact
+        
+    Returns:
+        Delta các dòng mới (có thể rỗng), None nếu không nối được (store bị build lại,
+        CSV bị ghi lại hoặc chưa được ingest) và cần load lại toàn bộ
+    """
+    if file_path is None:
+        file_path = SUPPLY_CHAIN_FILE
+    variant = _store_variant(normalize, compact)
+    return catch_up_delta(
+        'supply_chain',
+        variant,
+        store_dir_for(file_path, variant),
+        file_path,
+        loaded_rows,
+        build,
+        expected=_pipeline_signature()
+    )
+
+
+def _load_supply_chain_frame(
+    file_path: str,
+    normalize: bool,
+    use_columnar_cache: bool,
+    columns: Optional[List[str]],
+    filters: Optional[Filters],
+    compact: bool = False
+) -> pd.DataFrame:
+    """Đọc dataset chuỗi cung ứng từ columnar cache hoặc CSV (không qua @cached)."""
+    store_dir = store_dir_for(file_path, _store_variant(normalize, compact))
+    if use_columnar_cache and is_store_fresh(store_dir, file_path, _pipeline_signature()):
+        # Lỗi của chính request (filter sai, cột không tồn tại) được trả cho caller
+        manifest = read_manifest(store_dir)
+        if manifest is not None:
+            check_filters(manifest, filters)
+        try:
+            df = read_store(store_dir, columns=columns, filters=filters)
+            print(f"✓ Đọc từ columnar cache: {store_dir}")
+            return df
+        except Exception as e:
+            # Store hỏng hoặc bị cắt dở (ArrowInvalid, OSError, ...): đọc lại CSV và build lại
+            print(f"⚠️ Không đọc được columnar cache, đọc lại CSV: {e}")
+    
+    if not use_columnar_cache:
+        # Không ghi cache thì chỉ cần đọc các cột được yêu cầu; có filter thì đọc theo chunk
+        usecols = projection_columns(columns, filters)
+        if filters:
+            df = _read_supply_chain_filtered(file_path, usecols, filters, normalize, compact)
+            return apply_filters(df, columns=columns)
+        df, _ = _read_supply_chain_csv(file_path, usecols=usecols)
+        df = _prepare_supply_chain_rows(df, normalize, compact)
+        return apply_filters(df, columns=columns)
+    
+    # Build columnar cache cần toàn bộ cột và dòng (các lần đọc sau mới pushdown
+    # columns/filters vào Parquet), nên lần đọc CSV này không chiếu cột hay lọc theo chunk
+    df, encoding = _read_supply_chain_csv(file_path)
+    
+    df = _prepare_supply_chain_rows(df, normalize, compact)
+    
+    try:
+        write_store(df, store_dir, file_path, encoding=encoding, extra=_store_extra(df, file_path))
+    except Exception as e:
+        print(f"⚠️ Không ghi được columnar cache: {e}")
+    
+    return apply_filters(df, filters=filters, columns=columns)
+
+
+# Các cột số thời tiết
+WEATHER_NUMERIC_COLUMNS = [
+    'lat', 'lon',
+    'temperature_2m_mean',
+    'temperature_2m_max',
+    'temperature_2m_min',
+    'relative_humidity_2m_mean',
+    'wind_speed_10m_mean',
+    'precipitation_sum',
+    'apparent_temperature_mean',
+    'dew_point_2m_mean',
+    'sunshine_duration',
+    'snowfall_sum',
+    'precipitation_hours',
+    'shortwave_radiation_sum',
+    'wind_direction_10m_dominant',
+    'weather_code'
+]
+
+def _prepare_weather_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Chuyển đổi kiểu dữ liệu cho (một phần) DataFrame thời tiết."""
+    # Chuyển đổi cột ngày
+    if 'order_date' in df.columns:
+        df['order_date'] = parse_dates(df['order_date'])
+    
+    # Chuyển đổi các cột số thời tiết
+    for col in WEATHER_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    return df
+
+
+def _read_weather_csv(file_path: str, encoding: str, usecols: Optional[List[str]],
+                      filters: Optional[Filters]) -> pd.DataFrame:
+    """Đọc CSV thời tiết; khi có filter thì đọc theo chunk và chỉ giữ các dòng khớp."""
+    usecols_arg = (lambda c: c in usecols) if usecols is not None else None
+    
+    if not filters:
+        df = pd.read_csv(file_path, encoding=encoding, low_memory=False, usecols=usecols_arg)
+        return _prepare_weather_frame(df)
+    
+    kept = []
+    for chunk in pd.read_csv(file_path, encoding=encoding, low_memory=False,
+                             usecols=usecols_arg, chunksize=CSV_FILTER_CHUNK_SIZE):
+        chunk = _prepare_weather_frame(chunk)
+        kept.append(apply_filters(chunk, filters=filters))
+    return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame()
+
+
+@cached(ttl=86400, stale_ttl=3600, refresh_ahead=300)  # Cache for 24 hours (invalidated when the source files change)
+def load_weather_data(
+    file_path: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    filters: Optional[Filters] = None
+) -> pd.DataFrame:
     """
     Đọc file CSV dữ liệu thời tiết.
     
     Args:
         file_path: Đường dẫn file, mặc định dùng WEATHER_FILE
+        columns: Chỉ lấy các cột này (None = tất cả)
+        filters: Danh sách điều kiện (cột, op, giá trị), ví dụ [('country', '==', 'France')]
         
     Returns:
         DataFrame đã được xử lý cơ bản
@@ -106,43 +502,40 @@ def load_weather_data(file_path: Optional[str] = None) -> pd.DataFrame:
     if file_path is None:
         file_path = WEATHER_FILE
     
+    dependencies = record_file_dependency(file_path)
+    if columns is None and filters is None and shared_mode_enabled():
+        df = shared_dataset.get_or_build(
+            'weather',
+            source_token(file_path),
+            lambda: _load_weather_frame(file_path, None, None)
+        )
+        print("✓ Attach shared dataset (memory-mapped): weather")
+    else:
+        df = _load_weather_frame(file_path, columns, filters)
+    return _tag_loaded_frame(df, dependencies, columns=columns, filters=filters)
+
+
+def _load_weather_frame(
+    file_path: str,
+    columns: Optional[List[str]],
+    filters: Optional[Filters]
+) -> pd.DataFrame:
+    """Đọc CSV thời tiết (không qua @cached)."""
+    usecols = projection_columns(columns, filters)
+    
     try:
-        df = pd.read_csv(file_path, encoding='utf-8', low_memory=False)
+        df = _read_weather_csv(file_path, 'utf-8', usecols, filters)
         print(f"✓ Đọc thành công file thời tiết")
     except Exception as e:
         # Thử encoding khác nếu cần
         try:
-            df = pd.read_csv(file_path, encoding='latin-1', low_memory=False)
+            df = _read_weather_csv(file_path, 'latin-1', usecols, filters)
             print(f"✓ Đọc thành công file thời tiết với encoding latin-1")
         except:
             raise ValueError(f"Không thể đọc file {file_path}: {e}")
     
-    # Chuyển đổi cột ngày
-    if 'order_date' in df.columns:
-        df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
-    
-    # Chuyển đổi các cột số thời tiết
-    weather_numeric_columns = [
-        'lat', 'lon',
-        'temperature_2m_mean',
-        'temperature_2m_max',
-        'temperature_2m_min',
-        'relative_humidity_2m_mean',
-        'wind_speed_10m_mean',
-        'precipitation_sum',
-        'apparent_temperature_mean',
-        'dew_point_2m_mean',
-        'sunshine_duration',
-        'snowfall_sum',
-        'precipitation_hours',
-        'shortwave_radiation_sum',
-        'wind_direction_10m_dominant',
-        'weather_code'
-    ]
-    
-    for col in weather_numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
     
     return df
 
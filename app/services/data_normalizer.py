@@ -2,9 +2,14 @@
 Module chuẩn hóa dữ liệu: country names, dates, và các giá trị khác.
 """
 
+import os
+import time
+import numpy as np
 import pandas as pd
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, Union
 from datetime import datetime
+from app.services.date_parser import is_parsed, parse_dates
 
 
 # Country name mapping
@@ -22,13 +27,46 @@ COUNTRY_MAPPING = {
     'VN': 'Viet Nam',
 }
 
+# Bảng alias mở rộng (CSV: alias,country), được gộp thêm vào COUNTRY_MAPPING
+COUNTRY_ALIASES_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'reference', 'country_aliases.csv'
+)
 
-def normalize_country(country_name: str) -> str:
+
+def load_country_aliases(path: Optional[str] = None) -> Dict[str, str]:
+    """
+    Đọc bảng alias quốc gia từ file CSV (2 cột: alias, country).
+    
+    Args:
+        path: Đường dẫn file, mặc định dùng COUNTRY_ALIASES_FILE
+        
+    Returns:
+        Dictionary alias -> tên chuẩn (rỗng nếu không có file)
+    """
+    path = path or COUNTRY_ALIASES_FILE
+    if not os.path.exists(path):
+        return {}
+    
+    table = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8')
+    table = table[(table['alias'].str.strip() != '') & (table['country'].str.strip() != '')]
+    return dict(zip(table['alias'].str.strip(), table['country'].str.strip()))
+
+
+@lru_cache(maxsize=8)
+def get_country_mapping(path: Optional[str] = None) -> Dict[str, str]:
+    """COUNTRY_MAPPING gộp với bảng alias từ file (được cache theo đường dẫn)."""
+    mapping = dict(load_country_aliases(path))
+    mapping.update(COUNTRY_MAPPING)
+    return mapping
+
+
+def normalize_country(country_name: str, mapping: Optional[Dict[str, str]] = None) -> str:
     """
     Chuẩn hóa tên quốc gia.
     
     Args:
         country_name: Tên quốc gia cần chuẩn hóa
+        mapping: Bảng alias, mặc định COUNTRY_MAPPING
         
     Returns:
         Tên quốc gia đã chuẩn hóa
@@ -39,12 +77,53 @@ def normalize_country(country_name: str) -> str:
     country_name = str(country_name).strip()
     
     # Check mapping
-    if country_name in COUNTRY_MAPPING:
-        return COUNTRY_MAPPING[country_name]
+    mapping = COUNTRY_MAPPING if mapping is None else mapping
+    if country_name in mapping:
+        return mapping[country_name]
     
     return country_name
 
 
+def _map_unique_values(series: pd.Series, func: Callable, missing_value) -> Tuple[pd.Series, int]:
+    """
+    Áp dụng func trên các giá trị phân biệt rồi "take" lại theo codes.
+    
+    Chi phí tỉ lệ với số giá trị phân biệt thay vì số dòng.
+    
+    Returns:
+        Tuple (Series kết quả, số giá trị phân biệt)
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    
+    # Phần tử cuối dành cho NaN: code -1 lấy đúng phần tử này
+    mapped = np.empty(len(uniques) + 1, dtype=object)
+    for i, value in enumerate(uniques):
+        mapped[i] = func(value)
+    mapped[-1] = missing_value
+    
+    result = pd.Series(mapped[codes], index=series.index, name=series.name)
+    return result.infer_objects(), len(uniques)
+
+
+def normalize_country_series(series: pd.Series, mapping: Optional[Dict[str, str]] = None) -> pd.Series:
+    """
+    Chuẩn hóa cả cột quốc gia (vectorized, chỉ xử lý các giá trị phân biệt).
+    
+    Args:
+        series: Cột tên quốc gia
+        mapping: Bảng alias, mặc định COUNTRY_MAPPING
+        
+    Returns:
+        Series đã chuẩn hóa (cùng kết quả với apply(normalize_country))
+    """
+    result, _ = _map_unique_values(series, lambda v: normalize_country(v, mapping), 'Unknown')
+    return result
+
+
 def normalize_date(date_value) -> Optional[datetime]:
     """
     Chuẩn hóa ngày về datetime object.
@@ -75,31 +154,59 @@ def normalize_date(date_value) -> Optional[datetime]:
         return None
 
 
-def normalize_dataframe(df: pd.DataFrame, normalize_countries: bool = True) -> pd.DataFrame:
+def normalize_dataframe(
+    df: pd.DataFrame,
+    normalize_countries: bool = True,
+    country_mapping: Optional[Dict[str, str]] = None,
+    return_stats: bool = False
+) -> Union[pd.DataFrame, Tuple[pd.DataFrame, Dict]]:
     """
     Chuẩn hóa toàn bộ DataFrame.
     
+    Các cột quốc gia và ngày được chuẩn hóa theo từng giá trị phân biệt
+    (factorize -> map bảng alias -> take), không phải từng dòng.
+    
     Args:
         df: DataFrame cần chuẩn hóa
         normalize_countries: Có chuẩn hóa tên quốc gia không
+        country_mapping: Bảng alias quốc gia, mặc định COUNTRY_MAPPING + data/reference/country_aliases.csv
+        return_stats: Trả thêm thống kê thời gian xử lý từng cột
         
     Returns:
-        DataFrame đã được chuẩn hóa
+        DataFrame đã được chuẩn hóa, hoặc (DataFrame, stats) nếu return_stats=True
     """
+    start = time.perf_counter()
+    stats = {'rows': len(df), 'columns': {}}
     df = df.copy()
     
     # Normalize country columns
     if normalize_countries:
+        mapping = get_country_mapping() if country_mapping is None else country_mapping
         country_columns = ['Order Country', 'Customer Country']
         for col in country_columns:
             if col in df.columns:
-                df[col] = df[col].apply(normalize_country)
+                col_start = time.perf_counter()
+                df[col], n_unique = _map_unique_values(
+                    df[col], lambda v: normalize_country(v, mapping), 'Unknown'
+                )
+                stats['columns'][col] = {
+                    'unique_values': n_unique,
+                    'seconds': time.perf_counter() - col_start
+                }
     
     # Normalize date columns
     date_columns = [col for col in df.columns if 'date' in col.lower()]
     for col in date_columns:
         if col in df.columns:
-            df[col] = df[col].apply(normalize_date)
+            # Cột đã là datetime (parse lúc load) thì bỏ qua
+            if is_parsed(df[col]):
+                continue
+            col_start = time.perf_counter()
+            df[col] = parse_dates(df[col])
+            stats['columns'][col] = {
+                'unique_values': int(df[col].nunique()),
+                'seconds': time.perf_counter() - col_start
+            }
     
     # Normalize numeric columns (remove negative values where not allowed)
     if 'Sales' in df.columns:
@@ -109,6 +216,9 @@ def normalize_dataframe(df: pd.DataFrame, normalize_countries: bool = True) -> p
         # Allow negative (losses are valid)
         pass
     
+    stats['total_seconds'] = time.perf_counter() - start
+    if return_stats:
+        return df, stats
     return df
 
 
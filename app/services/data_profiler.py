@@ -1,12 +1,27 @@
 """
 Module để phân tích chất lượng dữ liệu và tạo báo cáo.
+
+``check_data_quality``/``detect_outliers`` làm việc trên DataFrame đã nằm trong RAM.
+``StreamingProfiler`` (và ``profile_dataset``) tạo cùng báo cáo trong một lượt đọc
+theo chunk, mỗi cột chỉ giữ các sketch có bộ nhớ giới hạn (xem ``app.services.sketches``),
+nên có thể profile dataset lớn hơn RAM.
 """
 
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Union
 from datetime import datetime
 
+from app.services.date_parser import detect_date_format, parse_dates
+from app.services.sketches import HyperLogLog, QuantileSketch, RunningMoments, TopK
+
+SENSITIVE_KEYWORDS = ['password', 'email', 'credit', 'card', 'ssn', 'phone', 'address']
+COUNTRY_VARIATION_COLUMNS = {
+    'Order Country': 'country_variations',
+    'Customer Country': 'customer_country_variations',
+}
+
 
 def detect_outliers(df: pd.DataFrame, column: str, method: str = 'iqr') -> Dict:
     """
@@ -102,10 +117,9 @@ def check_data_quality(df: pd.DataFrame, name: str = "Dataset") -> Dict:
         quality_report['data_types'][col] = str(df[col].dtype)
     
     # Tìm các cột nhạy cảm
-    sensitive_keywords = ['password', 'email', 'credit', 'card', 'ssn', 'phone', 'address']
     for col in df.columns:
         col_lower = col.lower()
-        if any(keyword in col_lower for keyword in sensitive_keywords):
+        if any(keyword in col_lower for keyword in SENSITIVE_KEYWORDS):
             quality_report['sensitive_columns'].append(col)
     
     # Kiểm tra format ngày tháng
@@ -146,3 +160,303 @@ def check_data_quality(df: pd.DataFrame, name: str = "Dataset") -> Dict:
     
     return quality_report
 
+
+# Số dòng chứa trong một chunk khi profile file CSV
+PROFILE_CHUNK_SIZE = 100_000
+
+# Số hash dòng tối đa giữ lại để đếm dòng trùng chính xác; vượt ngưỡng thì
+# chuyển sang ước lượng bằng HyperLogLog
+MAX_ROW_HASHES = 10_000_000
+
+# Số giá trị nhỏ nhất/lớn nhất giữ lại mỗi cột số để làm ví dụ outlier
+OUTLIER_EXAMPLES = 10
+
+
+def _extremes(smallest: np.ndarray, largest: np.ndarray, values: np.ndarray):
+    """Giữ OUTLIER_EXAMPLES giá trị nhỏ nhất và lớn nhất đã gặp."""
+    n = OUTLIER_EXAMPLES
+    if len(values) > n:
+        low, high = np.partition(values, n - 1)[:n], np.partition(values, len(values) - n)[-n:]
+    else:
+        low = high = values
+    return np.sort(np.concatenate([smallest, low]))[:n], np.sort(np.concatenate([largest, high]))[-n:]
+
+
+class ColumnProfile:
+    """Các sketch của một cột: count, null, min/max, mean/var, quantile, top-k, distinct."""
+
+    def __init__(self, name: str, quantile_k: int = 512, topk_capacity: int = 64, hll_precision: int = 14):
+        self.name = name
+        self.dtype: Optional[str] = None
+        self.count = 0
+        self.nulls = 0
+        self.moments = RunningMoments()
+        self.quantiles = QuantileSketch(k=quantile_k)
+        self.top_values = TopK(capacity=topk_capacity)
+        self.distinct = HyperLogLog(p=hll_precision)
+        self.smallest = np.empty(0, dtype='float64')
+        self.largest = np.empty(0, dtype='float64')
+        self.date_format: Optional[str] = None
+        self.invalid_dates = 0
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.moments.count > 0
+
+    def _merge_dtype(self, dtype: str) -> None:
+        """Kiểu của cột qua các chunk: int + float -> float64, khác loại -> object."""
+        if self.dtype is None or self.dtype == dtype:
+            self.dtype = dtype
+        elif all(d.startswith(('int', 'float')) for d in (self.dtype, dtype)):
+            self.dtype = 'float64'
+        else:
+            self.dtype = 'object'
+
+    def update(self, series: pd.Series, is_date: bool = False) -> None:
+        self.count += len(series)
+        nulls = int(series.isna().sum())
+        self.nulls += nulls
+        self._merge_dtype(str(series.dtype))
+
+        values = series.dropna()
+        if values.empty:
+            if is_date:
+                self.invalid_dates += nulls
+            return
+        self.distinct.update(values)
+        self.top_values.update(values)
+
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            numeric = values.to_numpy(dtype='float64')
+            self.moments.update(numeric)
+            self.quantiles.update(numeric)
+            self.smallest, self.largest = _extremes(self.smallest, self.largest, numeric)
+
+        if is_date:
+            if self.date_format is None and not pd.api.types.is_datetime64_any_dtype(series):
+                self.date_format = detect_date_format(values.unique())
+            self.invalid_dates += int(parse_dates(series, fmt=self.date_format).isna().sum())
+
+    def merge(self, other: 'ColumnProfile') -> 'ColumnProfile':
+        if other.dtype is not None:
+            self._merge_dtype(other.dtype)
+        self.count += other.count
+        self.nulls += other.nulls
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        self.top_values.merge(other.top_values)
+        self.distinct.merge(other.distinct)
+        self.smallest, self.largest = _extremes(
+            self.smallest, self.largest, np.concatenate([other.smallest, other.largest])
+        )
+        self.date_format = self.date_format or other.date_format
+        self.invalid_dates += other.invalid_dates
+        return self
+
+    def summary(self) -> Dict:
+        """Thống kê tóm tắt của cột (quantile/distinct là giá trị xấp xỉ khi dữ liệu lớn)."""
+        summary = {
+            'dtype': self.dtype,
+            'count': self.count,
+            'nulls': self.nulls,
+            'distinct_estimate': self.distinct.estimate(),
+            'top_values': [(value, count) for value, count in self.top_values.top(10)],
+        }
+        if self.is_numeric:
+            summary.update({
+                'min': self.moments.min,
+                'max': self.moments.max,
+                'mean': self.moments.mean,
+                'std': self.moments.std(),
+                'q1': self.quantiles.quantile(0.25),
+                'median': self.quantiles.quantile(0.5),
+                'q3': self.quantiles.quantile(0.75),
+            })
+        return summary
+
+
+class StreamingProfiler:
+    """
+    Profile dữ liệu trong một lượt đọc theo chunk với bộ nhớ giới hạn.
+
+    Gọi ``update`` cho từng chunk (hoặc ``merge`` các profiler dựng song song trên các
+    phần dữ liệu khác nhau), sau đó ``quality_report()`` trả về báo cáo cùng cấu trúc
+    với ``check_data_quality`` và ``outliers()`` cùng cấu trúc với ``detect_outliers``.
+    """
+
+    def __init__(self, name: str = "Dataset", quantile_k: int = 512, topk_capacity: int = 64,
+                 hll_precision: int = 14):
+        self.name = name
+        self.total_rows = 0
+        self.columns: Dict[str, ColumnProfile] = {}
+        self._sketch_args = dict(quantile_k=quantile_k, topk_capacity=topk_capacity, hll_precision=hll_precision)
+        self._row_hashes = np.empty(0, dtype=np.uint64)
+        self._row_hll: Optional[HyperLogLog] = None
+
+    def _column(self, name: str) -> ColumnProfile:
+        if name not in self.columns:
+            self.columns[name] = ColumnProfile(name, **self._sketch_args)
+        return self.columns[name]
+
+    def _add_row_hashes(self, hashes: np.ndarray) -> None:
+        if self._row_hll is not None:
+            self._row_hll.update_hashes(hashes)
+            return
+        self._row_hashes = np.unique(np.concatenate([self._row_hashes, hashes]))
+        if len(self._row_hashes) > MAX_ROW_HASHES:
+            self._row_hll = HyperLogLog(p=self._sketch_args['hll_precision']).update_hashes(self._row_hashes)
+            self._row_hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, chunk: pd.DataFrame) -> 'StreamingProfiler':
+        """Cập nhật các sketch với một chunk dữ liệu."""
+        if chunk.empty:
+            return self
+        self.total_rows += len(chunk)
+        for col in chunk.columns:
+            self._column(col).update(chunk[col], is_date='date' in col.lower())
+        self._add_row_hashes(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        return self
+
+    def merge(self, other: 'StreamingProfiler') -> 'StreamingProfiler':
+        """Gộp profiler dựng trên một phần dữ liệu khác (ví dụ chạy song song)."""
+        self.total_rows += other.total_rows
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        if other._row_hll is not None:
+            if self._row_hll is None:
+                self._row_hll = HyperLogLog(p=other._row_hll.p).update_hashes(self._row_hashes)
+                self._row_hashes = np.empty(0, dtype=np.uint64)
+            self._row_hll.merge(other._row_hll)
+        else:
+            self._add_row_hashes(other._row_hashes)
+        return self
+
+    @property
+    def duplicates_exact(self) -> bool:
+        return self._row_hll is None
+
+    def duplicate_rows(self) -> int:
+        distinct = len(self._row_hashes) if self._row_hll is None else self._row_hll.estimate()
+        return max(self.total_rows - distinct, 0)
+
+    def quality_report(self) -> Dict:
+        """Báo cáo chất lượng, cùng cấu trúc với ``check_data_quality``."""
+        total = self.total_rows
+        quality_report = {
+            'dataset_name': self.name,
+            'total_rows': total,
+            'total_columns': len(self.columns),
+            'missing_data': {},
+            'duplicate_rows': int(self.duplicate_rows()),
+            'data_types': {},
+            'sensitive_columns': [],
+            'format_issues': [],
+            'duplicate_rows_exact': self.duplicates_exact,
+            'column_stats': {name: column.summary() for name, column in self.columns.items()},
+        }
+
+        for col, column in self.columns.items():
+            if column.nulls > 0:
+                quality_report['missing_data'][col] = {
+                    'count': int(column.nulls),
+                    'percentage': round(float(column.nulls / total * 100), 2) if total else 0.0
+                }
+            quality_report['data_types'][col] = column.dtype
+            if any(keyword in col.lower() for keyword in SENSITIVE_KEYWORDS):
+                quality_report['sensitive_columns'].append(col)
+            if 'date' in col.lower() and column.invalid_dates > 0:
+                quality_report['format_issues'].append({
+                    'column': col,
+                    'issue': 'invalid_date_format',
+                    'count': int(column.invalid_dates),
+                    'percentage': float(column.invalid_dates / total * 100) if total else 0.0
+                })
+
+        for col, key in COUNTRY_VARIATION_COLUMNS.items():
+            if col in self.columns:
+                column = self.columns[col]
+                quality_report[key] = {
+                    'unique_count': column.distinct.estimate(),
+                    'examples': [value for value, _ in column.top_values.top(20)]
+                }
+
+        return quality_report
+
+    def outliers(self, column: str, method: str = 'iqr') -> Dict:
+        """Outliers của một cột số, cùng cấu trúc với ``detect_outliers`` (không đọc lại dữ liệu)."""
+        if column not in self.columns:
+            return {'error': f'Cột {column} không tồn tại'}
+        profile = self.columns[column]
+        total_values = profile.count - profile.nulls
+        if total_values == 0 or not profile.is_numeric:
+            return {'error': 'Không có dữ liệu'}
+
+        outliers_info = {
+            'column': column,
+            'method': method,
+            'total_values': total_values,
+            'outliers_count': 0,
+            'outliers_percentage': 0,
+            'outliers_examples': []
+        }
+
+        if method == 'iqr':
+            q1 = profile.quantiles.quantile(0.25)
+            q3 = profile.quantiles.quantile(0.75)
+            iqr = q3 - q1
+            lower_bound = q1 - 1.5 * iqr
+            upper_bound = q3 + 1.5 * iqr
+            outliers_info['bounds'] = {'lower': float(lower_bound), 'upper': float(upper_bound)}
+        elif method == 'zscore':
+            std = profile.moments.std()
+            if not std:
+                return outliers_info
+            lower_bound = profile.moments.mean - 3 * std
+            upper_bound = profile.moments.mean + 3 * std
+        else:
+            return outliers_info
+
+        count = profile.quantiles.count_outside(lower_bound, upper_bound)
+        outliers_info['outliers_count'] = count
+        outliers_info['outliers_percentage'] = count / total_values * 100
+        extremes = np.concatenate([profile.smallest, profile.largest[::-1]])
+        examples = [float(v) for v in extremes if v < lower_bound or v > upper_bound]
+        outliers_info['outliers_examples'] = list(dict.fromkeys(examples))[:OUTLIER_EXAMPLES]
+        return outliers_info
+
+
+def iter_chunks(source: Union[str, os.PathLike, pd.DataFrame, Iterable[pd.DataFrame]],
+                chunksize: int = PROFILE_CHUNK_SIZE, **read_csv_kwargs) -> Iterable[pd.DataFrame]:
+    """Chia nguồn dữ liệu (đường dẫn CSV, DataFrame hoặc iterable các DataFrame) thành chunk."""
+    if isinstance(source, (str, os.PathLike)):
+        read_csv_kwargs.setdefault('low_memory', False)
+        yield from pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs)
+    elif isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    else:
+        yield from source
+
+
+def profile_dataset(source: Union[str, os.PathLike, pd.DataFrame, Iterable[pd.DataFrame]],
+                    name: str = "Dataset", chunksize: int = PROFILE_CHUNK_SIZE,
+                    **read_csv_kwargs) -> StreamingProfiler:
+    """
+    Profile một dataset trong một lượt đọc.
+
+    Args:
+        source: Đường dẫn CSV (đọc theo chunk), DataFrame hoặc iterable các DataFrame
+        name: Tên dataset trong báo cáo
+        chunksize: Số dòng mỗi chunk
+        **read_csv_kwargs: Tham số thêm cho ``pd.read_csv`` (ví dụ encoding)
+
+    Returns:
+        StreamingProfiler đã cập nhật với toàn bộ dữ liệu
+    """
+    profiler = StreamingProfiler(name)
+    for chunk in iter_chunks(source, chunksize=chunksize, **read_csv_kwargs):
+        profiler.update(chunk)
+    return profiler
@@ -0,0 +1,162 @@
+"""
+Service parse ngày tháng dùng chung cho loader, analytics và dashboard.
+
+- Nhận diện format một lần trên mẫu giá trị rồi parse với format tường minh.
+- Chỉ parse các chuỗi phân biệt (factorize -> parse -> take), kết quả được cache
+  theo (format, chuỗi) để lần sau không parse lại.
+- Cột đã là datetime64 được coi là "đã parse": mọi hàm ở đây trả về nguyên trạng,
+  không tốn thời gian parse lại.
+"""
+
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Các format thường gặp, theo thứ tự ưu tiên (DataCo dùng '%m/%d/%Y %H:%M')
+DATE_FORMATS = [
+    '%m/%d/%Y %H:%M',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%Y/%m/%d',
+    '%Y-%m-%dT%H:%M:%S',
+]
+
+# Số giá trị phân biệt dùng để nhận diện format
+DETECT_SAMPLE_SIZE = 500
+
+# Giới hạn số phần tử của cache (xoá toàn bộ khi vượt)
+MAX_CACHE_ENTRIES = 2_000_000
+
+_parse_cache: Dict[Tuple[Optional[str], str], pd.Timestamp] = {}
+_cache_lock = threading.Lock()
+
+
+def is_parsed(series: pd.Series) -> bool:
+    """Cột đã là datetime64 thì không cần parse lại."""
+    return pd.api.types.is_datetime64_any_dtype(series)
+
+
+def detect_date_format(values: Iterable) -> Optional[str]:
+    """
+    Nhận diện format ngày từ một mẫu giá trị.
+
+    Args:
+        values: Các chuỗi ngày (NaN được bỏ qua)
+
+    Returns:
+        Format parse được nhiều giá trị nhất (None nếu không format nào khớp)
+    """
+    sample = pd.Series([v for v in values if isinstance(v, str) and v.strip()][:DETECT_SAMPLE_SIZE], dtype=object)
+    if sample.empty:
+        return None
+
+    best_format, best_ratio = None, 0.0
+    for fmt in DATE_FORMATS:
+        ratio = pd.to_datetime(sample, format=fmt, errors='coerce').notna().mean()
+        if ratio > best_ratio:
+            best_format, best_ratio = fmt, ratio
+            if ratio == 1.0:
+                break
+    return best_format
+
+
+def _parse_uniques(uniques: np.ndarray, fmt: Optional[str]) -> pd.DatetimeIndex:
+    """Parse các giá trị phân biệt, dùng cache cho các chuỗi đã gặp."""
+    keys = [(fmt, str(v)) for v in uniques]
+    with _cache_lock:
+        cached = [_parse_cache.get(k) for k in keys]
+
+    missing = [i for i, v in enumerate(cached) if v is None]
+    if missing:
+        raw = pd.Series([uniques[i] for i in missing], dtype=object)
+        if fmt is not None:
+            parsed = pd.to_datetime(raw, format=fmt, errors='coerce')
+            # Giá trị không khớp format chính: parse từng giá trị (chỉ các giá trị lỗi)
+            failed = parsed.isna() & raw.notna()
+            if failed.any():
+                parsed[failed] = pd.to_datetime(raw[failed], format='mixed', errors='coerce')
+        else:
+            parsed = pd.to_datetime(raw, format='mixed', errors='coerce')
+
+        with _cache_lock:
+            if len(_parse_cache) + len(missing) > MAX_CACHE_ENTRIES:
+                _parse_cache.clear()
+            for i, value in zip(missing, parsed):
+                cached[i] = value
+                _parse_cache[keys[i]] = value
+
+    return pd.DatetimeIndex(cached)
+
+
+def parse_dates(series: pd.Series, fmt: Optional[str] = None) -> pd.Series:
+    """
+    Parse một cột ngày.
+
+    Args:
+        series: Cột cần parse (chuỗi, category hoặc datetime)
+        fmt: Format tường minh; None = tự nhận diện
+
+    Returns:
+        Series datetime64[ns] (giá trị lỗi -> NaT); trả nguyên trạng nếu đã parse
+    """
+    if is_parsed(series):
+        return series
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = np.asarray(series.cat.categories, dtype=object)
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        uniques = np.asarray(uniques, dtype=object)
+
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=series.index, name=series.name, dtype='datetime64[ns]')
+
+    if fmt is None:
+        fmt = detect_date_format(uniques)
+    parsed = _parse_uniques(uniques, fmt)
+
+    values = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def ensure_datetime(df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Lấy cột ngày dưới dạng datetime mà không sửa DataFrame gốc.
+
+    Dùng trong analytics: DataFrame cache dùng chung giữa các request không bị mutate,
+    và cột đã parse lúc load trả về ngay.
+    """
+    return parse_dates(df[column])
+
+
+def parse_date_columns(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """
+    Parse (in-place) các cột ngày của DataFrame vừa đọc và ghi lại format đã dùng.
+
+    Format được lưu trong df.attrs['date_formats'] để các lần đọc dữ liệu mới
+    (ví dụ ingest incremental) dùng lại mà không phải nhận diện lại.
+    """
+    formats = dict(df.attrs.get('date_formats', {}))
+    for col in columns:
+        if col not in df.columns or is_parsed(df[col]):
+            continue
+        fmt = formats.get(col) or detect_date_format(pd.unique(df[col].dropna())[:DETECT_SAMPLE_SIZE])
+        df[col] = parse_dates(df[col], fmt=fmt)
+        if fmt:
+            formats[col] = fmt
+    df.attrs['date_formats'] = formats
+    return df
+
+
+def clear_parse_cache():
+    """Xoá cache parse."""
+    with _cache_lock:
+        _parse_cache.clear()
@@ -0,0 +1,229 @@
+"""
+Tầng cache trên đĩa cục bộ đặt sau ``TTLCache``.
+
+- Mỗi giá trị được pickle thành một file blob trong thư mục cache; một index SQLite
+  (``index.sqlite``) lưu key, file, kích thước, hạn dùng, cửa sổ stale, checksum và
+  lần truy cập cuối.
+- Đọc lại kiểm tra checksum (blake2b); blob hỏng hoặc thiếu bị xoá như một miss.
+- Tổng dung lượng giới hạn bởi ``max_bytes``, vượt thì xoá entry truy cập lâu nhất.
+- SQLite ở chế độ WAL nên nhiều worker trên cùng máy dùng chung được một thư mục;
+  kết quả ``@cached`` vì vậy còn nguyên sau khi restart/deploy.
+
+Bật bằng biến môi trường ``DATASTORM_CACHE_DIR`` (xem ``cache_manager``).
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("disk_cache")
+
+INDEX_FILE = "index.sqlite"
+BLOB_SUFFIX = ".pkl"
+
+# Giá trị lớn hơn ngưỡng này (bytes sau khi pickle) không được ghi xuống đĩa
+DEFAULT_MAX_ENTRY_BYTES = 1024 * 1024 * 1024
+
+
+class DiskCache:
+    """Cache key -> giá trị pickle trên đĩa, có TTL, cửa sổ stale, checksum và giới hạn dung lượng."""
+
+    def __init__(self, directory, max_bytes: Optional[int] = None,
+                 max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.evictions = 0
+        self.checksum_failures = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    checksum TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    stale_until REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    meta TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dependencies (
+                    key TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (key, path)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS dependencies_path ON dependencies(path)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Một connection mỗi thread (sqlite3 không chia sẻ connection giữa các thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.directory / INDEX_FILE, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _checksum(blob: bytes) -> str:
+        return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+    def _blob_path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha1(key.encode()).hexdigest() + BLOB_SUFFIX)
+
+    def _delete(self, conn: sqlite3.Connection, key: str, file: str) -> None:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.execute("DELETE FROM dependencies WHERE key = ?", (key,))
+        (self.directory / file).unlink(missing_ok=True)
+
+    def lookup(self, key: str) -> Tuple[str, Any, float, float, Optional[str]]:
+        """
+        Returns:
+            ``(status, value, expires_at, stale_until, meta)`` với status là
+            ``'fresh'``, ``'stale'`` hoặc ``'miss'`` (thời điểm theo ``time.time()``).
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT file, checksum, expires_at, stale_until, meta FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return 'miss', None, 0.0, 0.0, None
+        file, checksum, expires_at, stale_until, meta = row
+        now = time.time()
+        if now > stale_until:
+            self._delete(conn, key, file)
+            return 'miss', None, 0.0, 0.0, None
+        try:
+            blob = (self.directory / file).read_bytes()
+        except OSError:
+            self._delete(conn, key, file)
+            return 'miss', None, 0.0, 0.0, None
+        if self._checksum(blob) != checksum:
+            logger.warning("Disk cache checksum mismatch for %s; dropping entry", key)
+            self.checksum_failures += 1
+            self._delete(conn, key, file)
+            return 'miss', None, 0.0, 0.0, None
+        try:
+            value = pickle.loads(blob)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Disk cache entry %s could not be unpickled: %s", key, exc)
+            self._delete(conn, key, file)
+            return 'miss', None, 0.0, 0.0, None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        status = 'fresh' if now <= expires_at else 'stale'
+        return status, value, expires_at, stale_until, meta
+
+    def set(self, key: str, value: Any, expires_at: float, stale_until: float,
+            meta: Optional[str] = None, dependencies: Optional[List[str]] = None) -> bool:
+        """
+        Ghi giá trị; trả False nếu không pickle được hoặc quá lớn.
+
+        ``dependencies`` là các file entry phụ thuộc (tra lại bằng ``keys_depending_on``).
+        """
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Disk cache skips %s (not picklable): %s", key, exc)
+            return False
+        if len(blob) > self.max_entry_bytes or (self.max_bytes is not None and len(blob) > self.max_bytes):
+            return False
+
+        path = self._blob_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO entries
+                (key, file, size, checksum, expires_at, stale_until, created_at, last_access, meta)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (key, path.name, len(blob), self._checksum(blob), expires_at, max(stale_until, expires_at),
+             now, now, meta),
+        )
+        conn.execute("DELETE FROM dependencies WHERE key = ?", (key,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO dependencies (key, path) VALUES (?, ?)",
+            [(key, path) for path in dependencies or []],
+        )
+        self._evict(conn)
+        return True
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if self.max_bytes is None:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, file, size in conn.execute(
+            "SELECT key, file, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._delete(conn, key, file)
+            total -= size
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        conn = self._connect()
+        row = conn.execute("SELECT file FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._delete(conn, key, row[0])
+
+    def keys_depending_on(self, paths) -> List[str]:
+        """Các key phụ thuộc ít nhất một file trong ``paths``."""
+        paths = list(paths)
+        if not paths:
+            return []
+        placeholders = ",".join("?" * len(paths))
+        rows = self._connect().execute(
+            f"SELECT DISTINCT key FROM dependencies WHERE path IN ({placeholders})", paths
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def keys(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT key FROM entries").fetchall()]
+
+    def sweep(self) -> int:
+        """Xoá các entry đã quá cửa sổ stale; trả về số entry bị xoá."""
+        conn = self._connect()
+        rows = conn.execute("SELECT key, file FROM entries WHERE stale_until < ?", (time.time(),)).fetchall()
+        for key, file in rows:
+            self._delete(conn, key, file)
+        return len(rows)
+
+    def clear(self) -> None:
+        conn = self._connect()
+        for key, file in conn.execute("SELECT key, file FROM entries").fetchall():
+            self._delete(conn, key, file)
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            'directory': str(self.directory),
+            'size': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'checksum_failures': self.checksum_failures,
+        }
@@ -0,0 +1,98 @@
+"""
+Giảm số điểm của chuỗi gửi cho biểu đồ bằng Largest-Triangle-Three-Buckets (LTTB).
+
+LTTB giữ điểm đầu và điểm cuối, chia các điểm còn lại thành ``max_points - 2`` bucket
+liên tiếp và chọn từ mỗi bucket điểm tạo tam giác lớn nhất với điểm vừa chọn ở bucket
+trước và trung bình của bucket sau. Đỉnh, đáy và điểm gãy được giữ nên hình dạng
+đường gần như không đổi dù payload nhỏ hơn nhiều.
+
+Nhiều chuỗi dùng chung trục (ví dụ doanh thu, số đơn, tỷ lệ trễ theo cùng các kỳ) được
+giảm trên một tập nhãn chung: mỗi chuỗi chọn điểm với một phần ngân sách rồi lấy hợp,
+để mọi chuỗi vẫn có giá trị tại mọi nhãn được giữ.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Số điểm tối đa mặc định mỗi biểu đồ (đủ mịn cho chiều rộng màn hình thông thường)
+DEFAULT_MAX_POINTS = 500
+
+
+def lttb_indices(y: Sequence[float], max_points: int, x: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Chỉ số (tăng dần) các điểm LTTB giữ lại của chuỗi ``y``.
+
+    Args:
+        y: Giá trị chuỗi (NaN được coi là 0 khi so diện tích)
+        max_points: Số điểm tối đa; < 3 hoặc >= số điểm thì giữ nguyên chuỗi
+        x: Toạ độ trục hoành (mặc định là vị trí 0..n-1)
+    """
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    n = len(y)
+    if max_points < 3 or n <= max_points:
+        return np.arange(n)
+    x = np.arange(n, dtype='float64') if x is None else np.asarray(x, dtype='float64')
+
+    # Biên các bucket của phần giữa [1, n - 1); trung bình mỗi bucket tính một lần
+    buckets = max_points - 2
+    edges = (np.arange(buckets + 1) * ((n - 2) / buckets)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / sizes
+    # Điểm "sau" của bucket cuối là điểm cuối chuỗi
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(buckets):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        area = np.abs((ax - next_x[bucket]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[bucket] - ay))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def select_points(columns: Sequence[Sequence[float]], max_points: int) -> np.ndarray:
+    """
+    Chỉ số chung (tăng dần, tối đa ``max_points``) giữ lại cho nhiều chuỗi cùng trục:
+    hợp các điểm LTTB của từng chuỗi, mỗi chuỗi một phần bằng nhau của ngân sách.
+    """
+    n = len(columns[0]) if len(columns) else 0
+    if max_points < 3 or n <= max_points:
+        return np.arange(n)
+    budget = max_points // len(columns)
+    if budget < 3:
+        # Ngân sách quá nhỏ để chia: chọn theo chuỗi đầu tiên
+        columns, budget = columns[:1], max_points
+    return np.unique(np.concatenate([lttb_indices(column, budget) for column in columns]))
+
+
+def downsample_time_series(time_series: Dict, max_points: int = DEFAULT_MAX_POINTS) -> Dict:
+    """
+    Payload chuỗi thời gian (dạng ``analytics.get_time_series_data``: tên chuỗi -> {kỳ: giá trị})
+    giảm còn tối đa ``max_points`` kỳ chung cho mọi chuỗi. Không sửa ``time_series``
+    (thường là kết quả đang cache); các mục không phải chuỗi (``error_bounds``) giữ nguyên.
+    """
+    names = [name for name, values in time_series.items() if name != 'error_bounds' and isinstance(values, dict)]
+    if not names:
+        return time_series
+    labels = list(time_series[names[0]])
+    if max_points < 3 or len(labels) <= max_points:
+        return time_series
+    columns = [[time_series[name].get(label, 0) for label in labels] for name in names]
+    kept = [labels[i] for i in select_points(columns, max_points)]
+    downsampled = dict(time_series)
+    for name in names:
+        values = time_series[name]
+        downsampled[name] = {label: values[label] for label in kept if label in values}
+    return downsampled
+
+
+def downsample_records(records: List[Dict], columns: Sequence[Sequence[float]], max_points: int) -> List[Dict]:
+    """Các bản ghi (theo thứ tự thời gian) giữ lại theo ``select_points(columns, max_points)``."""
+    return [records[i] for i in select_points(columns, max_points)]
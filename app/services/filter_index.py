@@ -0,0 +1,173 @@
+"""
+Index cho các filter của dashboard (quốc gia, danh mục, trạng thái giao hàng, khoảng ngày).
+
+Dựng một lần khi load dữ liệu thay vì so sánh cả DataFrame mỗi lần lọc:
+
+- Cột giá trị rời rạc: mã giá trị của từng dòng và danh sách vị trí dòng sắp theo mã
+  (sorted-position index); các dòng có giá trị v là một lát liên tục của danh sách đó.
+- Cột ngày: các ngày đã sắp cùng vị trí dòng tương ứng; một khoảng ngày là một lát
+  tìm được bằng ``searchsorted``.
+
+Khi lọc, predicate chọn ít dòng nhất (số dòng biết trước từ index) cho danh sách vị
+trí ban đầu, các predicate còn lại chỉ được kiểm tra trên các vị trí đó. Chi phí tỉ lệ
+với số dòng khớp, không với tổng số dòng.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.cache_manager import cache_key, cached, frame_dependencies, frame_fingerprint, tag_frame
+from app.services.date_parser import ensure_datetime
+
+# Tham số filter -> cột dữ liệu
+FILTER_COLUMNS = {
+    'country': 'Order Country',
+    'category': 'Category Name',
+    'delivery_status': 'Delivery Status',
+}
+DATE_COLUMN = 'order date (DateOrders)'
+
+
+def _position_dtype(n_rows: int):
+    return np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+
+
+def _smallest_int(codes: np.ndarray) -> np.ndarray:
+    for dtype in (np.int8, np.int16, np.int32):
+        if codes.size == 0 or codes.max() <= np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes
+
+
+class ValueIndex:
+    """Sorted-position index của một cột giá trị rời rạc."""
+
+    def __init__(self, column: pd.Series):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            self.values = pd.Index(column.cat.categories)
+        else:
+            codes, values = pd.factorize(column, use_na_sentinel=True)
+            self.values = pd.Index(values)
+        self.codes = _smallest_int(np.asarray(codes))
+        # Dòng NaN (mã -1) đứng đầu danh sách và không thuộc giá trị nào
+        self.order = np.argsort(self.codes, kind='stable').astype(_position_dtype(len(column)))
+        counts = np.bincount(self.codes[self.codes >= 0].astype(np.int64), minlength=len(self.values))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]) + int((self.codes < 0).sum())
+
+    def _code(self, value) -> int:
+        try:
+            code = self.values.get_loc(value)
+        except (KeyError, TypeError):
+            return -1
+        return code if isinstance(code, (int, np.integer)) else -1
+
+    def count(self, value) -> int:
+        code = self._code(value)
+        return 0 if code < 0 else int(self.offsets[code + 1] - self.offsets[code])
+
+    def positions(self, value) -> np.ndarray:
+        """Vị trí (tăng dần) các dòng có giá trị ``value``."""
+        code = self._code(value)
+        if code < 0:
+            return self.order[:0]
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def matches(self, positions: np.ndarray, value) -> np.ndarray:
+        return self.codes[positions] == self._code(value)
+
+
+class DateIndex:
+    """Các ngày đã sắp (int64 ns) kèm vị trí dòng; NaT không thuộc khoảng nào."""
+
+    def __init__(self, dates: pd.Series):
+        values = dates.to_numpy(dtype='datetime64[ns]')
+        self.values = values.view('int64')
+        valid = np.flatnonzero(~np.isnat(values)).astype(_position_dtype(len(values)))
+        self.order = valid[np.argsort(self.values[valid], kind='stable')]
+        self.sorted = self.values[self.order]
+
+    @staticmethod
+    def _bounds(start, end):
+        low = pd.Timestamp(start).value if start is not None else np.iinfo(np.int64).min
+        high = pd.Timestamp(end).value if end is not None else np.iinfo(np.int64).max
+        return low, high
+
+    def _slice(self, start, end) -> slice:
+        low, high = self._bounds(start, end)
+        return slice(np.searchsorted(self.sorted, low, side='left'), np.searchsorted(self.sorted, high, side='right'))
+
+    def count(self, start, end) -> int:
+        window = self._slice(start, end)
+        return max(window.stop - window.start, 0)
+
+    def positions(self, start, end) -> np.ndarray:
+        """Vị trí (tăng dần) các dòng có ``start <= ngày <= end``."""
+        return np.sort(self.order[self._slice(start, end)])
+
+    def matches(self, positions: np.ndarray, start, end) -> np.ndarray:
+        low, high = self._bounds(start, end)
+        values = self.values[positions]
+        # NaT là int64 nhỏ nhất nên tự loại khi có ``start``; loại tường minh cho trường hợp chỉ có ``end``
+        return (values >= low) & (values <= high) & (values != np.iinfo(np.int64).min)
+
+
+class FilterIndex:
+    """Index của các cột filter trên một DataFrame chuỗi cung ứng."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self.columns: Dict[str, ValueIndex] = {
+            name: ValueIndex(df[column]) for name, column in FILTER_COLUMNS.items() if column in df.columns
+        }
+        self.dates: Optional[DateIndex] = DateIndex(ensure_datetime(df, DATE_COLUMN)) if DATE_COLUMN in df.columns else None
+
+    def select(self, country=None, category=None, delivery_status=None, start_date=None, end_date=None) -> np.ndarray:
+        """
+        Vị trí (tăng dần) các dòng khớp mọi filter được đặt, như boolean mask
+        ``==`` trên từng cột và ``start_date <= ngày <= end_date``.
+
+        Filter trên cột không có trong dữ liệu bị bỏ qua (giống dashboard trước đây).
+        """
+        values = {'country': country, 'category': category, 'delivery_status': delivery_status}
+        predicates = [
+            (index.count(values[name]), index, (values[name],))
+            for name, index in self.columns.items() if values[name]
+        ]
+        if (start_date or end_date) and self.dates is not None:
+            bounds = (start_date or None, end_date or None)
+            predicates.append((self.dates.count(*bounds), self.dates, bounds))
+        if not predicates:
+            return np.arange(self.n_rows, dtype=_position_dtype(self.n_rows))
+
+        predicates.sort(key=lambda predicate: predicate[0])
+        _, driver, args = predicates[0]
+        positions = driver.positions(*args)
+        for _, index, args in predicates[1:]:
+            if len(positions) == 0:
+                break
+            positions = positions[index.matches(positions, *args)]
+        return positions
+
+
+@cached(ttl=86400)  # Index của một frame (theo token) không đổi; file nguồn đổi thì bị huỷ theo
+def build_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """Filter index của ``df`` (dựng một lần cho mỗi phiên bản dữ liệu)."""
+    return FilterIndex(df)
+
+
+def filter_rows(df: pd.DataFrame, columns: Optional[Iterable[str]] = None, **filters) -> pd.DataFrame:
+    """
+    Các dòng của ``df`` khớp ``filters`` (tham số của ``FilterIndex.select``), chỉ lấy
+    ``columns`` (None = tất cả).
+
+    Frame trả về được gắn token suy từ ``df`` và filter nên các hàm @cached nhận ra
+    cùng một lần lọc mà không phải hash lại dữ liệu.
+    """
+    positions = build_filter_index(df).select(**filters)
+    columns: List[str] = list(df.columns) if columns is None else [c for c in columns if c in df.columns]
+    subset = df.iloc[positions, [df.columns.get_loc(c) for c in columns]]
+    token = cache_key(frame_fingerprint(df), columns, **{k: v for k, v in filters.items() if v})
+    return tag_frame(subset, token, frame_dependencies(df))
@@ -0,0 +1,174 @@
+"""
+Index join chuỗi cung ứng - thời tiết theo (customer id, ngày đặt hàng).
+
+Dựng một lần cho mỗi phiên bản dữ liệu thay vì merge hai DataFrame ở mỗi request:
+
+- Khoá join là một số nguyên: mã customer (factorize chung trên cả hai frame) nhân
+  với số ngày trong khoảng dữ liệu, cộng với số ngày kể từ ngày nhỏ nhất.
+- Các dòng thời tiết được sắp theo khoá; mỗi dòng supply tìm khoảng dòng khớp bằng
+  ``searchsorted``. Kết quả là hai mảng vị trí (dòng supply, dòng thời tiết) của các
+  cặp khớp, tương đương inner join.
+
+Các truy vấn (tương quan, ma trận tương quan, scatter) đọc cột gốc theo hai mảng vị
+trí đó thành các mảng NumPy thẳng hàng, không tạo DataFrame merge và không sửa các
+frame đang cache.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.cache_manager import cached
+from app.services.date_parser import ensure_datetime
+
+SUPPLY_CUSTOMER_COLUMN = 'Order Customer Id'
+SUPPLY_DATE_COLUMN = 'order date (DateOrders)'
+WEATHER_CUSTOMER_COLUMN = 'customer_id'
+WEATHER_DATE_COLUMN = 'order_date'
+
+
+def _days(df: pd.DataFrame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Số ngày kể từ epoch của từng dòng (bỏ giờ) và mask dòng có ngày."""
+    dates = ensure_datetime(df, column).to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dates)
+    return dates.astype('datetime64[D]').view('int64'), valid
+
+
+def _customer_codes(supply_ids: pd.Series, weather_ids: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Mã customer chung cho hai frame (id số so sánh theo giá trị, như merge)."""
+    if pd.api.types.is_numeric_dtype(supply_ids.dtype) and pd.api.types.is_numeric_dtype(weather_ids.dtype):
+        values = [ids.to_numpy(dtype='float64', na_value=np.nan) for ids in (supply_ids, weather_ids)]
+    else:
+        values = [ids.astype(object).to_numpy() for ids in (supply_ids, weather_ids)]
+    codes, _ = pd.factorize(np.concatenate(values), use_na_sentinel=True)
+    return codes[:len(supply_ids)], codes[len(supply_ids):]
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> float:
+    """Hệ số tương quan Pearson trên các cặp đều có giá trị (như ``Series.corr``)."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if valid.sum() < 2:
+        return float('nan')
+    x = x[valid] - x[valid].mean()
+    y = y[valid] - y[valid].mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    return float((x * y).sum() / denominator) if denominator > 0 else float('nan')
+
+
+class SupplyWeatherJoin:
+    """
+    Các cặp vị trí (dòng supply, dòng thời tiết) khớp theo (customer, ngày).
+
+    Chỉ giữ mảng vị trí (không giữ DataFrame) nên cache / ghi xuống đĩa được; đọc cột
+    qua ``aligned(supply_df, weather_df)``.
+    """
+
+    def __init__(self, supply_df: pd.DataFrame, weather_df: pd.DataFrame):
+        self.supply_rows = len(supply_df)
+        self.supply_positions = np.empty(0, dtype=np.int64)
+        self.weather_positions = np.empty(0, dtype=np.int64)
+        self.available = (
+            SUPPLY_CUSTOMER_COLUMN in supply_df.columns and SUPPLY_DATE_COLUMN in supply_df.columns
+            and WEATHER_CUSTOMER_COLUMN in weather_df.columns and WEATHER_DATE_COLUMN in weather_df.columns
+        )
+        if self.available:
+            self._build(supply_df, weather_df)
+
+    def _build(self, supply_df: pd.DataFrame, weather_df: pd.DataFrame):
+        supply_customers, weather_customers = _customer_codes(
+            supply_df[SUPPLY_CUSTOMER_COLUMN], weather_df[WEATHER_CUSTOMER_COLUMN]
+        )
+        supply_days, supply_dated = _days(supply_df, SUPPLY_DATE_COLUMN)
+        weather_days, weather_dated = _days(weather_df, WEATHER_DATE_COLUMN)
+        # Dòng thiếu customer hoặc ngày không khớp dòng nào
+        supply_rows = np.flatnonzero((supply_customers >= 0) & supply_dated)
+        weather_rows = np.flatnonzero((weather_customers >= 0) & weather_dated)
+        if len(supply_rows) == 0 or len(weather_rows) == 0:
+            return
+
+        first_day = min(supply_days[supply_rows].min(), weather_days[weather_rows].min())
+        last_day = max(supply_days[supply_rows].max(), weather_days[weather_rows].max())
+        span = np.int64(last_day - first_day + 1)
+
+        def keys(customers, days, rows):
+            return customers[rows].astype(np.int64) * span + (days[rows] - first_day)
+
+        supply_keys = keys(supply_customers, supply_days, supply_rows)
+        weather_keys = keys(weather_customers, weather_days, weather_rows)
+        order = np.argsort(weather_keys, kind='stable')
+        weather_rows, weather_keys = weather_rows[order], weather_keys[order]
+
+        # Khoảng [left, right) các dòng thời tiết khớp với từng dòng supply
+        left = np.searchsorted(weather_keys, supply_keys, side='left')
+        counts = np.searchsorted(weather_keys, supply_keys, side='right') - left
+        total = int(counts.sum())
+        run_starts = np.cumsum(counts) - counts
+        within = np.arange(total, dtype=np.int64) - np.repeat(run_starts, counts)
+        self.supply_positions = np.repeat(supply_rows, counts)
+        self.weather_positions = weather_rows[np.repeat(left, counts) + within]
+
+    def __len__(self) -> int:
+        return len(self.supply_positions)
+
+    @property
+    def merge_rate(self) -> float:
+        """Số cặp khớp / số dòng supply (%)."""
+        return float(len(self) / self.supply_rows * 100) if self.supply_rows > 0 else 0
+
+    def aligned(self, supply_df: pd.DataFrame, weather_df: pd.DataFrame) -> 'AlignedColumns':
+        """Truy cập cột của hai frame (mà index được dựng từ) trên các cặp khớp."""
+        return AlignedColumns(self, supply_df, weather_df)
+
+
+class AlignedColumns:
+    """Cột số của hai frame đọc theo các cặp vị trí của một ``SupplyWeatherJoin``."""
+
+    def __init__(self, join: SupplyWeatherJoin, supply_df: pd.DataFrame, weather_df: pd.DataFrame):
+        self.join = join
+        self.supply_df = supply_df
+        self.weather_df = weather_df
+        self._values: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.join)
+
+    def has_column(self, column: str) -> bool:
+        return column in self.supply_df.columns or column in self.weather_df.columns
+
+    def values(self, column: str) -> np.ndarray:
+        """Giá trị số (float64, NaN nếu thiếu) của ``column`` trên các cặp khớp; cột supply được ưu tiên."""
+        if column not in self._values:
+            if column in self.supply_df.columns:
+                source, positions = self.supply_df[column], self.join.supply_positions
+            else:
+                source, positions = self.weather_df[column], self.join.weather_positions
+            # Lấy các dòng khớp trước rồi mới chuyển kiểu
+            picked = source.iloc[positions]
+            self._values[column] = pd.to_numeric(picked, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        return self._values[column]
+
+    def correlation(self, first: str, second: str) -> Optional[float]:
+        """Tương quan Pearson giữa hai cột trên các cặp khớp; None nếu không xác định."""
+        corr = _pearson(self.values(first), self.values(second))
+        return None if np.isnan(corr) else corr
+
+    def correlation_matrix(self, columns: List[str]) -> pd.DataFrame:
+        """Ma trận tương quan (như ``DataFrame.corr``) của các cột có trong một trong hai frame."""
+        columns = [c for c in columns if self.has_column(c)]
+        matrix = np.full((len(columns), len(columns)), np.nan)
+        for i, first in enumerate(columns):
+            values = self.values(first)
+            for j in range(i, len(columns)):
+                matrix[i, j] = matrix[j, i] = _pearson(values, self.values(columns[j]))
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    def frame(self, columns: List[str]) -> pd.DataFrame:
+        """DataFrame các cột số ``columns`` trên các cặp khớp (theo thứ tự dòng supply)."""
+        return pd.DataFrame({c: self.values(c) for c in columns if self.has_column(c)})
+
+
+@cached(ttl=86400)  # Index của một cặp frame (theo token) không đổi; file nguồn đổi thì bị huỷ theo
+def build_join_index(supply_df: pd.DataFrame, weather_df: pd.DataFrame) -> SupplyWeatherJoin:
+    """Join index (customer, ngày) giữa ``supply_df`` và ``weather_df`` (dựng một lần mỗi phiên bản dữ liệu)."""
+    return SupplyWeatherJoin(supply_df, weather_df)
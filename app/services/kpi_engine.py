@@ -0,0 +1,263 @@
+"""
+Engine tính nhiều KPI trong ít lần duyệt dữ liệu nhất.
+
+Mỗi KPI là một ``Metric`` (tên, phép tổng hợp, cột, các cột nhóm). ``plan`` gom các
+metric theo khoá nhóm và tách mỗi metric thành các phép cơ bản dùng chung (mean =
+sum / count, std = sum, tổng bình phương, count): mỗi khoá nhóm là một lần duyệt,
+các metric không nhóm dùng chung một lần duyệt vô hướng. ``compute`` chạy các lần
+duyệt đó trên mảng NumPy (mỗi cột chỉ chuyển sang mảng một lần, nhóm bằng
+``bincount`` / ``reduceat``) và không sửa DataFrame đầu vào.
+"""
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Phép tổng hợp -> các phép cơ bản cần tính
+PRIMITIVES = {
+    'size': ('size',),
+    'count': ('count',),
+    'missing': ('missing',),
+    'sum': ('sum',),
+    'mean': ('sum', 'count'),
+    'min': ('min',),
+    'max': ('max',),
+    'std': ('sum', 'sumsq', 'count'),
+}
+OPS = tuple(PRIMITIVES)
+
+_INT64_MIN = np.iinfo(np.int64).min
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+@dataclass(frozen=True)
+class Metric:
+    """Một KPI: ``op`` trên ``column`` (không cần với 'size'), nhóm theo ``by`` (() = toàn bộ)."""
+    name: str
+    op: str
+    column: Optional[str] = None
+    by: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        if self.op not in PRIMITIVES:
+            raise ValueError(f"Phép tổng hợp không hợp lệ: {self.op} (chọn trong {OPS})")
+        if self.column is None and self.op != 'size':
+            raise ValueError(f"Metric {self.name} cần cột cho phép {self.op}")
+        object.__setattr__(self, 'by', tuple(self.by))
+
+
+@dataclass
+class Pass:
+    """Một lần duyệt: khoá nhóm, các phép cơ bản (phép, cột) và các metric dùng chúng."""
+    by: Tuple[str, ...]
+    primitives: List[Tuple[str, Optional[str]]] = field(default_factory=list)
+    metrics: List[Metric] = field(default_factory=list)
+
+
+def plan(metrics: Iterable[Metric]) -> List[Pass]:
+    """Gom ``metrics`` thành các lần duyệt (một lần cho mỗi khoá nhóm), bỏ phép cơ bản trùng."""
+    passes: Dict[Tuple[str, ...], Pass] = {}
+    names = set()
+    for metric in metrics:
+        if metric.name in names:
+            raise ValueError(f"Trùng tên metric: {metric.name}")
+        names.add(metric.name)
+        scan = passes.setdefault(metric.by, Pass(metric.by))
+        scan.metrics.append(metric)
+        for primitive in PRIMITIVES[metric.op]:
+            key = (primitive, None if primitive == 'size' else metric.column)
+            if key not in scan.primitives:
+                scan.primitives.append(key)
+    return list(passes.values())
+
+
+class _Column:
+    """
+    Mảng NumPy của một cột, chuyển kiểu một lần khi phép số đầu tiên cần: datetime
+    thành int64 (ns), số nguyên giữ int64, còn lại float64 (không chuyển được -> NaN).
+    """
+
+    def __init__(self, series: pd.Series):
+        self.series = series
+        self.missing = series.isna().to_numpy()
+
+    @cached_property
+    def kind(self) -> str:
+        dtype = self.series.dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime'
+        if (pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype)) and not self.missing.any():
+            return 'int'
+        return 'float'
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        if self.kind == 'datetime':
+            return self.series.to_numpy(dtype='datetime64[ns]').view('int64')
+        if self.kind == 'int':
+            return self.series.to_numpy(dtype='int64')
+        if pd.api.types.is_numeric_dtype(self.series.dtype):
+            return self.series.to_numpy(dtype='float64', na_value=np.nan)
+        return pd.to_numeric(self.series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    @cached_property
+    def valid(self) -> np.ndarray:
+        """Ô dùng cho phép số: bỏ ô thiếu và ô không chuyển được sang số."""
+        return ~np.isnan(self.values) if self.kind == 'float' else ~self.missing
+
+    @cached_property
+    def shift(self) -> float:
+        """Trung bình cột, trừ đi trước khi cộng bình phương để variance không mất chính xác."""
+        valid = self.values[self.valid]
+        return float(valid.mean()) if valid.size else 0.0
+
+
+class _Groups:
+    """Mã nhóm của từng dòng cùng thứ tự dòng sắp theo nhóm (dùng cho min/max)."""
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+        self.n = int(codes.max()) + 1 if len(codes) else 0
+        self.sizes = np.bincount(codes, minlength=self.n)
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]]).astype('int64')
+        self._order: Optional[np.ndarray] = None
+
+    @property
+    def order(self) -> np.ndarray:
+        if self._order is None:
+            self._order = np.argsort(self.codes, kind='stable')
+        return self._order
+
+    def first_rows(self) -> np.ndarray:
+        """Vị trí dòng đầu tiên của mỗi nhóm."""
+        return self.order[self.starts]
+
+
+def _group_codes(df: pd.DataFrame, by: Tuple[str, ...]) -> np.ndarray:
+    """Mã nhóm theo thứ tự xuất hiện (NaN là một nhóm, như ``groupby(dropna=False)``)."""
+    return df.groupby(list(by), dropna=False, observed=True, sort=False).ngroup().to_numpy()
+
+
+def _reduce(primitive: str, column: Optional[_Column], groups: Optional[_Groups], n_rows: int):
+    """Một phép cơ bản trên toàn bộ (``groups`` None) hoặc theo nhóm."""
+    if primitive == 'size':
+        return n_rows if groups is None else groups.sizes
+    if primitive == 'missing':
+        mask = column.missing
+        return int(mask.sum()) if groups is None else np.bincount(groups.codes[mask], minlength=groups.n)
+    valid = column.valid
+    if primitive == 'count':
+        return int(valid.sum()) if groups is None else np.bincount(groups.codes[valid], minlength=groups.n)
+    if primitive in ('sum', 'sumsq'):
+        values = column.values[valid]
+        if primitive == 'sumsq':
+            values = (values - column.shift) ** 2
+        if groups is None:
+            total = values.sum()
+            return int(total) if column.kind == 'int' and primitive == 'sum' else float(total)
+        totals = np.bincount(groups.codes[valid], weights=values, minlength=groups.n)
+        return totals.astype('int64') if column.kind == 'int' and primitive == 'sum' else totals
+
+    # min / max: float bỏ qua NaN nhờ fmin/fmax
+    smallest = primitive == 'min'
+    if column.kind == 'float':
+        if groups is None:
+            values = column.values[valid]
+            return float(values.min() if smallest else values.max()) if values.size else float('nan')
+        reducer = np.fmin if smallest else np.fmax
+        return reducer.reduceat(column.values[groups.order], groups.starts) if groups.n else np.empty(0)
+
+    # int64 / datetime (ns): ô thiếu thay bằng giá trị không bao giờ được chọn
+    sentinel = _INT64_MAX if smallest else _INT64_MIN
+    values = np.where(valid, column.values, sentinel) if column.kind == 'datetime' else column.values
+    if groups is None:
+        if not valid.any():
+            return pd.NaT if column.kind == 'datetime' else float('nan')
+        result = values.min() if smallest else values.max()
+        return pd.Timestamp(int(result)) if column.kind == 'datetime' else int(result)
+    reducer = np.minimum if smallest else np.maximum
+    result = reducer.reduceat(values[groups.order], groups.starts) if groups.n else np.empty(0, dtype='int64')
+    if column.kind == 'datetime':
+        # Nhóm toàn NaT còn lại sentinel -> NaT
+        result = np.where(np.bincount(groups.codes[valid], minlength=groups.n) > 0, result, _INT64_MIN)
+        return result.view('datetime64[ns]')
+    return result
+
+
+def _finish(metric: Metric, values: Dict[Tuple[str, Optional[str]], Any], columns: Dict[str, _Column]):
+    """Giá trị của ``metric`` từ các phép cơ bản đã tính."""
+    if metric.op == 'size':
+        return values[('size', None)]
+    if metric.op in ('count', 'missing', 'sum', 'min', 'max'):
+        return values[(metric.op, metric.column)]
+    total = np.asarray(values[('sum', metric.column)], dtype='float64')
+    count = values[('count', metric.column)]
+    scalar = np.ndim(count) == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric.op == 'mean':
+            result = total / count
+        else:
+            # std (ddof=1) từ tổng bình phương độ lệch so với trung bình cột
+            offset = total - np.asarray(count) * columns[metric.column].shift
+            squares = values[('sumsq', metric.column)]
+            result = np.sqrt(np.maximum(squares - offset ** 2 / count, 0.0) / (np.asarray(count) - 1))
+            result = np.where(np.asarray(count) > 1, result, np.nan)
+    return float(result) if scalar else result
+
+
+class KpiResult:
+    """Kết quả ``compute``: giá trị các metric không nhóm và một bảng cho mỗi khoá nhóm."""
+
+    def __init__(self, scalars: Dict[str, Any], tables: Dict[Tuple[str, ...], pd.DataFrame],
+                 codes: Dict[Tuple[str, ...], np.ndarray], passes: int):
+        self.scalars = scalars
+        self.tables = tables
+        self.codes = codes
+        self.passes = passes
+
+    def __getitem__(self, name: str) -> Any:
+        return self.scalars[name]
+
+    def table(self, by: Iterable[str]) -> pd.DataFrame:
+        """Bảng của khoá nhóm ``by``: các cột nhóm rồi các metric, mỗi nhóm một dòng."""
+        return self.tables[tuple(by)]
+
+
+def compute(df: pd.DataFrame, metrics: Iterable[Metric]) -> KpiResult:
+    """
+    Tính ``metrics`` trên ``df`` theo kế hoạch của ``plan``.
+
+    Metric thiếu cột (hoặc cột nhóm) trong ``df`` bị bỏ qua. Nhóm đánh số theo thứ tự
+    xuất hiện đầu tiên; ``KpiResult.codes[by]`` là mã nhóm của từng dòng.
+    """
+    metrics = [
+        m for m in metrics
+        if (m.column is None or m.column in df.columns) and all(key in df.columns for key in m.by)
+    ]
+    columns: Dict[str, _Column] = {}
+    scalars: Dict[str, Any] = {}
+    tables: Dict[Tuple[str, ...], pd.DataFrame] = {}
+    codes: Dict[Tuple[str, ...], np.ndarray] = {}
+    passes = plan(metrics)
+
+    for scan in passes:
+        groups = _Groups(_group_codes(df, scan.by)) if scan.by else None
+        values = {}
+        for primitive, column in scan.primitives:
+            if column is not None and column not in columns:
+                columns[column] = _Column(df[column])
+            values[(primitive, column)] = _reduce(primitive, columns.get(column), groups, len(df))
+        results = {metric.name: _finish(metric, values, columns) for metric in scan.metrics}
+        if groups is None:
+            scalars.update(results)
+            continue
+        first = groups.first_rows()
+        table = {key: df[key].iloc[first].reset_index(drop=True) for key in scan.by}
+        table.update(results)
+        tables[scan.by] = pd.DataFrame(table)
+        codes[scan.by] = groups.codes
+
+    return KpiResult(scalars, tables, codes, len(passes))
@@ -0,0 +1,125 @@
+"""
+Tính các phần (section) độc lập của một trang trên thread pool, ngoài event loop.
+
+Mỗi section là một hàm không tham số (thường gọi một hàm @cached của ``analytics``).
+``run_sections`` gửi tất cả vào một pool giới hạn số thread rồi chờ đồng thời, nên
+thời gian render xấp xỉ section chậm nhất và event loop vẫn phục vụ request khác
+trong lúc chờ. ``timeout`` tính từ lúc section bắt đầu chạy, không tính thời gian chờ
+trong hàng đợi của pool. Section chạy quá ``timeout`` nhận giá trị mặc định (trang render
+một phần); thread của nó vẫn chạy tiếp và kết quả vào cache cho lần render sau. Section
+chờ trong hàng đợi quá ``timeout`` mà chưa chạy thì bị huỷ hẳn, để không chiếm thread
+của các lần render sau.
+
+Section và các việc chặn khác của route (``run_blocking``: load dữ liệu, tính toán
+pandas) chạy trên hai pool riêng: section quá hạn vẫn giữ thread của nó cho tới khi
+xong, nên dù nhiều section chậm chiếm hết pool section thì load dữ liệu và các route
+khác vẫn còn thread.
+
+Dùng thread thay vì process: các section đọc chung DataFrame đang cache (gửi sang
+process khác phải pickle cả frame) và phần lớn thời gian nằm trong NumPy/pandas,
+vốn nhả GIL.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger("sections")
+
+SECTION_WORKERS_ENV = "DATASTORM_SECTION_WORKERS"
+DEFAULT_SECTION_WORKERS = 4
+SECTION_TIMEOUT_ENV = "DATASTORM_SECTION_TIMEOUT_SECONDS"
+DEFAULT_SECTION_TIMEOUT = 15.0
+BLOCKING_WORKERS_ENV = "DATASTORM_BLOCKING_WORKERS"
+DEFAULT_BLOCKING_WORKERS = 4
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+_section_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(_env_number(SECTION_WORKERS_ENV, DEFAULT_SECTION_WORKERS))),
+    thread_name_prefix="page-section",
+)
+_blocking_executor = ThreadPoolExecutor(
+    max_workers=max(1, int(_env_number(BLOCKING_WORKERS_ENV, DEFAULT_BLOCKING_WORKERS))),
+    thread_name_prefix="route-blocking",
+)
+
+
+def default_timeout() -> float:
+    """Thời gian chờ mặc định của một section (giây)."""
+    return _env_number(SECTION_TIMEOUT_ENV, DEFAULT_SECTION_TIMEOUT)
+
+
+async def run_blocking(func: Callable[[], Any]) -> Any:
+    """Chạy ``func`` trên pool riêng của route (không phải pool section) và chờ kết quả (không giới hạn thời gian)."""
+    return await asyncio.get_running_loop().run_in_executor(_blocking_executor, func)
+
+
+def _discard_late_result(future: "asyncio.Future") -> None:
+    # Section đã bị bỏ vì quá hạn: lấy exception (nếu có) để không bị cảnh báo "never retrieved"
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Timed-out section failed later: %s", future.exception())
+
+
+async def run_sections(
+    sections: Dict[str, Callable[[], Any]],
+    defaults: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Chạy đồng thời các section trên pool.
+
+    Args:
+        sections: Tên section -> hàm tính
+        defaults: Giá trị dùng khi section quá hạn (mặc định None)
+        timeout: Thời gian chạy tối đa mỗi section (giây, tính từ lúc bắt đầu chạy),
+            mặc định ``default_timeout()``; cũng là thời gian chờ tối đa trong hàng đợi
+        timeouts: Thời gian riêng theo tên section
+
+    Returns:
+        (tên section -> kết quả, danh sách section quá hạn). Exception của section
+        được ném lại như khi gọi trực tiếp.
+    """
+    loop = asyncio.get_running_loop()
+    defaults = defaults or {}
+    timeouts = timeouts or {}
+    timeout = default_timeout() if timeout is None else timeout
+
+    async def run(name: str, func: Callable[[], Any]):
+        limit = timeouts.get(name, timeout)
+        started = asyncio.Event()
+
+        def call():
+            loop.call_soon_threadsafe(started.set)
+            return func()
+
+        submitted = _section_executor.submit(call)
+        future = asyncio.wrap_future(submitted, loop=loop)
+        try:
+            await asyncio.wait_for(started.wait(), limit)
+        except asyncio.TimeoutError:
+            # Chưa được chạy (pool bận): huỷ luôn; nếu vừa kịp bắt đầu thì chờ như bình thường
+            if submitted.cancel():
+                logger.warning("Section %s did not start within %.1fs, rendering without it", name, limit)
+                return defaults.get(name), True
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), limit), False
+        except asyncio.TimeoutError:
+            logger.warning("Section %s timed out after %.1fs, rendering without it", name, limit)
+            future.add_done_callback(_discard_late_result)
+            return defaults.get(name), True
+
+    names = list(sections)
+    outcomes = await asyncio.gather(*(run(name, sections[name]) for name in names))
+    results = {name: value for name, (value, _) in zip(names, outcomes)}
+    timed_out = [name for name, (_, late) in zip(names, outcomes) if late]
+    return results, timed_out
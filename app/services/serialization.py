@@ -0,0 +1,103 @@
+"""
+Chuyển DataFrame sang list record JSON theo từng cột (không duyệt từng dòng).
+
+Mỗi cột được chuyển kiểu một lần bằng thao tác vector hoá rồi ghép thành các dict, thay
+cho ``iterrows()`` + kiểm tra kiểu từng ô. Giá trị thiếu (NaN/NaT/None) thành ``None``;
+kết quả chỉ chứa kiểu Python thuần nên ``json`` / FastAPI encode trực tiếp.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Kiểu chuyển cho một cột: 'float', 'int', 'str', 'datetime' hoặc 'auto' (theo dtype)
+KINDS = ('float', 'int', 'str', 'datetime', 'auto')
+
+
+def _with_missing(values: np.ndarray, missing: np.ndarray) -> List[Any]:
+    values = values.astype(object)
+    values[missing] = None
+    return values.tolist()
+
+
+def convert_column(series: pd.Series, kind: str = 'auto') -> List[Any]:
+    """
+    Chuyển một cột sang list giá trị Python.
+
+    - ``'float'``: số thực; giá trị không chuyển được thành 0.0.
+    - ``'int'``: số nguyên (cắt phần thập phân); giá trị không chuyển được giữ dạng chuỗi.
+    - ``'datetime'``: chuỗi theo ``DATETIME_FORMAT``.
+    - ``'str'``: ``str(value)``.
+    - ``'auto'``: datetime -> ``'datetime'``, bool -> bool, số nguyên -> ``'int'``,
+      số thực -> ``'float'``, còn lại giữ nguyên giá trị.
+    """
+    missing = series.isna().to_numpy()
+    if kind == 'auto':
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            kind = 'datetime'
+        elif pd.api.types.is_bool_dtype(series.dtype):
+            return _with_missing(series.to_numpy(dtype=object), missing)
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            kind = 'int'
+        elif pd.api.types.is_float_dtype(series.dtype):
+            kind = 'float'
+        else:
+            return _with_missing(series.to_numpy(dtype=object), missing)
+
+    if kind == 'datetime':
+        dates = series if pd.api.types.is_datetime64_any_dtype(series.dtype) else pd.to_datetime(series, errors='coerce')
+        return _with_missing(dates.dt.strftime(DATETIME_FORMAT).to_numpy(dtype=object), missing | dates.isna().to_numpy())
+    if kind == 'str':
+        return _with_missing(series.astype(str).to_numpy(dtype=object), missing)
+    if kind == 'int' and pd.api.types.is_integer_dtype(series.dtype):
+        return _with_missing(series.to_numpy(dtype=object), missing)
+
+    numeric = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    unconvertible = np.isnan(numeric) & ~missing
+    if kind == 'float':
+        return _with_missing(np.where(unconvertible, 0.0, numeric), missing)
+    if kind == 'int':
+        values = np.zeros(len(numeric), dtype=object)
+        convertible = ~np.isnan(numeric)
+        values[convertible] = numeric[convertible].astype(np.int64).tolist()
+        if unconvertible.any():
+            values[unconvertible] = series[unconvertible].astype(str).to_numpy(dtype=object)
+        values[missing] = None
+        return values.tolist()
+    raise ValueError(f"Kiểu chuyển không hợp lệ: {kind} (chọn trong {KINDS})")
+
+
+def to_records(df: pd.DataFrame, kinds: Optional[Dict[str, str]] = None, default: str = 'auto',
+               rename: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    List record ``{cột: giá trị}`` của ``df``, mỗi cột chuyển theo ``kinds[cột]``
+    (mặc định ``default``); ``rename`` đổi tên key trong record.
+    """
+    kinds = kinds or {}
+    rename = rename or {}
+    keys = [rename.get(col, col) for col in df.columns]
+    columns = [convert_column(df[col], kinds.get(col, default)) for col in df.columns]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def largest_positions(values, n: int) -> np.ndarray:
+    """
+    Vị trí của ``n`` giá trị lớn nhất, sắp giảm dần (NaN/NaT xếp cuối), bằng
+    ``argpartition`` thay vì sắp xếp toàn bộ.
+    """
+    values = np.asarray(values)
+    # Khoá tăng dần theo thứ tự cần lấy: ~x đảo thứ tự int64 không tràn số, NaT (int64 nhỏ nhất) thành lớn nhất
+    if np.issubdtype(values.dtype, np.datetime64):
+        keys = ~values.astype('datetime64[ns]').view('int64')
+    else:
+        keys = -values.astype('float64')
+        keys[np.isnan(keys)] = np.inf
+    n = min(n, len(keys))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.sort(np.argpartition(keys, n - 1)[:n]) if n < len(keys) else np.arange(len(keys))
+    # Giá trị bằng nhau giữ thứ tự dòng như sort_values
+    return candidates[np.argsort(keys[candidates], kind='stable')]
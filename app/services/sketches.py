@@ -0,0 +1,335 @@
+"""
+Các sketch gộp được (mergeable) dùng cho profiling và analytics xấp xỉ.
+
+Mỗi sketch nhận dữ liệu theo từng chunk (``update``), có bộ nhớ giới hạn không phụ
+thuộc số dòng, và hai sketch dựng trên hai phần dữ liệu khác nhau có thể gộp lại
+(``merge``) thành sketch của toàn bộ dữ liệu:
+
+- ``RunningMoments``: count, min/max, mean/variance (Welford, gộp theo Chan).
+- ``QuantileSketch``: quantile/rank xấp xỉ (KLL đơn giản hoá), chính xác khi số
+  giá trị còn nhỏ hơn ``k``.
+- ``HyperLogLog``: ước lượng số giá trị phân biệt (``hll_registers`` / ``hll_estimate``
+  là phần vector hoá, dùng cho HLL thưa theo nhóm).
+- ``KMinValues``: ước lượng số giá trị phân biệt từ k hash nhỏ nhất; chính xác khi
+  còn ít hơn ``k`` giá trị và giữ nguyên hash nên gộp lại được theo nhóm bất kỳ.
+- ``log_bucket_index`` / ``log_bucket_value``: histogram bucket log với sai số tương
+  đối cố định (kiểu DDSketch); gộp được bằng cách cộng số đếm theo bucket.
+- ``TopK``: các giá trị xuất hiện nhiều nhất (Misra-Gries), đếm chính xác khi số
+  giá trị phân biệt không vượt quá ``capacity``.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float_array(values) -> np.ndarray:
+    """Chuyển về mảng float64, bỏ NaN/inf."""
+    arr = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return arr[np.isfinite(arr)]
+
+
+class RunningMoments:
+    """Count, min, max, mean và variance cập nhật theo chunk (Welford / Chan)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def update(self, values) -> 'RunningMoments':
+        arr = _as_float_array(values)
+        if arr.size == 0:
+            return self
+        other = RunningMoments()
+        other.count = int(arr.size)
+        other.mean = float(arr.mean())
+        other.m2 = float(((arr - other.mean) ** 2).sum())
+        other.min = float(arr.min())
+        other.max = float(arr.max())
+        return self.merge(other)
+
+    def merge(self, other: 'RunningMoments') -> 'RunningMoments':
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self, ddof: int = 1) -> Optional[float]:
+        if self.count - ddof <= 0:
+            return None
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof: int = 1) -> Optional[float]:
+        var = self.variance(ddof)
+        return None if var is None else float(np.sqrt(var))
+
+
+class QuantileSketch:
+    """
+    Quantile sketch kiểu KLL: mỗi level giữ tối đa ``k`` giá trị, giá trị ở level i
+    đại diện cho 2^i giá trị gốc. Khi một level đầy, nó được sắp xếp và một nửa số
+    phần tử (xen kẽ, offset ngẫu nhiên) được đẩy lên level trên.
+    """
+
+    def __init__(self, k: int = 512, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self._levels: List[np.ndarray] = [np.empty(0, dtype='float64')]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def is_exact(self) -> bool:
+        """Chưa nén lần nào: kết quả quantile là chính xác."""
+        return len(self._levels) == 1
+
+    def update(self, values) -> 'QuantileSketch':
+        arr = _as_float_array(values)
+        if arr.size == 0:
+            return self
+        self.count += int(arr.size)
+        self._levels[0] = np.concatenate([self._levels[0], arr])
+        self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.count == 0:
+            return self
+        self.count += other.count
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0, dtype='float64'))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # Số phần tử lẻ: giữ lại phần tử cuối ở level hiện tại
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[int(self._rng.integers(2))::2]
+                self._levels[level] = keep
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0, dtype='float64'))
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    def _weighted_items(self) -> Tuple[np.ndarray, np.ndarray]:
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(lv), 2.0 ** i) for i, lv in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile ``q`` (0..1); nội suy tuyến tính như pandas khi còn chính xác."""
+        if self.count == 0:
+            return None
+        if self.is_exact:
+            return float(np.quantile(self._levels[0], q))
+        items, weights = self._weighted_items()
+        cumulative = np.cumsum(weights)
+        idx = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(items[min(idx, len(items) - 1)])
+
+    def rank(self, value: float, inclusive: bool = False) -> float:
+        """Số giá trị (ước lượng) nhỏ hơn ``value`` (hoặc <= nếu ``inclusive``)."""
+        if self.count == 0:
+            return 0.0
+        items, weights = self._weighted_items()
+        side = 'right' if inclusive else 'left'
+        idx = int(np.searchsorted(items, value, side=side))
+        total = weights.sum()
+        # Tổng trọng số có thể lệch khỏi count sau khi nén: chuẩn hoá lại theo count
+        return float(weights[:idx].sum() / total * self.count) if total else 0.0
+
+    def count_outside(self, lower: float, upper: float) -> int:
+        """Số giá trị (ước lượng) nằm ngoài [lower, upper]."""
+        below = self.rank(lower, inclusive=False)
+        above = self.count - self.rank(upper, inclusive=True)
+        return int(round(below + above))
+
+
+def hll_registers(hashes: np.ndarray, p: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Thanh ghi (``p`` bit đầu) và rho (số bit 0 đứng đầu phần còn lại + 1) của các hash 64-bit."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+    remainder = hashes << np.uint64(p)
+    # Đếm số bit 0 đứng đầu (chính xác, không qua float)
+    leading = np.zeros(hashes.size, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = remainder < (np.uint64(1) << np.uint64(64 - shift))
+        leading[mask] += shift
+        remainder[mask] <<= np.uint64(shift)
+    rho = np.minimum(leading + 1, 64 - p + 1).astype(np.uint8)
+    return index, rho
+
+
+def hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Ước lượng HyperLogLog cho từng dòng của ma trận thanh ghi (n_sketch x 2^p)."""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.power(2.0, -registers.astype('float64')).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    # Linear counting cho tập nhỏ
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.round(np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)).astype('int64')
+
+
+def hll_relative_error(p: int) -> float:
+    """Sai số chuẩn tương đối của HyperLogLog với 2^p thanh ghi."""
+    return 1.04 / np.sqrt(1 << p)
+
+
+class HyperLogLog:
+    """Ước lượng số giá trị phân biệt với 2^p thanh ghi (sai số ~1.04/sqrt(2^p))."""
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values) -> 'HyperLogLog':
+        series = pd.Series(values).dropna()
+        if series.empty:
+            return self
+        hashes = pd.util.hash_array(series.to_numpy())
+        return self.update_hashes(hashes)
+
+    def update_hashes(self, hashes: np.ndarray) -> 'HyperLogLog':
+        """Cập nhật từ các hash 64-bit đã tính sẵn (ví dụ hash của cả dòng)."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return self
+        index, rho = hll_registers(hashes, self.p)
+        np.maximum.at(self.registers, index, rho)
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if other.p != self.p:
+            raise ValueError("Không thể gộp HyperLogLog khác precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        return int(hll_estimate(self.registers)[0])
+
+
+def log_bucket_index(values, alpha: float) -> np.ndarray:
+    """
+    Bucket log của từng giá trị (histogram sai số tương đối ``alpha``, kiểu DDSketch):
+    bucket i > 0 chứa (gamma^(i-1-offset), gamma^(i-offset)] với gamma = (1+alpha)/(1-alpha),
+    bucket âm đối xứng cho giá trị âm, bucket 0 cho giá trị ~0.
+    """
+    values = np.asarray(values, dtype='float64')
+    gamma = (1 + alpha) / (1 - alpha)
+    offset = _log_bucket_offset(gamma)
+    magnitude = np.abs(values)
+    index = np.zeros(values.shape, dtype=np.int64)
+    nonzero = magnitude > _LOG_BUCKET_MIN
+    index[nonzero] = np.ceil(np.log(magnitude[nonzero]) / np.log(gamma)).astype(np.int64) + offset
+    return np.where(values < 0, -index, index)
+
+
+def log_bucket_value(index, alpha: float) -> np.ndarray:
+    """Giá trị đại diện của bucket (sai số tương đối <= ``alpha`` với mọi giá trị trong bucket)."""
+    index = np.asarray(index, dtype=np.int64)
+    gamma = (1 + alpha) / (1 - alpha)
+    offset = _log_bucket_offset(gamma)
+    magnitude = 2 * np.power(gamma, np.abs(index) - offset) / (gamma + 1)
+    return np.where(index == 0, 0.0, np.sign(index) * magnitude)
+
+
+# Giá trị tuyệt đối nhỏ hơn ngưỡng này rơi vào bucket 0
+_LOG_BUCKET_MIN = 1e-9
+
+
+def _log_bucket_offset(gamma: float) -> int:
+    return int(np.ceil(-np.log(_LOG_BUCKET_MIN) / np.log(gamma))) + 1
+
+
+def kmv_estimate(count, kth_hash, k: int):
+    """
+    Số giá trị phân biệt từ ``count`` hash phân biệt và hash nhỏ thứ ``k`` (vector hoá
+    được): chính xác khi ``count < k``, ngược lại ``(k - 1) / (h_k / 2^64)``.
+    """
+    count = np.asarray(count, dtype='float64')
+    kth = np.asarray(kth_hash, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimate = (k - 1) / ((kth + 1.0) / 2.0 ** 64)
+    return np.where(count < k, count, estimate)
+
+
+class KMinValues:
+    """Đếm phân biệt bằng ``k`` hash 64-bit nhỏ nhất (KMV, sai số ~1/sqrt(k))."""
+
+    def __init__(self, k: int = 4096):
+        self.k = k
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, values) -> 'KMinValues':
+        series = pd.Series(values).dropna()
+        if series.empty:
+            return self
+        return self.update_hashes(pd.util.hash_array(series.to_numpy()))
+
+    def update_hashes(self, hashes: np.ndarray) -> 'KMinValues':
+        merged = np.union1d(self.hashes, np.asarray(hashes, dtype=np.uint64))
+        self.hashes = merged[:self.k]
+        return self
+
+    def merge(self, other: 'KMinValues') -> 'KMinValues':
+        if other.k != self.k:
+            raise ValueError("Không thể gộp KMinValues khác k")
+        return self.update_hashes(other.hashes)
+
+    def estimate(self) -> int:
+        if len(self.hashes) < self.k:
+            return len(self.hashes)
+        return int(round(float(kmv_estimate(len(self.hashes), self.hashes[-1], self.k))))
+
+
+class TopK:
+    """Các giá trị phổ biến nhất theo Misra-Gries (số đếm là cận dưới)."""
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+
+    def update(self, values) -> 'TopK':
+        counts = pd.Series(values).dropna().value_counts(sort=False)
+        return self._add(counts.items())
+
+    def merge(self, other: 'TopK') -> 'TopK':
+        return self._add(other.counts.items())
+
+    def _add(self, items) -> 'TopK':
+        for value, count in items:
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > self.capacity:
+            threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {v: c - threshold for v, c in self.counts.items() if c > threshold}
+        return self
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Any, int]]:
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
@@ -0,0 +1,608 @@
+"""
+Columnar (Parquet) on-disk store for materialized datasets.
+
+A store is a directory placed next to its source file, e.g.::
+
+    data/DataCoSupplyChainDataset.normalized.columnar/
+        manifest.json
+        part-00000.parquet
+
+The manifest pins the schema (column order + pandas dtypes), the parts that make
+up the store and a fingerprint of the source file (path, mtime, size, sha256) so
+that loaders can serve the store directly and rebuild only when the source changes.
+Rows appended to the source later are added as further parts (``append_part``)
+instead of rebuilding the whole store.
+
+A store may also be hive-partitioned (``write_store(partition_by=...)``)::
+
+    data/merged/supplychain_weather_merged_global.partitioned.columnar/
+        manifest.json
+        region=EU/month=2017-03/part-00000.parquet
+        region=APAC/month=2017-03/part-00000.parquet
+
+The manifest then records the partition keys of every part and ``read_store`` only
+opens the parts whose keys can satisfy the ``filters`` of the query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+STORE_SUFFIX = ".columnar"
+MANIFEST_NAME = "manifest.json"
+STORE_FORMAT_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+
+PathLike = Union[str, os.PathLike]
+# Conjunction of (column, op, value) predicates, same shape as pyarrow/pandas ``filters=``.
+Filters = Sequence[Tuple[str, str, Any]]
+
+FILTER_OPS = ("==", "=", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+# Hive partitioning: (key, column, transform) triples; "value" partitions on the column
+# value itself, "month" on the YYYY-MM of a date column.
+PartitionSpec = Sequence[Tuple[str, str, str]]
+PARTITION_TRANSFORMS = ("value", "month")
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+logger = logging.getLogger("columnar_store")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+def store_dir_for(source_path: PathLike, variant: str = "") -> Path:
+    """Return the store directory that sits next to ``source_path``."""
+    source = Path(source_path)
+    name = source.stem + (f".{variant}" if variant else "") + STORE_SUFFIX
+    return source.with_name(name)
+
+
+def file_sha256(path: PathLike) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path: PathLike, with_hash: bool = True) -> Dict[str, Any]:
+    stat = os.stat(path)
+    fingerprint: Dict[str, Any] = {
+        "path": str(Path(path).resolve()),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+    }
+    if with_hash:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+
+def source_token(path: PathLike) -> str:
+    """Cheap version token for a file: changes whenever its path, mtime or size does."""
+    fingerprint = source_fingerprint(path, with_hash=False)
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def store_token(store_dir: PathLike) -> Optional[str]:
+    """Version token of a store: changes whenever it is rebuilt or a part is added."""
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        return None
+    key = [manifest.get("source", {}).get("sha256"), manifest.get("created_at"), manifest.get("parts")]
+    return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+
+
+def read_manifest(store_dir: PathLike) -> Optional[Dict[str, Any]]:
+    manifest_path = Path(store_dir) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        logger.warning("Unreadable manifest %s: %s", manifest_path, exc)
+        return None
+
+
+def _write_manifest(store_dir: Path, manifest: Dict[str, Any]) -> None:
+    # Write-then-rename so that concurrent readers never see a half-written manifest.
+    target = store_dir / MANIFEST_NAME
+    tmp = store_dir / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def is_store_fresh(
+    store_dir: PathLike,
+    source_path: PathLike,
+    expected: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """
+    True when the store exists and was built from the current content of ``source_path``.
+
+    The cheap (mtime, size) check is tried first; the sha256 is only recomputed when
+    the mtime moved, e.g. after a ``touch`` or a checkout that did not change content.
+    ``expected`` holds manifest entries (e.g. a processing-pipeline signature passed
+    to ``write_store(extra=...)``) that must match as well.
+    """
+    store = Path(store_dir)
+    manifest = read_manifest(store)
+    if manifest is None or manifest.get("format_version") != STORE_FORMAT_VERSION:
+        return False
+    if expected and any(manifest.get(key) != value for key, value in expected.items()):
+        return False
+    if not all((store / part).exists() for part in manifest.get("parts", [])):
+        return False
+    if not Path(source_path).exists():
+        return False
+
+    recorded = manifest.get("source", {})
+    current = source_fingerprint(source_path, with_hash=False)
+    if current["size"] != recorded.get("size"):
+        return False
+    if current["mtime"] == recorded.get("mtime"):
+        return True
+    if file_sha256(source_path) != recorded.get("sha256"):
+        return False
+
+    manifest["source"]["mtime"] = current["mtime"]
+    try:
+        _write_manifest(store, manifest)
+    except OSError:
+        pass
+    return True
+
+
+def _coerce_mixed_object_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet needs one physical type per column; stringify mixed object columns."""
+    mixed = [
+        col
+        for col in df.columns
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")
+    ]
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _write_part(df: pd.DataFrame, store: Path, part_name: str) -> None:
+    tmp = store / f"{part_name}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, engine="pyarrow", index=False)
+    os.replace(tmp, store / part_name)
+
+
+def _partition_keys(df: pd.DataFrame, partition_by: PartitionSpec) -> pd.DataFrame:
+    keys = {}
+    for key, column, transform in partition_by:
+        if transform not in PARTITION_TRANSFORMS:
+            raise ValueError(f"Unknown partition transform {transform!r}; expected one of {PARTITION_TRANSFORMS}")
+        if transform == "month":
+            values = pd.to_datetime(df[column], errors="coerce").dt.strftime("%Y-%m")
+        else:
+            values = df[column].astype("string")
+        keys[key] = values.fillna(HIVE_DEFAULT_PARTITION).astype(str)
+    return pd.DataFrame(keys, index=df.index)
+
+
+def _write_partitioned_parts(
+    df: pd.DataFrame,
+    store: Path,
+    partition_by: PartitionSpec,
+    part_number: int,
+) -> Dict[str, Dict[str, str]]:
+    """Write one ``<key>=<value>/.../part-NNNNN.parquet`` file per partition present in ``df``."""
+    names = [key for key, _, _ in partition_by]
+    written: Dict[str, Dict[str, str]] = {}
+    if df.empty:
+        return written
+    groups = _partition_keys(df, partition_by).groupby(names, sort=True).indices
+    for values, positions in groups.items():
+        values = values if isinstance(values, tuple) else (values,)
+        rel_dir = "/".join(f"{name}={quote(value, safe='')}" for name, value in zip(names, values))
+        (store / rel_dir).mkdir(parents=True, exist_ok=True)
+        part_name = f"{rel_dir}/part-{part_number:05d}.parquet"
+        _write_part(df.iloc[positions], store, part_name)
+        written[part_name] = dict(zip(names, values))
+    return written
+
+
+def _remove_stale_parts(store: Path, parts: List[str]) -> None:
+    keep = set(parts)
+    for stale in store.rglob("part-*.parquet"):
+        if stale.relative_to(store).as_posix() not in keep:
+            stale.unlink(missing_ok=True)
+    # Partition directories left empty by a rebuild
+    for directory in sorted((d for d in store.rglob("*") if d.is_dir()), key=lambda d: len(d.parts), reverse=True):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+
+
+def write_store(
+    df: pd.DataFrame,
+    store_dir: PathLike,
+    source_path: PathLike,
+    encoding: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+    partition_by: Optional[PartitionSpec] = None,
+) -> Dict[str, Any]:
+    """
+    Materialize ``df`` as a fresh store built from ``source_path``.
+
+    Args:
+        partition_by: Optional hive partitioning, e.g.
+            ``[("region", "Region", "value"), ("month", "record_date", "month")]``.
+
+    Returns:
+        The manifest that was written.
+    """
+    store = Path(store_dir)
+    store.mkdir(parents=True, exist_ok=True)
+    df = _coerce_mixed_object_columns(df.reset_index(drop=True))
+
+    partitions: Dict[str, Dict[str, str]] = {}
+    if partition_by:
+        partitions = _write_partitioned_parts(df, store, partition_by, 0)
+        parts = list(partitions)
+    else:
+        parts = ["part-00000.parquet"]
+        _write_part(df, store, parts[0])
+
+    manifest: Dict[str, Any] = {
+        "format_version": STORE_FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "encoding": encoding,
+        "source": source_fingerprint(source_path),
+        "columns": list(df.columns),
+        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "rows": int(len(df)),
+        "parts": parts,
+    }
+    if partition_by:
+        manifest["partitioning"] = [list(spec) for spec in partition_by]
+        manifest["partitions"] = partitions
+    if extra:
+        manifest.update(extra)
+    _write_manifest(store, manifest)
+
+    _remove_stale_parts(store, manifest["parts"])
+    logger.info("Columnar store written: %s (%d rows, %d parts)", store, len(df), len(parts))
+    return manifest
+
+
+def _next_part_number(parts: List[str]) -> int:
+    numbers = [int(Path(part).name[len("part-"):-len(".parquet")]) for part in parts]
+    return max(numbers, default=-1) + 1
+
+
+def _check_integer_ranges(df: pd.DataFrame, dtypes: Dict[str, str]) -> None:
+    """Raise ValueError when a value does not fit the pinned integer width of its column."""
+    for col, dtype in dtypes.items():
+        try:
+            target = pd.api.types.pandas_dtype(dtype)
+        except TypeError:
+            continue
+        if col not in df.columns or not pd.api.types.is_integer_dtype(target):
+            continue
+        nullable = pd.api.types.is_extension_array_dtype(target)
+        series = pd.to_numeric(df[col], errors="coerce")
+        if series.isna().any() and not nullable:
+            raise ValueError(f"Column {col} has missing values but is pinned to {dtype}")
+        limits = np.iinfo(target.numpy_dtype if nullable else target)
+        values = series.dropna()
+        if len(values) and (values.min() < limits.min or values.max() > limits.max):
+            raise ValueError(f"Column {col} does not fit {dtype}")
+
+
+def append_part(
+    df: pd.DataFrame,
+    store_dir: PathLike,
+    source_path: PathLike,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Add ``df`` (rows appended to ``source_path`` since the last build) as a new part.
+
+    Columns are aligned to the pinned schema. The recorded source fingerprint is
+    refreshed without re-hashing the whole file, so a later mtime-only change
+    (``touch``) of an appended source triggers a full rebuild rather than a hash check.
+
+    Returns:
+        The updated manifest.
+    """
+    store = Path(store_dir)
+    manifest = read_manifest(store)
+    if manifest is None:
+        raise FileNotFoundError(f"No columnar store at {store}")
+
+    dtypes = manifest.get("dtypes", {})
+    df = df.reset_index(drop=True).reindex(columns=manifest["columns"])
+    _check_integer_ranges(df, dtypes)
+    df = _coerce_mixed_object_columns(_pin_dtypes(df, dtypes))
+    part_number = _next_part_number(manifest["parts"])
+    if manifest.get("partitioning"):
+        written = _write_partitioned_parts(df, store, manifest["partitioning"], part_number)
+        manifest["partitions"] = {**manifest.get("partitions", {}), **written}
+        new_parts = list(written)
+    else:
+        new_parts = [f"part-{part_number:05d}.parquet"]
+        _write_part(df, store, new_parts[0])
+
+    manifest["parts"] = manifest["parts"] + new_parts
+    manifest["rows"] = int(manifest.get("rows", 0)) + int(len(df))
+    manifest["source"] = dict(source_fingerprint(source_path, with_hash=False), sha256=None)
+    manifest["appended_at"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    if extra:
+        manifest.update(extra)
+    _write_manifest(store, manifest)
+    logger.info("Columnar store %s: appended %d part(s) (%d rows)", store, len(new_parts), len(df))
+    return manifest
+
+
+def concat_parts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames of the same schema, keeping categorical columns categorical.
+
+    Parts written at different times may carry different category lists; they are
+    unioned in first-seen order so codes handed out by earlier parts stay valid.
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in frames[0].columns:
+        if not all(col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            continue
+        categories: List[Any] = list(dict.fromkeys(
+            value for frame in frames for value in frame[col].cat.categories
+        ))
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def filter_columns(filters: Optional[Filters]) -> List[str]:
+    """Columns referenced by ``filters`` (in first-seen order)."""
+    seen: List[str] = []
+    for column, _, _ in filters or []:
+        if column not in seen:
+            seen.append(column)
+    return seen
+
+
+def projection_columns(columns: Optional[Iterable[str]], filters: Optional[Filters]) -> Optional[List[str]]:
+    """Columns that must be decoded to answer ``columns`` under ``filters`` (None = all)."""
+    if columns is None:
+        return None
+    needed = list(dict.fromkeys(columns))
+    for column in filter_columns(filters):
+        if column not in needed:
+            needed.append(column)
+    return needed
+
+
+def _validate_filters(filters: Filters) -> None:
+    for predicate in filters:
+        if len(predicate) != 3 or predicate[1] not in FILTER_OPS:
+            raise ValueError(f"Invalid filter {predicate!r}; expected (column, op, value) with op in {FILTER_OPS}")
+
+
+def check_filters(manifest: Dict[str, Any], filters: Optional[Filters]) -> None:
+    """Raise ValueError for malformed predicates and KeyError for columns the store does not have."""
+    if not filters:
+        return
+    _validate_filters(filters)
+    dtypes = manifest.get("dtypes", {})
+    missing = [col for col in filter_columns(filters) if col not in dtypes]
+    if missing:
+        raise KeyError(f"Filter columns not found in store: {missing}")
+
+
+def filters_mask(df: pd.DataFrame, filters: Optional[Filters]) -> pd.Series:
+    """Boolean mask equivalent to pushing ``filters`` into the reader."""
+    mask = pd.Series(True, index=df.index)
+    if not filters:
+        return mask
+    _validate_filters(filters)
+    for column, op, value in filters:
+        if column not in df.columns:
+            raise KeyError(f"Filter column not found: {column}")
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series) and not isinstance(value, (list, tuple, set)):
+            value = pd.Timestamp(value)
+        if op in ("==", "="):
+            mask &= series == value
+        elif op == "!=":
+            mask &= series != value
+        elif op == "<":
+            mask &= series < value
+        elif op == "<=":
+            mask &= series <= value
+        elif op == ">":
+            mask &= series > value
+        elif op == ">=":
+            mask &= series >= value
+        elif op == "in":
+            mask &= series.isin(list(value))
+        else:
+            mask &= ~series.isin(list(value))
+    return mask.fillna(False).astype(bool)
+
+
+def apply_filters(
+    df: pd.DataFrame,
+    filters: Optional[Filters] = None,
+    columns: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Filter rows then project columns of an in-memory frame."""
+    if filters:
+        df = df[filters_mask(df, filters)].reset_index(drop=True)
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+
+def _coerce_filters_for_parquet(filters: Filters, dtypes: Dict[str, str]) -> List[Tuple[str, str, Any]]:
+    """pyarrow compares timestamps only with timestamps; accept ISO strings for date columns."""
+    coerced = []
+    for column, op, value in filters:
+        op = "==" if op == "=" else op
+        if dtypes.get(column, "").startswith("datetime64"):
+            if isinstance(value, (list, tuple, set)):
+                value = [pd.Timestamp(v) for v in value]
+            else:
+                value = pd.Timestamp(value)
+        elif isinstance(value, (tuple, set)):
+            value = list(value)
+        coerced.append((column, op, value))
+    return coerced
+
+
+def _pin_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    for col, dtype in dtypes.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        try:
+            df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            logger.warning("Cannot restore dtype %s for column %s", dtype, col)
+    return df
+
+
+def _partition_may_match(value: str, transform: str, op: str, target: Any) -> bool:
+    """False only when no row of the partition ``value`` can satisfy ``op target``."""
+    if value == HIVE_DEFAULT_PARTITION or op in ("!=", "not in"):
+        return True
+    targets = list(target) if op == "in" else [target]
+    if transform == "value":
+        if op in ("==", "=", "in"):
+            return value in {str(t) for t in targets}
+        return True
+
+    start = pd.Timestamp(f"{value}-01")
+    end = start + pd.offsets.MonthBegin(1)
+    for t in targets:
+        t = pd.Timestamp(t)
+        if op in ("==", "=", "in") and start <= t < end:
+            return True
+        if (op == "<" and start < t) or (op == "<=" and start <= t) or (op in (">", ">=") and t < end):
+            return True
+    return False
+
+
+def prune_parts(manifest: Dict[str, Any], filters: Optional[Filters]) -> List[str]:
+    """Parts of a (possibly partitioned) store that ``filters`` cannot rule out."""
+    parts = manifest["parts"]
+    partitioning = manifest.get("partitioning")
+    if not filters or not partitioning:
+        return parts
+    partitions = manifest.get("partitions", {})
+    kept = []
+    for part in parts:
+        keys = partitions.get(part, {})
+        if all(
+            _partition_may_match(keys[key], transform, op, value)
+            for column, op, value in filters
+            for key, part_column, transform in partitioning
+            if part_column == column and key in keys
+        ):
+            kept.append(part)
+    return kept
+
+
+def _empty_frame(columns: List[str], dtypes: Dict[str, str]) -> pd.DataFrame:
+    data = {}
+    for col in columns:
+        try:
+            data[col] = pd.Series(dtype=dtypes.get(col, "object"))
+        except TypeError:
+            data[col] = pd.Series(dtype="object")
+    return pd.DataFrame(data)
+
+
+def part_rows(store_dir: PathLike, part: str) -> int:
+    """Row count of one part, from its Parquet footer (no data is decoded)."""
+    return pq.read_metadata(str(Path(store_dir) / part)).num_rows
+
+
+def read_store(
+    store_dir: PathLike,
+    columns: Optional[Iterable[str]] = None,
+    filters: Optional[Filters] = None,
+    parts: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read the parts listed in the manifest and restore the pinned dtypes.
+
+    ``columns`` is pushed into the Parquet reader (only those column chunks are decoded)
+    and ``filters`` into the row-group scan, so callers that need a slice never
+    materialize the whole dataset. On a partitioned store, parts whose partition keys
+    cannot match ``filters`` are not opened at all. ``parts`` restricts the read to
+    those manifest parts (e.g. the ones appended since a frame was loaded).
+    """
+    store = Path(store_dir)
+    manifest = read_manifest(store)
+    if manifest is None:
+        raise FileNotFoundError(f"No columnar store at {store}")
+
+    dtypes = manifest.get("dtypes", {})
+    check_filters(manifest, filters)
+    if columns is not None:
+        columns = [col for col in columns if col in dtypes]
+    read_columns = projection_columns(columns, filters)
+    parquet_filters = _coerce_filters_for_parquet(filters, dtypes) if filters else None
+
+    selected = prune_parts(manifest, filters)
+    if parts is not None:
+        wanted = set(parts)
+        selected = [part for part in selected if part in wanted]
+    paths = [str(store / part) for part in selected]
+    if not paths:
+        return _empty_frame(columns if columns is not None else manifest["columns"], dtypes)
+    frames = [
+        pd.read_parquet(path, engine="pyarrow", columns=read_columns, filters=parquet_filters)
+        for path in paths
+    ]
+    df = _pin_dtypes(concat_parts(frames), dtypes)
+    if columns is not None and list(df.columns) != columns:
+        df = df[columns]
+    return df
+
+
+__all__ = [
+    "store_dir_for",
+    "source_fingerprint",
+    "read_manifest",
+    "is_store_fresh",
+    "source_token",
+    "store_token",
+    "write_store",
+    "append_part",
+    "concat_parts",
+    "read_store",
+    "part_rows",
+    "prune_parts",
+    "apply_filters",
+    "check_filters",
+    "filters_mask",
+    "projection_columns",
+    "Filters",
+    "PartitionSpec",
+]
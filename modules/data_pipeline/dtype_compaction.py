@@ -0,0 +1,177 @@
+"""
+Memory-compact dtypes for loaded frames.
+
+Low-cardinality string columns become pandas categoricals whose categories come from
+a process-wide shared dictionary (so ``Order Country`` in the supply frame and
+``Country`` in the global frame agree on codes), integers are downcast to the
+smallest signed width and floats to float32 only when that is lossless (float columns
+are never turned into integers, even when every value is whole).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns that are always dictionary-encoded when present.
+CATEGORICAL_COLUMNS = [
+    "Order Country",
+    "Customer Country",
+    "Country",
+    "Category Name",
+    "Delivery Status",
+    "Shipping Mode",
+    "Order City",
+    "Customer City",
+    "City",
+    "Order Region",
+    "Region",
+    "Market",
+    "Customer Segment",
+    "Department Name",
+    "Order Status",
+    "Type",
+]
+
+# Columns that describe the same domain share one dictionary.
+SHARED_DICTIONARY_KEYS = {
+    "Order Country": "country",
+    "Customer Country": "country",
+    "Country": "country",
+    "Order City": "city",
+    "Customer City": "city",
+    "City": "city",
+}
+
+# Other object columns are encoded when distinct values / rows is at most this ratio.
+MAX_UNIQUE_RATIO = 0.5
+
+logger = logging.getLogger("dtype_compaction")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+_dictionaries: Dict[str, List[Any]] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def shared_categories(column: str, values: Iterable[Any]) -> List[Any]:
+    """
+    Categories for ``column`` that contain ``values``.
+
+    Known values keep their position and new ones are appended (sorted), so codes
+    handed out earlier in the process never change.
+    """
+    key = SHARED_DICTIONARY_KEYS.get(column, column)
+    with _dictionaries_lock:
+        known = _dictionaries.setdefault(key, [])
+        seen = set(known)
+        fresh = sorted({v for v in values if v not in seen}, key=str)
+        known.extend(fresh)
+        return list(known)
+
+
+def reset_shared_dictionaries() -> None:
+    with _dictionaries_lock:
+        _dictionaries.clear()
+
+
+def _should_categorize(series: pd.Series, column: str, max_unique_ratio: float) -> bool:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+        return False
+    if pd.api.types.infer_dtype(series, skipna=True) != "string":
+        return False
+    if column in CATEGORICAL_COLUMNS:
+        return True
+    if len(series) == 0:
+        return False
+    return series.nunique(dropna=True) / len(series) <= max_unique_ratio
+
+
+def _to_category(series: pd.Series, column: str) -> pd.Series:
+    categories = shared_categories(column, series.dropna().unique())
+    return pd.Series(pd.Categorical(series, categories=categories), index=series.index, name=series.name)
+
+
+def _downcast_numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if not pd.api.types.is_float_dtype(series):
+        return series
+
+    # Floats stay floating even when every value is whole: an int8 price wraps on
+    # arithmetic (2 * 120 -> -16) and a later fractional value would change the kind.
+    values = series.to_numpy()
+    if series.dtype == np.float64:
+        as32 = values.astype(np.float32)
+        if np.array_equal(as32.astype(np.float64), values, equal_nan=True):
+            return pd.Series(as32, index=series.index, name=series.name)
+    return series
+
+
+def compact_dataframe(
+    df: pd.DataFrame,
+    categorical_columns: Optional[List[str]] = None,
+    max_unique_ratio: float = MAX_UNIQUE_RATIO,
+    downcast: bool = True,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Return a memory-compact copy of ``df`` and a per-column report.
+
+    Args:
+        df: Frame to compact (not modified).
+        categorical_columns: Extra columns to force into categoricals.
+        max_unique_ratio: Distinct/rows threshold for encoding other string columns.
+        downcast: Downcast numeric columns to the smallest safe width.
+
+    Returns:
+        ``(compacted, report)`` where report has ``columns`` (before/after bytes and
+        dtypes for every changed column) and ``total_before``/``total_after`` bytes.
+    """
+    forced = set(categorical_columns or [])
+    out = df.copy()
+    columns_report: Dict[str, Dict[str, Any]] = {}
+    total_before = int(df.memory_usage(deep=True, index=False).sum())
+
+    for col in df.columns:
+        series = df[col]
+        if col in forced and not isinstance(series.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(series):
+            compacted = _to_category(series, col)
+        elif _should_categorize(series, col, max_unique_ratio):
+            compacted = _to_category(series, col)
+        elif downcast and pd.api.types.is_numeric_dtype(series):
+            compacted = _downcast_numeric(series)
+        else:
+            continue
+        if compacted.dtype == series.dtype:
+            continue
+        out[col] = compacted
+        columns_report[col] = {
+            "dtype_before": str(series.dtype),
+            "dtype_after": str(compacted.dtype),
+            "bytes_before": int(series.memory_usage(deep=True, index=False)),
+            "bytes_after": int(compacted.memory_usage(deep=True, index=False)),
+        }
+
+    total_after = int(out.memory_usage(deep=True, index=False).sum())
+    report = {"columns": columns_report, "total_before": total_before, "total_after": total_after}
+    logger.info(
+        "Compacted %d columns: %.1f MB -> %.1f MB",
+        len(columns_report),
+        total_before / 1e6,
+        total_after / 1e6,
+    )
+    return out, report
+
+
+__all__ = ["compact_dataframe", "shared_categories", "reset_shared_dictionaries", "CATEGORICAL_COLUMNS"]
@@ -1,16 +1,47 @@
 """
 Utility functions for loading the merged global supply chain & weather dataset.
+
+The merge pipeline (and any full load) materializes the dataset as a hive-partitioned
+columnar store next to the CSV::
+
+    supplychain_weather_merged_global.partitioned.columnar/
+        region=EU/month=2017-03/part-00000.parquet
+        ...
+
+so a query filtered on ``Region`` and/or ``record_date`` only opens the partitions it
+touches. The per-region weather medians used for imputation are kept in the manifest,
+so rows appended to the CSV later can be ingested on their own with
+``ingest_global_appends``.
 """
 
 from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from modules.data_pipeline.columnar_store import (
+    Filters,
+    apply_filters,
+    filter_columns,
+    is_store_fresh,
+    read_manifest,
+    read_store,
+    store_dir_for,
+    write_store,
+)
+from modules.data_pipeline.dtype_compaction import compact_dataframe
+from modules.data_pipeline.incremental_ingest import (
+    Delta,
+    catch_up_delta,
+    csv_watermark,
+    ingest_appended_rows,
+    store_build,
+)
+
 BASE_DIR = Path(__file__).resolve().parents[2]
 DEFAULT_DATASET_PATH = BASE_DIR / "data" / "merged" / "supplychain_weather_merged_global.csv"
 
@@ -30,6 +61,19 @@ REGION_LUT = {
     "MENA": "MENA",
 }
 
+# Source columns each derived column is built from (see _normalize_location_columns).
+DERIVED_SOURCE_COLUMNS = {
+    "Country": ["Country", "country_norm"],
+    "City": ["City", "city_norm"],
+    "Region": ["region_detected", "Region"],
+}
+FILTER_CHUNK_SIZE = 200_000
+
+STORE_VARIANT = "partitioned"
+PARTITION_BY = [("region", "Region", "value"), ("month", "record_date", "month")]
+# Bump whenever the loading pipeline changes so existing stores are rebuilt.
+PIPELINE_VERSION = 2
+
 WEATHER_KEYWORDS = ["weather", "temp", "precip", "rain", "storm", "humidity", "wind", "dew", "sunshine"]
 
 logger = logging.getLogger("global_dataset_loader")
@@ -74,51 +118,308 @@ def _parse_date_column(df: pd.DataFrame) -> pd.Series:
     return pd.to_datetime(df[col], errors="coerce")
 
 
-def load_global_dataset(path: Optional[str] = None) -> pd.DataFrame:
-    """
-    Load the merged global dataset with schema validation, normalization and weather imputation.
-    """
-    dataset_path = Path(path or DEFAULT_DATASET_PATH)
-    if not dataset_path.exists():
-        raise FileNotFoundError(f"Global dataset not found at {dataset_path}")
+def _date_source_column(columns: Iterable[str]) -> str:
+    columns = list(columns)
+    if "record_date" in columns:
+        return "record_date"
+    candidates = [c for c in columns if "date" in c.lower()]
+    if not candidates:
+        raise ValueError("Global dataset missing any date column.")
+    return candidates[0]
 
-    logger.info("Loading global dataset: %s", dataset_path)
-    df = pd.read_csv(dataset_path)
 
-    missing_required = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-    if missing_required:
-        logger.warning("Dataset missing required columns: %s", missing_required)
+def _source_usecols(header: List[str], columns: Optional[Iterable[str]], filters: Optional[Filters]) -> Optional[List[str]]:
+    """Raw CSV columns needed to produce ``columns`` (plus filter and derivation inputs)."""
+    if columns is None:
+        return None
+    wanted = list(dict.fromkeys(list(columns) + filter_columns(filters)))
+    # Derived columns and the region-level weather imputation always need these.
+    wanted += ["Region", _date_source_column(header)]
+    needed: List[str] = []
+    for col in wanted:
+        for source in DERIVED_SOURCE_COLUMNS.get(col, [col]):
+            if source in header and source not in needed:
+                needed.append(source)
+    return needed
+
 
-    df["Country"] = df.get("Country", df.get("country_norm", "")).fillna("")
-    df["City"] = df.get("City", df.get("city_norm", "")).fillna("")
-    df["Region"] = df.get("region_detected", df.get("Region", ""))
+def _normalize_location_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df["Country"] = df.get("Country", df.get("country_norm", pd.Series("", index=df.index))).fillna("")
+    df["City"] = df.get("City", df.get("city_norm", pd.Series("", index=df.index))).fillna("")
+    df["Region"] = df.get("region_detected", df.get("Region", pd.Series("", index=df.index)))
     df["Region"] = df["Region"].fillna("").apply(_normalize_region)
     df["City"] = df["City"].apply(_normalize_text)
+    return df
 
-    df["record_date"] = _parse_date_column(df)
-    df["record_date"] = df["record_date"].fillna(method="ffill").fillna(method="bfill")
 
+def _read_filtered_chunks(
+    dataset_path: Path,
+    usecols: Optional[List[str]],
+    filters: Filters,
+) -> pd.DataFrame:
+    """Stream the CSV and keep only rows matching ``filters`` so peak memory stays bounded."""
+    kept: List[pd.DataFrame] = []
+    last_date = None
+    for chunk in pd.read_csv(dataset_path, usecols=usecols, chunksize=FILTER_CHUNK_SIZE, low_memory=False):
+        chunk = _normalize_location_columns(chunk)
+        # Missing dates take the previous date in file order (carried across chunks), as in a full load
+        dates = _parse_date_column(chunk).ffill()
+        if last_date is not None:
+            dates = dates.fillna(last_date)
+        chunk["record_date"] = dates.bfill()
+        if chunk["record_date"].notna().any():
+            last_date = chunk["record_date"].iloc[-1]
+        kept.append(apply_filters(chunk, filters=filters))
+    if not kept:
+        return pd.DataFrame(columns=usecols or [])
+    return pd.concat(kept, ignore_index=True)
+
+
+def _pipeline_signature() -> Dict[str, Any]:
+    return {"pipeline": {"name": "global_dataset", "version": PIPELINE_VERSION}}
+
+
+def _coerce_weather_columns(df: pd.DataFrame) -> List[str]:
+    """Coerce the detected weather columns to numbers in place and return their names."""
     weather_cols = _detect_weather_columns(df.columns)
     for col in weather_cols:
         series = df[col]
-        if pd.api.types.is_numeric_dtype(series):
-            df[col] = series
-        else:
+        if not pd.api.types.is_numeric_dtype(series):
             with pd.option_context("mode.use_inf_as_na", True):
                 df[col] = pd.to_numeric(series, errors="coerce")
+    return weather_cols
+
 
+def _compute_medians(df: pd.DataFrame, weather_cols: List[str]) -> Dict[str, Any]:
+    """Per-region medians, then global medians of the region-imputed columns."""
+    medians: Dict[str, Any] = {"region": {}, "global": {}}
     for col in weather_cols:
-        if col not in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
             continue
+        region_medians = df.groupby("Region")[col].median()
+        medians["region"][col] = {region: float(value) for region, value in region_medians.dropna().items()}
+        global_median = df[col].fillna(df["Region"].map(medians["region"][col])).median()
+        medians["global"][col] = None if pd.isna(global_median) else float(global_median)
+    return medians
+
+
+def _full_dataset_medians(dataset_path: Path, header: List[str], store_dir: Path) -> Dict[str, Any]:
+    """
+    Imputation medians of the whole dataset, so a filtered load imputes exactly like
+    "full load, then filter". Taken from a fresh store's manifest when there is one,
+    otherwise computed from the region and weather columns of the CSV alone.
+    """
+    if is_store_fresh(store_dir, dataset_path, _pipeline_signature()):
+        manifest = read_manifest(store_dir) or {}
+        if manifest.get("impute_medians") is not None:
+            return manifest["impute_medians"]
+    weather_cols = _detect_weather_columns(header)
+    usecols = [col for col in header if col in weather_cols or col in DERIVED_SOURCE_COLUMNS["Region"]]
+    df = _normalize_location_columns(pd.read_csv(dataset_path, usecols=usecols, low_memory=False))
+    return _compute_medians(df, _coerce_weather_columns(df))
+
+
+def _prepare_rows(
+    df: pd.DataFrame,
+    medians: Optional[Dict[str, Any]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Parse dates, coerce weather columns and impute missing weather values.
+
+    Args:
+        df: Rows with normalized location columns.
+        medians: ``{"region": {col: {region: median}}, "global": {col: median}}`` of the
+            full dataset; computed from ``df`` when omitted (full loads). Filtered loads
+            pass the full-dataset medians and appended rows the medians of the load
+            they are appended to.
+
+    Returns:
+        ``(rows sorted by record_date, medians used)``
+    """
+    df["record_date"] = _parse_date_column(df)
+    df["record_date"] = df["record_date"].ffill().bfill()
+
+    weather_cols = _coerce_weather_columns(df)
+    if medians is None:
+        medians = _compute_medians(df, weather_cols)
+    for col in weather_cols:
         if not pd.api.types.is_numeric_dtype(df[col]):
             continue
-        df[col] = df.groupby("Region")[col].transform(lambda s: s.fillna(s.median()))
-        df[col] = df[col].fillna(df[col].median())
+        df[col] = df[col].fillna(df["Region"].map(medians["region"].get(col, {})))
+        if medians["global"].get(col) is not None:
+            df[col] = df[col].fillna(medians["global"][col])
 
-    df.sort_values("record_date", inplace=True)
+    df.sort_values("record_date", inplace=True, kind="stable")
     df.reset_index(drop=True, inplace=True)
+    return df, medians
+
+
+def _write_global_store(df: pd.DataFrame, dataset_path: Path, medians: Dict[str, Any]) -> None:
+    extra = {
+        **_pipeline_signature(),
+        "impute_medians": medians,
+        "watermark": csv_watermark(dataset_path, rows=len(df), max_date=df["record_date"].max()),
+    }
+    try:
+        write_store(
+            df, store_dir_for(dataset_path, STORE_VARIANT), dataset_path, extra=extra, partition_by=PARTITION_BY
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Could not write columnar store for %s: %s", dataset_path, exc)
+
+
+def write_partitioned_dataset(df: pd.DataFrame, path: Optional[str] = None) -> Path:
+    """
+    Materialize the partitioned store for the merged CSV at ``path`` from the frame
+    that was just written there (used by the merge pipeline to avoid re-reading it).
+    """
+    dataset_path = Path(path or DEFAULT_DATASET_PATH)
+    prepared, medians = _prepare_rows(_normalize_location_columns(df.copy()))
+    _write_global_store(prepared, dataset_path, medians)
+    return store_dir_for(dataset_path, STORE_VARIANT)
+
+
+def _read_global_store(
+    store_dir: Path,
+    columns: Optional[List[str]],
+    filters: Optional[Filters],
+) -> pd.DataFrame:
+    """Read the (pruned) partitions; rows of different regions interleave in time, so restore record_date order."""
+    read_columns = columns
+    if columns is not None and "record_date" not in columns:
+        read_columns = list(columns) + ["record_date"]
+    df = read_store(store_dir, columns=read_columns, filters=filters)
+    if "record_date" in df.columns and not df["record_date"].is_monotonic_increasing:
+        df = df.sort_values("record_date", kind="stable").reset_index(drop=True)
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+
+def load_global_dataset(
+    path: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    filters: Optional[Filters] = None,
+    compact: bool = False,
+    use_columnar_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Load the merged global dataset with schema validation, normalization and weather imputation.
+
+    Args:
+        path: CSV path, defaults to ``DEFAULT_DATASET_PATH``.
+        columns: Only decode and return these columns (derived ``Country``/``City``/
+            ``Region``/``record_date`` may be requested as well).
+        filters: ``(column, op, value)`` predicates ANDed together and applied while
+            streaming the file, e.g. ``[("Region", "==", "EU"), ("record_date", ">=", "2017-01-01")]``.
+            Weather imputation still uses the medians of the full dataset, so the result
+            equals a full load filtered afterwards.
+        compact: Dictionary-encode low-cardinality strings and downcast numerics; the
+            per-column before/after bytes are stored in ``df.attrs["compaction_report"]``.
+        use_columnar_cache: Serve from (and on a full load, write) the partitioned store.
+            Filters on ``Region``/``record_date`` prune whole partitions, the rest are
+            pushed into the Parquet reader.
+    """
+    dataset_path = Path(path or DEFAULT_DATASET_PATH)
+    if not dataset_path.exists():
+        raise FileNotFoundError(f"Global dataset not found at {dataset_path}")
+
+    store_dir = store_dir_for(dataset_path, STORE_VARIANT)
+    if use_columnar_cache and is_store_fresh(store_dir, dataset_path, _pipeline_signature()):
+        df = _read_global_store(store_dir, columns, filters)
+        logger.info("Loaded %d rows from columnar store %s", len(df), store_dir)
+        return _finish(df, compact)
+
+    logger.info("Loading global dataset: %s", dataset_path)
+    header = list(pd.read_csv(dataset_path, nrows=0).columns)
+    usecols = _source_usecols(header, columns, filters)
+
+    missing_required = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing_required:
+        logger.warning("Dataset missing required columns: %s", missing_required)
+
+    medians = None
+    if filters:
+        medians = _full_dataset_medians(dataset_path, header, store_dir)
+        df = _read_filtered_chunks(dataset_path, usecols, filters)
+    else:
+        df = pd.read_csv(dataset_path, usecols=usecols, low_memory=False)
+        df = _normalize_location_columns(df)
+
+    df, medians = _prepare_rows(df, medians)
+    if use_columnar_cache and columns is None and not filters:
+        _write_global_store(df, dataset_path, medians)
+
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return _finish(df, compact)
+
+
+def _finish(df: pd.DataFrame, compact: bool) -> pd.DataFrame:
+    if compact:
+        df, report = compact_dataframe(df)
+        df.attrs["compaction_report"] = report
     logger.info("Loaded %d rows with %d columns", len(df), len(df.columns))
     return df
 
 
-__all__ = ["load_global_dataset", "DEFAULT_DATASET_PATH"]
+def ingest_global_appends(path: Optional[str] = None) -> Optional[Delta]:
+    """
+    Append the rows added to the end of the global CSV since the store was built.
+
+    New rows go through the same normalization and are imputed with the stored medians;
+    listeners registered for ``"global_merged"`` receive the delta. When there is no
+    usable store (or the CSV was rewritten) the store is rebuilt and None is returned.
+    """
+    dataset_path = Path(path or DEFAULT_DATASET_PATH)
+    store_dir = store_dir_for(dataset_path, STORE_VARIANT)
+    manifest = read_manifest(store_dir)
+
+    delta = None
+    if manifest is not None and manifest.get("pipeline") == _pipeline_signature()["pipeline"]:
+        delta = ingest_appended_rows(
+            "global_merged",
+            STORE_VARIANT,
+            store_dir,
+            dataset_path,
+            prepare=lambda raw, m: _prepare_rows(_normalize_location_columns(raw), m.get("impute_medians"))[0],
+            date_column="record_date",
+        )
+    if delta is None:
+        logger.info("Rebuilding global dataset store for %s", dataset_path)
+        load_global_dataset(str(dataset_path))
+    return delta
+
+
+def global_store_build(path: Optional[str] = None) -> Optional[str]:
+    """Build identity of the store; record it with a loaded frame for ``catch_up_global``."""
+    return store_build(store_dir_for(Path(path or DEFAULT_DATASET_PATH), STORE_VARIANT))
+
+
+def catch_up_global(loaded_rows: int, build: Optional[str], path: Optional[str] = None) -> Optional[Delta]:
+    """
+    Rows appended to the store since a frame of ``loaded_rows`` rows was loaded from build ``build``.
+
+    Lets a process other than the one that ran ``ingest_global_appends`` (e.g. the server
+    after the nightly script) read only the new parts. None means reload from scratch.
+    """
+    dataset_path = Path(path or DEFAULT_DATASET_PATH)
+    return catch_up_delta(
+        "global_merged",
+        STORE_VARIANT,
+        store_dir_for(dataset_path, STORE_VARIANT),
+        dataset_path,
+        loaded_rows,
+        build,
+        expected=_pipeline_signature(),
+    )
+
+
+__all__ = [
+    "load_global_dataset",
+    "ingest_global_appends",
+    "global_store_build",
+    "catch_up_global",
+    "write_partitioned_dataset",
+    "DEFAULT_DATASET_PATH",
+]
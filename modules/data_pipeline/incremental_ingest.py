@@ -0,0 +1,320 @@
+"""
+Append-only ingestion for CSV sources that only ever grow at the end.
+
+A columnar store built from a CSV records a *watermark* in its manifest: the byte
+offset of the last complete line it contains, the number of source rows, the
+maximum order date and a digest of the bytes just before the offset. When the
+source grows, only the bytes after the watermark are parsed, prepared by the
+dataset's own pipeline and written as a new store part, so the cost of a refresh
+is proportional to the new data.
+
+Each append produces a :class:`Delta` that is handed to the listeners registered
+for the dataset (in-memory caches, rollups, ...) so they can fold the new rows in
+instead of reloading everything. Listeners only exist in the process that ran the
+ingestion. A server whose caches were loaded before another process (e.g. the
+nightly script) appended to the store uses :func:`catch_up_delta` instead: it reads
+only the parts added since the cached frame was loaded. When the prefix of the
+source no longer matches the watermark (the file was rewritten rather than appended
+to), ingestion reports that a full rebuild is required.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from modules.data_pipeline.columnar_store import (
+    PathLike,
+    append_part,
+    concat_parts,
+    is_store_fresh,
+    part_rows,
+    read_manifest,
+    read_store,
+    store_token,
+)
+
+# Bytes before the watermark that must be unchanged for an append to be accepted.
+TAIL_DIGEST_BYTES = 64 * 1024
+
+logger = logging.getLogger("incremental_ingest")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+@dataclass
+class Delta:
+    """Rows appended to a dataset store by one ingestion run."""
+
+    dataset: str
+    variant: str
+    rows: pd.DataFrame
+    start_row: int
+    watermark: Dict[str, Any]
+    token: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.rows) == 0
+
+
+_listeners: Dict[str, List[Callable[[Delta], None]]] = {}
+_listeners_lock = threading.Lock()
+
+
+def register_delta_listener(dataset: str, callback: Callable[[Delta], None]) -> Callable[[Delta], None]:
+    """Call ``callback(delta)`` after every non-empty append to ``dataset``."""
+    with _listeners_lock:
+        callbacks = _listeners.setdefault(dataset, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+    return callback
+
+
+def unregister_delta_listener(dataset: str, callback: Callable[[Delta], None]) -> None:
+    with _listeners_lock:
+        callbacks = _listeners.get(dataset, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+def emit_delta(delta: Delta) -> None:
+    """Hand ``delta`` to every listener; a failing listener does not stop the others."""
+    with _listeners_lock:
+        callbacks = list(_listeners.get(delta.dataset, []))
+    for callback in callbacks:
+        try:
+            callback(delta)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Delta listener %r failed for %s: %s", callback, delta.dataset, exc)
+
+
+def apply_delta(df: Optional[pd.DataFrame], delta: Delta) -> Optional[pd.DataFrame]:
+    """Return ``df`` with the delta rows appended (categoricals stay categorical)."""
+    if df is None or delta.empty:
+        return df
+    rows = delta.rows.reindex(columns=df.columns)
+    return concat_parts([df, rows])
+
+
+def _tail_digest(path: PathLike, offset: int) -> str:
+    start = max(0, offset - TAIL_DIGEST_BYTES)
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        return hashlib.sha256(handle.read(offset - start)).hexdigest()
+
+
+def _complete_lines_end(path: PathLike, size: int) -> int:
+    """Offset just past the last newline (a half-written last line is left for the next run)."""
+    if size == 0:
+        return 0
+    with open(path, "rb") as handle:
+        position = size
+        while position > 0:
+            start = max(0, position - TAIL_DIGEST_BYTES)
+            handle.seek(start)
+            block = handle.read(position - start)
+            index = block.rfind(b"\n")
+            if index >= 0:
+                return start + index + 1
+            position = start
+    return 0
+
+
+def csv_watermark(
+    path: PathLike,
+    rows: int,
+    max_date: Any = None,
+    offset: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Watermark describing how much of ``path`` a store contains.
+
+    Args:
+        path: CSV source.
+        rows: Source rows ingested so far.
+        max_date: Largest order/record date ingested so far (informational).
+        offset: Bytes ingested; defaults to the whole file (a full read also parses
+            an unterminated last line).
+    """
+    if offset is None:
+        offset = os.stat(path).st_size
+    return {
+        "offset": int(offset),
+        "rows": int(rows),
+        "max_date": None if max_date is None or pd.isna(max_date) else pd.Timestamp(max_date).isoformat(),
+        "tail_sha256": _tail_digest(path, offset),
+    }
+
+
+def _read_header(path: PathLike) -> bytes:
+    with open(path, "rb") as handle:
+        return handle.readline()
+
+
+def read_appended_rows(
+    path: PathLike,
+    watermark: Dict[str, Any],
+    encoding: Optional[str] = None,
+    **read_csv_kwargs: Any,
+) -> Optional[Tuple[pd.DataFrame, int]]:
+    """
+    Parse the rows written to ``path`` after ``watermark``.
+
+    Returns:
+        ``(rows, new_offset)``; ``None`` when the file was rewritten, truncated or
+        otherwise no longer extends the watermarked prefix.
+    """
+    offset = int(watermark.get("offset", -1))
+    size = os.stat(path).st_size
+    if offset <= 0 or size < offset or _tail_digest(path, offset) != watermark.get("tail_sha256"):
+        return None
+
+    end = _complete_lines_end(path, size)
+    if end <= offset:
+        return pd.DataFrame(), offset
+
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        payload = handle.read(end - offset)
+    buffer = io.BytesIO(_read_header(path) + payload)
+    rows = pd.read_csv(buffer, encoding=encoding or "utf-8", low_memory=False, **read_csv_kwargs)
+    return rows, end
+
+
+def ingest_appended_rows(
+    dataset: str,
+    variant: str,
+    store_dir: PathLike,
+    source_path: PathLike,
+    prepare: Callable[[pd.DataFrame, Dict[str, Any]], pd.DataFrame],
+    date_column: Optional[str] = None,
+    notify: bool = True,
+) -> Optional[Delta]:
+    """
+    Append the rows added to ``source_path`` since the store's watermark.
+
+    Args:
+        dataset: Dataset name listeners subscribe to (e.g. ``"supply_chain"``).
+        variant: Store variant (``"normalized"``, ``"normalized-compact"``, ...).
+        store_dir: Store built from ``source_path`` with a ``watermark`` in its manifest.
+        source_path: CSV that grew since the store was built.
+        prepare: ``prepare(raw_rows, manifest)`` runs the dataset pipeline on the new rows.
+        date_column: Column whose maximum is tracked in the watermark.
+        notify: Emit the delta to the registered listeners.
+
+    Returns:
+        The delta (possibly empty) or ``None`` when the store has no usable watermark
+        and must be rebuilt from scratch.
+    """
+    manifest = read_manifest(store_dir)
+    if manifest is None or not manifest.get("watermark"):
+        return None
+    watermark = manifest["watermark"]
+
+    result = read_appended_rows(source_path, watermark, encoding=manifest.get("encoding"))
+    if result is None:
+        logger.info("Source %s no longer extends the store watermark; full rebuild required", source_path)
+        return None
+    raw, offset = result
+    start_row = int(manifest.get("rows", 0))
+    source_rows = int(watermark.get("rows", start_row))
+    if raw.empty:
+        return Delta(dataset, variant, raw, start_row, watermark, store_token(store_dir))
+
+    rows = prepare(raw, manifest).reset_index(drop=True)
+    max_date = pd.NaT
+    if date_column and date_column in rows.columns:
+        max_date = rows[date_column].max()
+    if watermark.get("max_date"):
+        previous = pd.Timestamp(watermark["max_date"])
+        max_date = previous if pd.isna(max_date) else max(previous, max_date)
+
+    new_watermark = csv_watermark(source_path, rows=source_rows + len(raw), max_date=max_date, offset=offset)
+    try:
+        append_part(rows, store_dir, source_path, extra={"watermark": new_watermark})
+    except ValueError as exc:
+        # New rows do not fit the pinned schema (e.g. an id outgrew its int width).
+        logger.info("Cannot append to %s (%s); full rebuild required", store_dir, exc)
+        return None
+    delta = Delta(dataset, variant, rows, start_row, new_watermark, store_token(store_dir))
+    logger.info("Ingested %d new rows into %s (%s)", len(rows), dataset, Path(store_dir).name)
+    if notify:
+        emit_delta(delta)
+    return delta
+
+
+def store_build(store_dir: PathLike) -> Optional[str]:
+    """Identity of the store's last full build; appends keep it, a rebuild changes it."""
+    manifest = read_manifest(store_dir)
+    return None if manifest is None else manifest.get("created_at")
+
+
+def catch_up_delta(
+    dataset: str,
+    variant: str,
+    store_dir: PathLike,
+    source_path: PathLike,
+    loaded_rows: int,
+    build: Optional[str],
+    expected: Optional[Dict[str, Any]] = None,
+) -> Optional[Delta]:
+    """
+    Rows appended to the store (possibly by another process) since a frame was loaded.
+
+    Args:
+        loaded_rows: Rows of the cached frame, loaded from the store build ``build``.
+        build: ``store_build(store_dir)`` recorded when the frame was loaded.
+        expected: Manifest entries the store must match (see ``is_store_fresh``).
+
+    Returns:
+        The delta of the parts past the first ``loaded_rows`` rows (empty when nothing
+        was appended), or ``None`` when the frame cannot be caught up: the store was
+        rebuilt, no longer covers the source, or its parts do not line up with
+        ``loaded_rows``. The caller then reloads from scratch.
+    """
+    if build is None or not is_store_fresh(store_dir, source_path, expected):
+        return None
+    manifest = read_manifest(store_dir)
+    if manifest is None or manifest.get("created_at") != build:
+        return None
+
+    parts = manifest["parts"]
+    seen, first_new = 0, 0
+    while seen < loaded_rows and first_new < len(parts):
+        seen += part_rows(store_dir, parts[first_new])
+        first_new += 1
+    if seen != loaded_rows:
+        return None
+
+    rows = read_store(store_dir, parts=parts[first_new:])
+    delta = Delta(dataset, variant, rows, loaded_rows, manifest.get("watermark", {}), store_token(store_dir))
+    if not delta.empty:
+        logger.info("Caught up %d rows appended to %s (%s)", len(rows), dataset, Path(store_dir).name)
+    return delta
+
+
+__all__ = [
+    "Delta",
+    "register_delta_listener",
+    "unregister_delta_listener",
+    "emit_delta",
+    "apply_delta",
+    "csv_watermark",
+    "read_appended_rows",
+    "ingest_appended_rows",
+    "store_build",
+    "catch_up_delta",
+]
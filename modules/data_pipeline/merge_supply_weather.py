@@ -7,6 +7,8 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+from modules.data_pipeline.global_dataset_loader import write_partitioned_dataset
+
 BASE_DIR = Path(__file__).resolve().parents[2]
 SUPPLY_PATH = BASE_DIR / "data" / "DataCoSupplyChainDataset.csv"
 WEATHER_PATH = BASE_DIR / "data" / "geocoded_weather.csv"
@@ -203,6 +205,8 @@ def merge_supply_weather() -> None:
     if "weather_matched" not in merged_df.columns:
         merged_df["weather_matched"] = False
     merged_df.to_csv(MERGED_OUTPUT, index=False, encoding="utf-8")
+    # Region/month partitions let regional consumers read only their slice.
+    partitioned_dir = write_partitioned_dataset(merged_df, str(MERGED_OUTPUT))
 
     if missing_records:
         pd.DataFrame(missing_records).to_csv(MISSING_LOG, index=False, encoding="utf-8")
@@ -223,6 +227,7 @@ def merge_supply_weather() -> None:
     )
     stats.to_csv(STATS_OUTPUT, index=False, encoding="utf-8")
     logger.info("Merged dataset written to %s", MERGED_OUTPUT)
+    logger.info("Partitioned dataset written to %s", partitioned_dir)
     logger.info("Missing log written to %s", MISSING_LOG)
     logger.info("Stats written to %s", STATS_OUTPUT)
 
@@ -0,0 +1,184 @@
+"""
+Read-only dataset segments shared by every worker process on a host.
+
+A segment is an uncompressed Arrow IPC file that is built once (by the first worker
+that needs it or by ``scripts/preload_shared_datasets.py``) and then memory-mapped
+by every process. Columns are handed to pandas without copying wherever Arrow allows
+it: numeric columns without nulls and the codes of categorical columns become NumPy
+views over the mapping, so the page cache holds one copy of that data no matter how
+many uvicorn workers attach to it.
+
+Attached frames have the same dtypes as the frame that was published (the pandas
+metadata stored in the segment is applied), so callers see identical frames with the
+flag on or off. The price is that plain object string columns are materialized per
+process; the compact loaders store low-cardinality text as categoricals, which stay
+shared.
+
+Enable with ``DATASTORM_SHARED_DATASET=1``; ``DATASTORM_SHARED_DIR`` moves the
+segments (e.g. to ``/dev/shm``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_SHARED_DIR = BASE_DIR / "data" / ".shared"
+ENABLE_ENV = "DATASTORM_SHARED_DATASET"
+DIR_ENV = "DATASTORM_SHARED_DIR"
+LOCK_TIMEOUT_SECONDS = 600
+STALE_LOCK_SECONDS = 1800
+
+logger = logging.getLogger("shared_dataset")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# Per-process view of the attached segments: name -> (token, frame)
+_attached: Dict[str, Tuple[str, pd.DataFrame]] = {}
+_attach_lock = threading.Lock()
+
+
+def shared_mode_enabled() -> bool:
+    return os.environ.get(ENABLE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def shared_dir() -> Path:
+    return Path(os.environ.get(DIR_ENV) or DEFAULT_SHARED_DIR)
+
+
+def _segment_path(name: str, token: str) -> Path:
+    return shared_dir() / f"{name}-{token[:16]}.arrow"
+
+
+def _meta_path(name: str) -> Path:
+    return shared_dir() / f"{name}.json"
+
+
+@contextmanager
+def _build_lock(name: str) -> Iterator[None]:
+    """Cross-process exclusive lock (lock file created with O_EXCL; works on POSIX and Windows)."""
+    lock_path = shared_dir() / f"{name}.lock"
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > STALE_LOCK_SECONDS:
+                    lock_path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for shared dataset lock {lock_path}")
+            time.sleep(0.2)
+    try:
+        yield
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+
+def _to_shareable_table(df: pd.DataFrame) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # pandas' Arrow-backed strings use large_string; storing that type avoids a cast on attach.
+    fields = []
+    for field in table.schema:
+        if pa.types.is_string(field.type):
+            field = field.with_type(pa.large_string())
+        fields.append(field)
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def publish(name: str, df: pd.DataFrame, token: str) -> Path:
+    """Write ``df`` as the segment ``name`` for version ``token`` (atomic rename)."""
+    directory = shared_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    target = _segment_path(name, token)
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    table = _to_shareable_table(df)
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, target)
+
+    meta = {"name": name, "token": token, "file": target.name, "rows": table.num_rows, "bytes": target.stat().st_size}
+    meta_tmp = _meta_path(name).with_suffix(f".{os.getpid()}.tmp")
+    meta_tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(meta_tmp, _meta_path(name))
+
+    for old in directory.glob(f"{name}-*.arrow"):
+        if old != target:
+            try:
+                old.unlink()
+            except OSError:
+                # Still mapped by a worker on a platform that forbids unlinking mapped files.
+                pass
+    logger.info("Shared dataset %s published: %s (%d rows)", name, target, table.num_rows)
+    return target
+
+
+def _attach_file(path: Path) -> pd.DataFrame:
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def attach(name: str, token: str) -> Optional[pd.DataFrame]:
+    """Return the memory-mapped frame for ``name``/``token`` or None when it was not published."""
+    with _attach_lock:
+        current = _attached.get(name)
+        if current is not None and current[0] == token:
+            return current[1]
+        path = _segment_path(name, token)
+        if not path.exists():
+            return None
+        df = _attach_file(path)
+        _attached[name] = (token, df)
+        return df
+
+
+def get_or_build(name: str, token: str, builder: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Attach to segment ``name`` at version ``token``; the first process to miss builds it.
+
+    Every caller gets the memory-mapped frame, including the builder, so the process
+    that built the data does not keep a second private copy.
+    """
+    df = attach(name, token)
+    if df is not None:
+        return df
+    shared_dir().mkdir(parents=True, exist_ok=True)
+    with _build_lock(name):
+        df = attach(name, token)
+        if df is not None:
+            return df
+        publish(name, builder(), token)
+    return attach(name, token)
+
+
+def detach(name: Optional[str] = None) -> None:
+    """Drop this process' reference(s); the mapping is released once pandas lets go of it."""
+    with _attach_lock:
+        if name is None:
+            _attached.clear()
+        else:
+            _attached.pop(name, None)
+
+
+__all__ = ["shared_mode_enabled", "publish", "attach", "get_or_build", "detach"]
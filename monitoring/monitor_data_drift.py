@@ -1,7 +1,8 @@
+import argparse
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -24,19 +25,24 @@ def ks_pvalue(a: pd.Series, b: pd.Series) -> float:
     from scipy.stats import ks_2samp
     return ks_2samp(a, b).pvalue
 
-def load_baseline(path: Path, feature_cols: List[str]) -> pd.DataFrame:
-    baseline_path = path.with_name(path.stem + "_baseline.csv")
+def _region_filters(region: Optional[str]):
+    return [("Region", "==", region.upper())] if region else None
+
+def load_baseline(path: Path, feature_cols: List[str], region: Optional[str] = None) -> pd.DataFrame:
+    suffix = f"_baseline_{region.upper()}.csv" if region else "_baseline.csv"
+    baseline_path = path.with_name(path.stem + suffix)
     if baseline_path.exists():
         return pd.read_csv(baseline_path)[feature_cols]
-    df = load_global_dataset(str(path))
+    df = load_global_dataset(str(path), filters=_region_filters(region))
     baseline = df[feature_cols].sample(min(5000, len(df)), random_state=42)
     baseline.to_csv(baseline_path, index=False)
     return baseline
 
-def monitor():
-    df = load_global_dataset(str(MERGED_PATH))
+def monitor(region: Optional[str] = None):
+    """Check drift over the whole dataset, or over one region's partitions only."""
+    df = load_global_dataset(str(MERGED_PATH), filters=_region_filters(region))
     feature_cols = [col for col in df.columns if df[col].dtype != "object"]
-    baseline = load_baseline(MERGED_PATH, feature_cols)
+    baseline = load_baseline(MERGED_PATH, feature_cols, region)
     alerts: Dict[str, float] = {}
     for col in feature_cols:
         pvalue = ks_pvalue(df[col], baseline[col])
@@ -44,12 +50,18 @@ def monitor():
         if drift > THRESHOLD:
             alerts[col] = drift
     report = {"total_features": len(feature_cols), "drift_alerts": alerts, "threshold": THRESHOLD}
-    DRIFT_REPORT.parent.mkdir(parents=True, exist_ok=True)
-    DRIFT_REPORT.write_text(json.dumps(report, indent=2))
+    report_path = DRIFT_REPORT
+    if region:
+        report["region"] = region.upper()
+        report_path = DRIFT_REPORT.with_name(f"{DRIFT_REPORT.stem}_{region.upper()}.json")
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2))
     if alerts:
         logger.warning("Data drift detected: %s", alerts)
     else:
         logger.info("No significant data drift.")
 
 if __name__ == "__main__":
-    monitor()
+    parser = argparse.ArgumentParser(description="Data drift monitor for the merged global dataset.")
+    parser.add_argument("--region", type=str, default=None, help="Only check one region (e.g. EU).")
+    monitor(parser.parse_args().region)
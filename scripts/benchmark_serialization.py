@@ -0,0 +1,145 @@
+"""
+Benchmark the dashboard response serialization: row-wise ``iterrows`` + full sort
+(previous implementation) against the column-wise serializer in
+``app.services.serialization``.
+
+Usage:
+    python scripts/benchmark_serialization.py --rows 1000000 --repeat 5
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.analytics import get_sample_orders, get_top_products
+from app.services.serialization import to_records
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger("benchmark_serialization")
+
+DATE_COL = 'order date (DateOrders)'
+SAMPLE_COLUMNS = ['Order Id', 'Order Country', 'Category Name', DATE_COL,
+                  'Delivery Status', 'Late_delivery_risk', 'Sales']
+
+
+def synthetic_orders(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Order Id': rng.integers(0, rows // 3 + 1, rows),
+        'Order Country': pd.Categorical.from_codes(rng.integers(0, 160, rows), [f"Country {i}" for i in range(160)]),
+        'Category Name': pd.Categorical.from_codes(rng.integers(0, 50, rows), [f"Category {i}" for i in range(50)]),
+        DATE_COL: pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365 * 1440, rows), unit='min'),
+        'Delivery Status': pd.Categorical.from_codes(rng.integers(0, 4, rows),
+                                                     ['Advance shipping', 'Late delivery', 'Shipping canceled',
+                                                      'Shipping on time']),
+        'Late_delivery_risk': rng.integers(0, 2, rows).astype(np.int8),
+        'Sales': rng.gamma(2.0, 100.0, rows),
+        'Benefit per order': rng.normal(20.0, 60.0, rows),
+        'Order Item Quantity': rng.integers(1, 6, rows),
+        'temperature_2m_mean': rng.normal(18.0, 8.0, rows),
+    })
+
+
+def legacy_sample_orders(df: pd.DataFrame, n: int = 50):
+    """Previous get_sample_orders: full sort by date, then iterrows with per-cell type checks."""
+    latest = df[DATE_COL].sort_values(ascending=False, na_position='last').index[:n]
+    sample_df = df.loc[latest, [c for c in SAMPLE_COLUMNS if c in df.columns]]
+    result = []
+    for _, row in sample_df.iterrows():
+        record = {}
+        for col in sample_df.columns:
+            value = row[col]
+            if pd.isna(value):
+                record[col] = None
+            elif isinstance(value, (pd.Timestamp, datetime)):
+                record[col] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif col == 'Sales':
+                record[col] = float(value)
+            elif col == 'Late_delivery_risk':
+                record[col] = int(value)
+            else:
+                record[col] = str(value)
+        result.append(record)
+    return result
+
+
+def legacy_top_products(df: pd.DataFrame, top_n: int = 10, by: str = 'Order Item Quantity'):
+    """Previous get_top_products row path (sort column that is not a cube measure)."""
+    top = df.groupby('Category Name', observed=True).agg(
+        {by: 'sum', 'Sales': 'sum', 'Benefit per order': 'sum'}
+    ).reset_index().sort_values(by=by, ascending=False).head(top_n)
+    return [
+        {'category': str(row['Category Name']), 'sales': float(row['Sales']),
+         'benefit': float(row['Benefit per order']), 'value': float(row[by])}
+        for _, row in top.iterrows()
+    ]
+
+
+def legacy_scatter(df: pd.DataFrame):
+    """Previous /api/scatter-data: iterrows over every row, then keep 1000 points."""
+    data = df[['temperature_2m_mean', 'Late_delivery_risk']].dropna()
+    points = [{'x': float(row['temperature_2m_mean']), 'y': float(row['Late_delivery_risk'])}
+              for _, row in data.iterrows()]
+    return points[:1000]
+
+
+def vectorized_scatter(df: pd.DataFrame):
+    data = df[['temperature_2m_mean', 'Late_delivery_risk']].dropna().head(1000)
+    return to_records(data, default='float', rename={'temperature_2m_mean': 'x', 'Late_delivery_risk': 'y'})
+
+
+def identity(records):
+    return records
+
+
+def order_dates(records):
+    # The old full sort was not stable, so rows sharing a timestamp may come back in another order
+    return [record[DATE_COL] for record in records]
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark iterrows vs column-wise response serialization.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_orders(args.rows)
+    logger.info("Synthetic frame: %d rows, %.1f MB", len(df), df.memory_usage(deep=True).sum() / 1e6)
+
+    top_products = getattr(get_top_products, '__wrapped__', get_top_products)
+    cases = [
+        ("sample_orders (n=50)", lambda: legacy_sample_orders(df), lambda: get_sample_orders(df, 50), order_dates),
+        ("top_products (row path)", lambda: legacy_top_products(df),
+         lambda: top_products(df, 10, 'Order Item Quantity'), identity),
+        ("scatter (1000 points)", lambda: legacy_scatter(df), lambda: vectorized_scatter(df), identity),
+    ]
+    print(f"{'response':<26}{'iterrows (ms)':>15}{'vectorized (ms)':>18}{'saved (ms)':>13}{'speedup':>10}")
+    for name, legacy, vectorized, key in cases:
+        if key(legacy()) != key(vectorized()):
+            logger.warning("%s: outputs differ", name)
+        before = best_of(legacy, args.repeat) * 1000
+        after = best_of(vectorized, args.repeat) * 1000
+        print(f"{name:<26}{before:>15.1f}{after:>18.1f}{before - after:>13.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,14 @@ import os
 # Thêm thư mục app vào path
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
 
-from app.services.data_loader import load_supply_chain_data, load_weather_data, suggest_join_keys
-from app.services.data_profiler import check_data_quality, detect_outliers
+from app.services.data_loader import (
+    SUPPLY_CHAIN_FILE,
+    WEATHER_FILE,
+    load_supply_chain_data,
+    load_weather_data,
+    suggest_join_keys,
+)
+from app.services.data_profiler import profile_dataset
 from app.services.analytics import calculate_descriptive_stats, calculate_supply_chain_kpis
 import pandas as pd
 
@@ -18,28 +24,30 @@ import pandas as pd
 def generate_markdown_report():
     """Tạo báo cáo chất lượng dữ liệu dưới dạng Markdown."""
     
-    print("Đang đọc dữ liệu...")
+    print("Đang phân tích chất lượng dữ liệu (một lượt đọc theo chunk)...")
     try:
-        supply_df = load_supply_chain_data()
-        weather_df = load_weather_data()
+        supply_profile = profile_dataset(SUPPLY_CHAIN_FILE, "Supply Chain Dataset", encoding='latin-1')
+        weather_profile = profile_dataset(WEATHER_FILE, "Weather Dataset", encoding='utf-8')
     except Exception as e:
         print(f"Lỗi khi đọc dữ liệu: {e}")
         return
     
-    print("Đang phân tích chất lượng dữ liệu...")
-    
     # Phân tích chất lượng
-    supply_quality = check_data_quality(supply_df, "Supply Chain Dataset")
-    weather_quality = check_data_quality(weather_df, "Weather Dataset")
+    supply_quality = supply_profile.quality_report()
+    weather_quality = weather_profile.quality_report()
     
-    # Phân tích outliers cho một số cột quan trọng
+    # Phân tích outliers cho một số cột quan trọng (từ sketch, không đọc lại dữ liệu)
     supply_outliers = {}
     important_numeric_cols = ['Sales', 'Benefit per order', 'Days for shipping (real)']
     for col in important_numeric_cols:
-        if col in supply_df.columns:
-            supply_outliers[col] = detect_outliers(supply_df, col)
-    
-    # Phân tích join keys
+        if col in supply_profile.columns:
+            supply_outliers[col] = supply_profile.outliers(col)
+    
+    # Phân tích join keys: chỉ đọc các cột khoá
+    supply_df = load_supply_chain_data(columns=[
+        'order date (DateOrders)', 'Order Country', 'Order City', 'Order Customer Id'
+    ])
+    weather_df = load_weather_data(columns=['order_date', 'country', 'city', 'customer_id'])
     join_suggestions = suggest_join_keys(supply_df, weather_df)
     
     # Tạo nội dung Markdown
@@ -55,13 +63,13 @@ def generate_markdown_report():
 
 - **Tổng số bản ghi:** {supply_quality['total_rows']:,}
 - **Tổng số cột:** {supply_quality['total_columns']}
-- **Số dòng trùng lặp:** {supply_quality['duplicate_rows']:,}
+- **Số dòng trùng lặp:** {supply_quality['duplicate_rows']:,}{'' if supply_quality['duplicate_rows_exact'] else ' (ước lượng)'}
 
 ### 1.2. Weather Dataset
 
 - **Tổng số bản ghi:** {weather_quality['total_rows']:,}
 - **Tổng số cột:** {weather_quality['total_columns']}
-- **Số dòng trùng lặp:** {weather_quality['duplicate_rows']:,}
+- **Số dòng trùng lặp:** {weather_quality['duplicate_rows']:,}{'' if weather_quality['duplicate_rows_exact'] else ' (ước lượng)'}
 
 ---
 
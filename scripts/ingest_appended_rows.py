@@ -0,0 +1,53 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.data_loader import SUPPLY_CHAIN_FILE, ingest_supply_chain_appends
+from modules.data_pipeline.columnar_store import read_manifest, store_dir_for
+from modules.data_pipeline.global_dataset_loader import DEFAULT_DATASET_PATH, ingest_global_appends
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger("ingest_appended_rows")
+
+SUPPLY_VARIANTS = {
+    "normalized": (True, False),
+    "raw": (False, False),
+    "normalized-compact": (True, True),
+    "raw-compact": (False, True),
+}
+
+
+def _report(name: str, delta) -> None:
+    if delta is None:
+        logger.info("%s: store rebuilt from scratch", name)
+    else:
+        logger.info("%s: %d new rows (watermark %s)", name, len(delta.rows), delta.watermark)
+
+
+def ingest(include_global: bool) -> None:
+    # Only variants that were materialized before are kept up to date.
+    for variant, (normalize, compact) in SUPPLY_VARIANTS.items():
+        if read_manifest(store_dir_for(SUPPLY_CHAIN_FILE, variant)) is None:
+            continue
+        _report(f"supply_chain[{variant}]", ingest_supply_chain_appends(normalize=normalize, compact=compact))
+
+    if include_global and Path(DEFAULT_DATASET_PATH).exists():
+        _report("global_merged", ingest_global_appends(str(DEFAULT_DATASET_PATH)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Nightly refresh: ingest only the rows appended to the source CSVs since the last run."
+    )
+    parser.add_argument("--skip-global", action="store_true", help="Do not ingest the merged global dataset.")
+    args = parser.parse_args()
+    ingest(include_global=not args.skip_global)
+
+
+if __name__ == "__main__":
+    main()
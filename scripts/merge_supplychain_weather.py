@@ -19,7 +19,7 @@ warnings.filterwarnings('ignore')
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
 
 from app.services.data_loader import load_supply_chain_data, load_weather_data
-from app.services.data_normalizer import normalize_country, normalize_date, COUNTRY_MAPPING
+from app.services.data_normalizer import normalize_country_series, normalize_date, COUNTRY_MAPPING
 
 # Đường dẫn
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -46,7 +46,7 @@ def normalize_location_columns(df: pd.DataFrame) -> pd.DataFrame:
     country_cols = [col for col in df.columns if 'country' in col.lower()]
     for col in country_cols:
         if col in df.columns:
-            df[col] = df[col].apply(normalize_country)
+            df[col] = normalize_country_series(df[col])
             df[f'{col}_norm'] = df[col].str.strip().str.lower()
     
     # Chuẩn hóa city
@@ -0,0 +1,50 @@
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules.data_pipeline import shared_dataset
+from modules.data_pipeline.columnar_store import source_token
+from modules.data_pipeline.global_dataset_loader import DEFAULT_DATASET_PATH, load_global_dataset
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger("preload_shared_datasets")
+
+
+def preload(include_global: bool) -> None:
+    # The loaders publish the segment themselves when shared mode is on.
+    os.environ[shared_dataset.ENABLE_ENV] = "1"
+    from app.services.data_loader import load_supply_chain_data, load_weather_data
+
+    # The dashboard reads the compact variant (categorical strings, downcast numerics)
+    supply = load_supply_chain_data(compact=True)
+    logger.info("supply_chain_normalized-compact: %d rows", len(supply))
+    weather = load_weather_data()
+    logger.info("weather: %d rows", len(weather))
+
+    if include_global and Path(DEFAULT_DATASET_PATH).exists():
+        merged = shared_dataset.get_or_build(
+            "global_merged",
+            source_token(DEFAULT_DATASET_PATH),
+            lambda: load_global_dataset(str(DEFAULT_DATASET_PATH)),
+        )
+        logger.info("global_merged: %d rows", len(merged))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mapped datasets shared by all uvicorn workers (run before starting them)."
+    )
+    parser.add_argument("--skip-global", action="store_true", help="Do not build the merged global dataset segment.")
+    args = parser.parse_args()
+    preload(include_global=not args.skip_global)
+    logger.info("Shared datasets ready in %s", shared_dataset.shared_dir())
+
+
+if __name__ == "__main__":
+    main()
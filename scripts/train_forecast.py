@@ -142,19 +142,27 @@ def parse_args():
     parser.add_argument("--data", type=str, default=str(DEFAULT_DATASET_PATH), help="Path to merged global dataset.")
     parser.add_argument("--global_mode", action="store_true", help="Enable global mode (default True).")
     parser.add_argument("--max_rows", type=int, default=None, help="Optional cap on number of rows.")
+    parser.add_argument(
+        "--region",
+        type=str,
+        default=None,
+        help="Train on one region only (e.g. EU); only that region's partitions are read.",
+    )
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
-    df = load_global_dataset(args.data)
+    filters = [("Region", "==", args.region.upper())] if args.region else None
+    df = load_global_dataset(args.data, filters=filters)
     if args.max_rows:
         df = df.head(args.max_rows)
     df["GLOBAL"] = "GLOBAL"
 
-    model_dir = Path("models") / "forecast" / "global"
-    metrics_path = Path("results") / "metrics" / "forecast_global.json"
-    log_file = Path("results") / "logs" / "forecast_global.log"
+    scope = f"region_{args.region.upper()}" if args.region else "global"
+    model_dir = Path("models") / "forecast" / scope
+    metrics_path = Path("results") / "metrics" / f"forecast_{scope}.json"
+    log_file = Path("results") / "logs" / f"forecast_{scope}.log"
     model_dir.mkdir(parents=True, exist_ok=True)
     metrics_path.parent.mkdir(parents=True, exist_ok=True)
     log_file.parent.mkdir(parents=True, exist_ok=True)
@@ -162,7 +170,8 @@ def main():
     metrics = []
     metrics.append(train_forecast_scope(df, ["Country"], "country", model_dir))
     metrics.append(train_forecast_scope(df, ["Region"], "region", model_dir))
-    metrics.append(train_forecast_scope(df, ["GLOBAL"], "global", model_dir))
+    if not args.region:
+        metrics.append(train_forecast_scope(df, ["GLOBAL"], "global", model_dir))
 
     metrics = [m for m in metrics if m]
     metrics_path.write_text(json.dumps(metrics, indent=2))
@@ -182,7 +191,7 @@ def main():
                 issue=f"Scope MAE up to {max_mae:.2f}",
                 suggestion="Review per-region residuals and retrain if necessary",
                 severity="medium",
-                region="GLOBAL",
+                region=args.region.upper() if args.region else "GLOBAL",
                 model_version="v7.5",
                 dataset_version=dataset_version,
             )
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.aggregate_cube import AggregateCube
+from app.services.sketches import KMinValues, log_bucket_index, log_bucket_value
+
+
+def _frame(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Order Country': rng.choice(['France', 'Mexico', 'Brasil'], n),
+        'Category Name': rng.choice(['Cleats', 'Fishing', 'Golf'], n),
+        'Delivery Status': rng.choice(['Late delivery', 'Shipping on time'], n),
+        'Shipping Mode': rng.choice(['Standard Class', 'First Class'], n),
+        'order date (DateOrders)': pd.Timestamp('2017-01-01')
+        + pd.to_timedelta(rng.integers(0, 400 * 24 * 60, n), unit='min'),
+        'Order Id': rng.integers(0, 1500, n),
+        'Customer Id': rng.integers(0, 600, n),
+        'Sales': rng.choice([9.99, 49.5, 120.0, 399.98], n),
+        'Late_delivery_risk': rng.integers(0, 2, n),
+        'Days for shipping (real)': rng.integers(0, 7, n).astype(float),
+        'Days for shipment (scheduled)': rng.integers(0, 5, n).astype(float),
+    })
+
+
+def test_cube_answers_match_row_computations():
+    df = _frame()
+    cube = AggregateCube.from_frame(df)
+    kpis = cube.kpis()
+
+    assert kpis['total_sales'] == pytest.approx(df['Sales'].sum())
+    assert kpis['total_orders'] == df['Order Id'].nunique()
+    assert kpis['late_delivery_count'] == df['Late_delivery_risk'].sum()
+    assert kpis['delivery_status_distribution'] == df['Delivery Status'].value_counts().to_dict()
+
+    by_country = df.groupby('Order Country')['Order Id'].nunique()
+    assert {c['country']: c['orders'] for c in cube.top_countries(by='orders')} == by_country.to_dict()
+
+    dates = df['order date (DateOrders)']
+    monthly_orders = df.set_index(dates)['Order Id'].resample('MS').nunique()
+    assert cube.time_series('MS')['orders_count'] == {str(k): int(v) for k, v in monthly_orders.items()}
+
+    sorted_sales = df['Sales'].sort_values(ascending=False)
+    p80 = (sorted_sales.cumsum() <= sorted_sales.sum() * 0.8).sum()
+    assert cube.advanced_metrics()['revenue_concentration_p80'] == pytest.approx(p80 / len(df) * 100)
+    assert cube.time_series('h') is None  # finer than the daily grain
+
+
+def test_merged_cube_equals_cube_of_concatenated_rows():
+    df = _frame()
+    head, tail = df.iloc[:2500], df.iloc[2500:]
+    merged = AggregateCube.from_frame(head).merge(AggregateCube.from_frame(tail))
+    full = AggregateCube.from_frame(df)
+
+    assert len(merged.cells) == len(full.cells)
+    merged_kpis, full_kpis = merged.kpis(), full.kpis()
+    assert merged_kpis.pop('delivery_status_distribution') == full_kpis.pop('delivery_status_distribution')
+    assert merged_kpis == pytest.approx(full_kpis)
+    assert merged.advanced_metrics() == pytest.approx(full.advanced_metrics())
+    assert merged.top_countries(by='orders') == full.top_countries(by='orders')
+
+
+def test_kmv_sketch_estimates_beyond_k():
+    ids = np.arange(50_000)
+    sketch = KMinValues(k=1024).update(ids)
+    assert sketch.estimate() == pytest.approx(50_000, rel=0.1)
+    assert KMinValues(k=1024).update(ids[:500]).estimate() == 500
+
+
+def test_exact_distinct_counts_beyond_sketch_size():
+    rng = np.random.default_rng(7)
+    df = _frame(n=90_000, seed=7).assign(**{
+        'Order Id': rng.integers(0, 70_000, 90_000),
+        'Customer Id': rng.integers(0, 30_000, 90_000),
+    })
+    cube = AggregateCube.from_frame(df.iloc[:40_000]).merge(AggregateCube.from_frame(df.iloc[40_000:]))
+
+    kpis = cube.kpis()
+    assert kpis['total_orders'] == df['Order Id'].nunique() > 16384
+    assert cube.distinct_total('customers') == df['Customer Id'].nunique() > 16384
+    assert cube.advanced_metrics()['unique_customers'] == df['Customer Id'].nunique()
+    by_country = df.groupby('Order Country')['Order Id'].nunique().to_dict()
+    assert {c['country']: c['orders'] for c in cube.top_countries(by='orders')} == by_country
+    monthly = df.set_index('order date (DateOrders)')['Order Id'].resample('MS').nunique()
+    assert cube.time_series('MS')['orders_count'] == {str(k): int(v) for k, v in monthly.items()}
+
+
+def test_log_buckets_bound_relative_error():
+    values = np.random.default_rng(1).lognormal(3.0, 2.0, 5000)
+    restored = log_bucket_value(log_bucket_index(values, 0.01), 0.01)
+    assert np.max(np.abs(restored - values) / values) <= 0.01 + 1e-12
+
+
+def test_approximate_answers_stay_within_error_bounds():
+    df = _frame(n=20000, seed=3).assign(**{
+        'Order Id': lambda d: np.random.default_rng(4).integers(0, 12000, len(d)),
+        'Sales': lambda d: np.random.default_rng(5).gamma(2.0, 100.0, len(d)),
+    })
+    head, tail = df.iloc[:9000], df.iloc[9000:]
+    cube = AggregateCube.from_frame(head).merge(AggregateCube.from_frame(tail))
+
+    exact, approx = cube.kpis(), cube.kpis(approximate=True)
+    truth = df['Order Id'].nunique()
+    assert exact['total_orders'] == truth
+    assert abs(approx['total_orders'] - truth) <= approx['error_bounds']['total_orders'] * truth
+    customers = df['Customer Id'].nunique()
+    assert abs(cube.distinct_total('customers', approximate=True) - customers) <= cube.error_bound('customers') * customers
+    assert approx['total_sales'] == pytest.approx(exact['total_sales'])
+    assert 'error_bounds' not in exact
+
+    p80_exact = cube.advanced_metrics()['revenue_concentration_p80']
+    p80_approx = cube.advanced_metrics(approximate=True)['revenue_concentration_p80']
+    assert p80_approx == pytest.approx(p80_exact, abs=1.0)
+
+    countries = {c['country']: c['orders'] for c in cube.top_countries(by='orders', approximate=True)}
+    for country, truth in df.groupby('Order Country')['Order Id'].nunique().items():
+        assert countries[country] == pytest.approx(truth, rel=0.1)
+
+
+def test_daily_rollup_serves_coarser_series_and_merges_incrementally():
+    df = _frame()
+    df.loc[::13, 'order date (DateOrders)'] = pd.NaT
+    full = AggregateCube.from_frame(df)
+    merged = AggregateCube.from_frame(df.iloc[:1000]).merge(AggregateCube.from_frame(df.iloc[1000:]))
+
+    np.testing.assert_array_equal(merged.daily.days, full.daily.days)
+    for column, values in full.daily.totals.items():
+        np.testing.assert_allclose(merged.daily.totals[column], values)
+
+    dated = df.dropna(subset=['order date (DateOrders)']).set_index('order date (DateOrders)')
+    for freq in ('W', 'QS'):
+        series = merged.time_series(freq)
+        expected_orders = dated['Order Id'].resample(freq).nunique()
+        expected_late = dated['Late_delivery_risk'].resample(freq).mean().fillna(0) * 100
+        assert series['orders_count'] == {str(k): int(v) for k, v in expected_orders.items()}
+        assert list(series['late_delivery_rate'].values()) == pytest.approx(expected_late.tolist())
+        assert list(series['sales'].values()) == pytest.approx(dated['Sales'].resample(freq).sum().tolist())
@@ -0,0 +1,297 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.cache_manager import TTLCache, estimate_size
+
+
+def test_estimate_size_counts_dataframe_and_dict_contents():
+    df = pd.DataFrame({'a': np.arange(10_000, dtype='int64'), 'b': ['x' * 20] * 10_000})
+    assert estimate_size(df) == df.memory_usage(deep=True).sum()
+    assert estimate_size({'df': df}) > estimate_size(df)
+
+
+def test_lru_eviction_respects_byte_budget():
+    block = np.zeros(1000, dtype='uint8')
+    cache = TTLCache(max_bytes=2500)
+    cache.set('a', block)
+    cache.set('b', block)
+    assert cache.get('a') is not None  # 'b' becomes least recently used
+    cache.set('c', block)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.evictions == 1
+    assert cache.total_bytes <= 2500
+
+
+def test_sweep_removes_expired_keys_without_reads():
+    cache = TTLCache(default_ttl=1)
+    cache.set('short', 1, ttl=1)
+    cache.set('long', 2, ttl=60)
+    time.sleep(1.1)
+
+    assert cache.sweep() == 1
+    assert cache.keys() == ['long']
+    assert cache.stats()['expirations'] == 1
+
+
+def test_cache_key_distinguishes_frames_that_print_the_same():
+    from app.services.cache_manager import cache_key
+
+    a = pd.DataFrame({'Sales': np.arange(500, dtype='float64')})
+    b = a.copy()
+    b.loc[250, 'Sales'] = -1.0  # hidden by the truncated repr
+    assert str(a) == str(b)
+    assert cache_key(a) != cache_key(b)
+    assert cache_key(a) == cache_key(a.copy())
+
+
+def test_tagged_frame_uses_token_and_derived_frames_do_not_inherit_it():
+    from app.services.cache_manager import frame_fingerprint, tag_frame
+
+    df = tag_frame(pd.DataFrame({'x': np.arange(10)}), 'supply-v1')
+    assert frame_fingerprint(df) == 'token:supply-v1'
+    assert frame_fingerprint(df[df['x'] > 5]).startswith('sample:')
+
+
+def test_concurrent_misses_compute_once():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services.cache_manager import cached, clear_cache
+
+    calls = []
+    started = threading.Event()
+
+    @cached(ttl=60)
+    def slow_kpi(region):
+        calls.append(region)
+        started.set()
+        time.sleep(0.2)
+        return {'region': region}
+
+    clear_cache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(slow_kpi, ['EU'] * 8))
+
+    assert calls == ['EU']
+    assert all(result == {'region': 'EU'} for result in results)
+
+
+def test_concurrent_async_misses_compute_once():
+    import asyncio
+
+    from app.services.cache_manager import cached, clear_cache
+
+    calls = []
+
+    @cached(ttl=60)
+    async def slow_summary(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return [name]
+
+    async def run():
+        return await asyncio.gather(*(slow_summary('kpi') for _ in range(10)))
+
+    clear_cache()
+    assert asyncio.run(run()) == [['kpi']] * 10
+    assert calls == ['kpi']
+
+
+def test_expired_entry_is_served_stale_while_refreshing():
+    import threading
+
+    from app.services.cache_manager import cached, clear_cache
+
+    calls = []
+    refreshed = threading.Event()
+
+    @cached(ttl=1, stale_ttl=30)
+    def kpi():
+        calls.append(time.time())
+        if len(calls) > 1:
+            time.sleep(0.2)
+            refreshed.set()
+        return len(calls)
+
+    clear_cache()
+    assert kpi() == 1
+    time.sleep(1.1)
+
+    started = time.time()
+    assert kpi() == 1  # stale value, no wait for the recompute
+    assert time.time() - started < 0.1
+    assert refreshed.wait(2)
+    time.sleep(0.05)
+    assert kpi() == 2
+    assert len(calls) == 2
+
+
+def test_refresh_ahead_recomputes_before_expiry():
+    from app.services.cache_manager import TTLCache
+
+    cache = TTLCache()
+    cache.set('k', 'v', ttl=10, stale_ttl=5)
+    assert cache.lookup('k') == ('fresh', 'v')
+    assert cache.lookup('k', refresh_ahead=20) == ('refresh', 'v')
+    assert cache.lookup('missing') == ('miss', None)
+
+
+def test_disk_tier_survives_a_new_memory_cache(tmp_path):
+    from app.services.cache_manager import frame_fingerprint, tag_frame
+    from app.services.disk_cache import DiskCache
+
+    df = tag_frame(pd.DataFrame({'Sales': [1.0, 2.0]}), 'supply-v1')
+    first = TTLCache(disk=DiskCache(tmp_path))
+    first.set('load_supply_chain_data:abc', df, ttl=60)
+    first.set('kpis:abc', {'total_sales': 3.0}, ttl=60, stale_ttl=60)
+
+    # A fresh process: empty memory tier, same directory
+    second = TTLCache(disk=DiskCache(tmp_path))
+    restored = second.get('load_supply_chain_data:abc')
+    pd.testing.assert_frame_equal(restored, df)
+    assert frame_fingerprint(restored) == 'token:supply-v1'
+    assert second.lookup('kpis:abc') == ('fresh', {'total_sales': 3.0})
+
+
+def test_disk_tier_drops_corrupted_blobs(tmp_path):
+    from app.services.disk_cache import DiskCache
+
+    disk = DiskCache(tmp_path)
+    disk.set('k', {'a': 1}, expires_at=time.time() + 60, stale_until=time.time() + 60)
+    blob = next(tmp_path.glob('*.pkl'))
+    blob.write_bytes(blob.read_bytes()[:-1] + b'x')
+
+    assert disk.lookup('k')[0] == 'miss'
+    assert disk.checksum_failures == 1
+    assert disk.keys() == []
+
+
+
+def test_disk_tier_read_errors_count_as_misses(tmp_path, monkeypatch):
+    import sqlite3
+
+    from app.services.disk_cache import DiskCache
+
+    disk = DiskCache(tmp_path)
+    TTLCache(disk=disk).set('k', {'a': 1}, ttl=60)
+    cache = TTLCache(disk=disk)
+
+    def locked(key):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(disk, 'lookup', locked)
+    assert cache.lookup('k') == ('miss', None)
+    assert cache.stats()['disk_errors'] == 1
+    monkeypatch.undo()
+    assert disk.keys() == []  # the unreadable entry was dropped
+
+    # A truncated blob surfaces as a miss too, and the value is recomputed and stored again
+    TTLCache(disk=disk).set('k', {'a': 1}, ttl=60)
+    blob = next(tmp_path.glob('*.pkl'))
+    blob.write_bytes(blob.read_bytes()[:3])
+    assert cache.lookup('k') == ('miss', None)
+    cache.set('k', {'a': 2}, ttl=60)
+    assert TTLCache(disk=disk).lookup('k') == ('fresh', {'a': 2})
+
+def test_disk_tier_evicts_least_recently_used_over_budget(tmp_path):
+    from app.services.disk_cache import DiskCache
+
+    disk = DiskCache(tmp_path, max_bytes=2500)
+    expires = time.time() + 60
+    disk.set('a', b'x' * 1000, expires, expires)
+    disk.set('b', b'x' * 1000, expires, expires)
+    disk.lookup('a')
+    disk.set('c', b'x' * 1000, expires, expires)
+
+    assert sorted(disk.keys()) == ['a', 'c']
+    assert disk.evictions == 1
+
+
+def test_source_file_change_invalidates_entry_and_derived_results(tmp_path, monkeypatch):
+    import os
+
+    from app.services import cache_manager
+    from app.services.cache_manager import cached, clear_cache, record_file_dependency, tag_frame
+
+    monkeypatch.setattr(cache_manager, 'DEPENDENCY_CHECK_INTERVAL', 0)
+    source = tmp_path / 'orders.csv'
+    source.write_text('Sales\n1\n2\n')
+    loads, kpis = [], []
+
+    @cached(ttl=3600)
+    def load_orders(path):
+        dependencies = record_file_dependency(path)
+        loads.append(path)
+        return tag_frame(pd.read_csv(path), f'orders:{len(loads)}', dependencies)
+
+    @cached(ttl=3600)
+    def total_sales(df):
+        kpis.append(1)
+        return float(df['Sales'].sum())
+
+    clear_cache()
+    assert total_sales(load_orders(str(source))) == 3.0
+    assert total_sales(load_orders(str(source))) == 3.0
+    assert (len(loads), len(kpis)) == (1, 1)
+
+    source.write_text('Sales\n1\n2\n3\n')
+    os.utime(source, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert cache_manager._cache.sweep() == 0  # expiry is untouched, dependents are dropped
+    assert cache_manager.get_cache_stats()['size'] == 0
+
+    assert total_sales(load_orders(str(source))) == 6.0
+    assert (len(loads), len(kpis)) == (2, 2)
+
+
+def test_per_function_stats_and_prometheus_text():
+    from app.services import cache_manager
+    from app.services.cache_manager import cached, get_function_cache_stats, render_prometheus
+
+    @cached(ttl=60)
+    def stats_probe(x):
+        return np.zeros(100, dtype='uint8') + x
+
+    stats_probe(1)
+    stats_probe(1)
+    stats_probe(2)
+    cache_manager._cache.invalidate(next(k for k in cache_manager._cache.keys() if k.startswith('stats_probe:')))
+
+    stats = get_function_cache_stats()['stats_probe']
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+    assert stats['compute']['count'] == 2 and stats['compute']['buckets']['+Inf'] == 2
+    assert stats['entries'] == 1 and stats['bytes'] >= 100
+    assert stats['age']['buckets']['60'] == 1
+
+    text = render_prometheus()
+    assert 'datastorm_cache_hits_total{function="stats_probe"} 1' in text
+    assert 'datastorm_cache_compute_seconds_bucket{function="stats_probe",le="+Inf"} 2' in text
+    assert '# TYPE datastorm_cache_entry_age_seconds histogram' in text
+
+
+def test_sweeper_only_runs_between_app_startup_and_shutdown():
+    import os
+    import subprocess
+    import sys
+
+    from app.services.cache_manager import start_cache_sweeper, stop_cache_sweeper
+
+    # Importing the cache layer must not start background threads
+    code = ("import threading, app.services.cache_manager; "
+            "print(any(t.name == 'ttl-cache-sweeper' for t in threading.enumerate()))")
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=repo_root).stdout
+    assert output.strip().splitlines()[-1] == 'False'
+
+    def sweeper_alive():
+        import threading
+        return any(thread.name == 'ttl-cache-sweeper' for thread in threading.enumerate())
+
+    start_cache_sweeper()
+    assert sweeper_alive()
+    stop_cache_sweeper()
+    assert not sweeper_alive()
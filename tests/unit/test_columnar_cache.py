@@ -0,0 +1,149 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from app.services.cache_manager import clear_cache
+from app.services import data_loader
+from app.services.data_loader import load_supply_chain_data
+from modules.data_pipeline.columnar_store import is_store_fresh, read_manifest, store_dir_for
+
+
+def _write_supply_csv(path, rows=6):
+    df = pd.DataFrame({
+        'Order Id': list(range(1, rows + 1)),
+        'Order Country': ['EE. UU.', 'Francia', 'USA', 'UK', 'Francia', 'EE. UU.'][:rows],
+        'Category Name': ['Cleats', 'Fishing', 'Cleats', 'Golf', 'Fishing', 'Golf'][:rows],
+        'order date (DateOrders)': ['1/31/2018 22:56', '1/13/2018 12:27', '1/13/2018 12:06',
+                                    '2/5/2018 9:00', '3/1/2018 10:15', '3/2/2018 11:45'][:rows],
+        'Sales': [327.75, 299.98, -5.0, 50.0, 120.5, 80.0][:rows],
+        'Late_delivery_risk': [0, 1, 0, 1, 1, 0][:rows],
+    })
+    df.to_csv(path, index=False, encoding='latin-1')
+    return df
+
+
+def test_columnar_cache_is_built_and_reused(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+
+    first = load_supply_chain_data(str(csv_path))
+    store_dir = store_dir_for(csv_path, 'normalized')
+    manifest = read_manifest(store_dir)
+    assert manifest is not None
+    assert manifest['encoding'] == 'latin-1'
+    assert manifest['rows'] == len(first)
+    assert is_store_fresh(store_dir, csv_path)
+
+    clear_cache()
+    second = load_supply_chain_data(str(csv_path))
+    pd.testing.assert_frame_equal(first, second)
+    assert (second['Order Country'] == 'United States').sum() == 3
+
+
+def test_columnar_cache_rebuilds_when_source_changes(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path, rows=6)
+    load_supply_chain_data(str(csv_path))
+    store_dir = store_dir_for(csv_path, 'normalized')
+
+    # Same content, newer mtime: the hash check keeps the store valid
+    stat = os.stat(csv_path)
+    os.utime(csv_path, (stat.st_atime, stat.st_mtime + 10))
+    assert is_store_fresh(store_dir, csv_path)
+
+    time.sleep(0.01)
+    _write_supply_csv(csv_path, rows=4)
+    assert not is_store_fresh(store_dir, csv_path)
+
+    clear_cache()
+    reloaded = load_supply_chain_data(str(csv_path))
+    assert len(reloaded) == 4
+    assert read_manifest(store_dir)['rows'] == 4
+
+
+def test_columns_and_filters_are_pushed_down(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+    filters = [('Order Country', '==', 'United States'),
+               ('order date (DateOrders)', '>=', '2018-01-20')]
+
+    # Cold load (builds the store) and warm load (reads Parquet) must agree
+    cold = load_supply_chain_data(str(csv_path), columns=['Order Id', 'Sales'], filters=filters)
+    clear_cache()
+    warm = load_supply_chain_data(str(csv_path), columns=['Order Id', 'Sales'], filters=filters)
+    no_cache = load_supply_chain_data(str(csv_path), use_columnar_cache=False,
+                                      columns=['Order Id', 'Sales'], filters=filters)
+
+    for df in (cold, warm, no_cache):
+        assert list(df.columns) == ['Order Id', 'Sales']
+        assert df['Order Id'].tolist() == [1, 6]
+
+
+def test_compact_variant_round_trips_through_the_store(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+
+    built = load_supply_chain_data(str(csv_path), compact=True)
+    clear_cache()
+    cached = load_supply_chain_data(str(csv_path), compact=True)
+
+    assert isinstance(cached['Order Country'].dtype, pd.CategoricalDtype)
+    assert cached['Late_delivery_risk'].dtype == 'int8'
+    assert built.attrs['compaction_report']['total_after'] < built.attrs['compaction_report']['total_before']
+    pd.testing.assert_frame_equal(built, cached)
+
+
+def test_filtered_csv_read_is_chunked(tmp_path, monkeypatch):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+    filters = [('Order Country', 'in', ['United States', 'France'])]
+    full = load_supply_chain_data(str(csv_path), use_columnar_cache=False, compact=True)
+    expected = full[full['Order Country'].isin(['United States', 'France'])].reset_index(drop=True)
+
+    chunk_sizes = []
+    real_read_csv = pd.read_csv
+
+    def tracking_read_csv(*args, **kwargs):
+        chunk_sizes.append(kwargs.get('chunksize'))
+        return real_read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(data_loader, 'CSV_FILTER_CHUNK_SIZE', 2)
+    monkeypatch.setattr(data_loader.pd, 'read_csv', tracking_read_csv)
+    clear_cache()
+    chunked = load_supply_chain_data(str(csv_path), use_columnar_cache=False, compact=True,
+                                     columns=['Order Id', 'Order Country'], filters=filters)
+
+    assert chunk_sizes == [2]
+    assert chunked['Order Id'].tolist() == expected['Order Id'].tolist()
+    assert chunked['Order Country'].astype(str).tolist() == expected['Order Country'].astype(str).tolist()
+    # One categorical across all chunks, not a per-chunk object fallback
+    assert isinstance(chunked['Order Country'].dtype, pd.CategoricalDtype)
+
+
+def test_corrupt_store_falls_back_to_csv(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+    expected = load_supply_chain_data(str(csv_path))
+    store_dir = store_dir_for(csv_path, 'normalized')
+    for part in read_manifest(store_dir)['parts']:
+        (store_dir / part).write_bytes(b'PAR1 truncated')
+
+    clear_cache()
+    reloaded = load_supply_chain_data(str(csv_path))
+    pd.testing.assert_frame_equal(reloaded, expected)
+    assert is_store_fresh(store_dir, csv_path)
+
+    # The caller's own mistakes still surface instead of triggering a CSV re-read
+    clear_cache()
+    with pytest.raises(KeyError):
+        load_supply_chain_data(str(csv_path), filters=[('No Such Column', '==', 1)])
+    with pytest.raises(ValueError):
+        load_supply_chain_data(str(csv_path), filters=[('Sales', '~', 1)])
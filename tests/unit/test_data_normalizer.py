@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from app.services.data_normalizer import (
+    load_country_aliases,
+    normalize_country,
+    normalize_country_series,
+    normalize_dataframe,
+)
+
+
+def test_series_normalization_matches_per_value_function():
+    values = pd.Series(['EE. UU.', ' USA ', None, '', 'Francia', np.nan, 'VN', 'EE. UU.'] * 10)
+    expected = values.apply(normalize_country)
+    pd.testing.assert_series_equal(normalize_country_series(values), expected)
+
+    categorical = values.astype('category')
+    assert normalize_country_series(categorical).tolist() == expected.tolist()
+
+
+def test_dataframe_uses_alias_table_and_reports_stats(tmp_path):
+    alias_file = tmp_path / 'aliases.csv'
+    alias_file.write_text('alias,country\nFrancia,France\nEE. UU.,United States\n', encoding='utf-8')
+    mapping = load_country_aliases(str(alias_file))
+
+    df = pd.DataFrame({
+        'Order Country': ['Francia', 'EE. UU.', 'Francia', None],
+        'order date (DateOrders)': ['1/31/2018 22:56', '1/13/2018 12:27', '1/31/2018 22:56', None],
+        'Sales': [10.0, -1.0, 5.0, 2.0],
+    })
+    result, stats = normalize_dataframe(df, country_mapping=mapping, return_stats=True)
+
+    assert result['Order Country'].tolist() == ['France', 'United States', 'France', 'Unknown']
+    assert pd.api.types.is_datetime64_any_dtype(result['order date (DateOrders)'])
+    assert result['Sales'].min() == 0
+    assert stats['rows'] == 4
+    assert stats['columns']['Order Country']['unique_values'] == 2
+    assert stats['columns']['order date (DateOrders)']['unique_values'] == 2
+    assert stats['total_seconds'] >= 0
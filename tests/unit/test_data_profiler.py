@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from app.services import data_profiler
+from app.services.data_profiler import StreamingProfiler, check_data_quality, detect_outliers, profile_dataset
+from app.services.sketches import HyperLogLog, QuantileSketch
+
+
+def _sample_frame():
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'Sales': np.append(rng.normal(100, 10, 400), [500.0, -300.0]),
+        'Order Country': rng.choice(['France', 'Francia', 'EE. UU.', None], 402),
+        'order date (DateOrders)': rng.choice(['1/31/2018 22:56', 'not a date', None], 402),
+        'Customer Email': 'XXXXXXXXX',
+    })
+    return pd.concat([df, df.head(5)], ignore_index=True)
+
+
+def test_streaming_report_matches_in_memory_report():
+    df = _sample_frame()
+    expected = check_data_quality(df, 'Supply')
+    report = profile_dataset(df, 'Supply', chunksize=64).quality_report()
+
+    for key in ['total_rows', 'total_columns', 'missing_data', 'duplicate_rows',
+                'data_types', 'sensitive_columns', 'format_issues']:
+        assert report[key] == expected[key], key
+    assert report['duplicate_rows_exact']
+    assert report['country_variations']['unique_count'] == 3
+    assert set(report['country_variations']['examples']) == {'France', 'Francia', 'EE. UU.'}
+
+
+def test_streaming_outliers_match_detect_outliers_on_small_data():
+    df = _sample_frame()
+    profiler = profile_dataset(df, chunksize=100)
+
+    expected = detect_outliers(df, 'Sales')
+    outliers = profiler.outliers('Sales')
+    assert outliers['bounds'] == expected['bounds']
+    assert outliers['outliers_count'] == expected['outliers_count']
+    assert set(outliers['outliers_examples']) == set(expected['outliers_examples'])
+    assert profiler.outliers('Sales', 'zscore')['outliers_count'] == detect_outliers(df, 'Sales', 'zscore')['outliers_count']
+
+
+def test_profilers_built_on_parts_merge():
+    df = _sample_frame()
+    merged = profile_dataset(df.iloc[:200]).merge(profile_dataset(df.iloc[200:]))
+    whole = profile_dataset(df)
+
+    assert merged.quality_report()['missing_data'] == whole.quality_report()['missing_data']
+    assert merged.duplicate_rows() == whole.duplicate_rows() == 5
+    stats, expected = merged.columns['Sales'].moments, df['Sales']
+    assert np.isclose(stats.mean, expected.mean()) and np.isclose(stats.std(), expected.std())
+
+
+def test_sketches_stay_bounded_and_accurate():
+    values = np.random.default_rng(0).uniform(0, 1, 200_000)
+    sketch = QuantileSketch(k=256).update(values)
+    assert sum(len(level) for level in sketch._levels) < 256 * 20
+    assert abs(sketch.quantile(0.75) - 0.75) < 0.02
+
+    hll = HyperLogLog(p=12).update(np.arange(50_000))
+    assert abs(hll.estimate() - 50_000) / 50_000 < 0.05
+
+
+def test_streaming_profiler_switches_to_sketched_duplicates(monkeypatch):
+    monkeypatch.setattr(data_profiler, 'MAX_ROW_HASHES', 100)
+    df = _sample_frame()
+    profiler = StreamingProfiler('Supply')
+    for start in range(0, len(df), 50):
+        profiler.update(df.iloc[start:start + 50])
+
+    assert profiler.total_rows == len(df)
+    assert not profiler.duplicates_exact
+    assert not profiler.quality_report()['duplicate_rows_exact']
+    # HLL estimate of the 402 distinct rows stays close to the exact 5 duplicates
+    assert abs(profiler.duplicate_rows() - 5) <= 10
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from app.services import date_parser
+from app.services.date_parser import (
+    clear_parse_cache,
+    detect_date_format,
+    ensure_datetime,
+    parse_date_columns,
+    parse_dates,
+)
+
+
+def test_detects_dataco_format_and_parses_only_distinct_values(monkeypatch):
+    clear_parse_cache()
+    series = pd.Series(['1/31/2018 22:56', '1/13/2018 12:27', None, '1/31/2018 22:56'] * 50)
+    assert detect_date_format(series.dropna().unique()) == '%m/%d/%Y %H:%M'
+
+    calls = []
+    real_to_datetime = pd.to_datetime
+
+    def counting_to_datetime(values, *args, **kwargs):
+        calls.append(len(values))
+        return real_to_datetime(values, *args, **kwargs)
+
+    monkeypatch.setattr(date_parser.pd, 'to_datetime', counting_to_datetime)
+    parsed = parse_dates(series, fmt='%m/%d/%Y %H:%M')
+    assert calls == [2]
+    assert parsed.iloc[0] == pd.Timestamp('2018-01-31 22:56')
+    assert parsed.isna().sum() == 50
+
+    # Second call hits the unique-value cache
+    calls.clear()
+    parse_dates(series, fmt='%m/%d/%Y %H:%M')
+    assert calls == []
+
+
+def test_ensure_datetime_does_not_mutate_or_reparse():
+    df = pd.DataFrame({'order date (DateOrders)': ['2018-01-02', 'bad', '2018-03-04']})
+    dates = ensure_datetime(df, 'order date (DateOrders)')
+    assert df['order date (DateOrders)'].dtype == object
+    assert dates.isna().tolist() == [False, True, False]
+
+    parsed_df = parse_date_columns(df.copy(), ['order date (DateOrders)'])
+    assert parsed_df.attrs['date_formats'] == {'order date (DateOrders)': '%Y-%m-%d'}
+    already = parsed_df['order date (DateOrders)']
+    assert ensure_datetime(parsed_df, 'order date (DateOrders)') is already
@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.services.downsampling import downsample_time_series, lttb_indices, select_points
+
+
+def _reference_lttb(y, threshold):
+    # Straightforward per-point implementation of the published algorithm
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        avg_start, avg_end = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(range(avg_start, avg_end)) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        areas = [abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a])) for j in range(start, end)]
+        a = start + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+def test_lttb_matches_reference_and_keeps_extremes():
+    y = np.cumsum(np.random.default_rng(0).normal(size=3000))
+    y[1234] = 1000.0  # a spike must survive
+    indices = lttb_indices(y, 200)
+    assert indices.tolist() == _reference_lttb(y.tolist(), 200)
+    assert 1234 in indices and indices[0] == 0 and indices[-1] == len(y) - 1
+    assert lttb_indices(y[:50], 200).tolist() == list(range(50))
+    assert len(select_points([y, -y, y ** 2], 90)) <= 90
+
+
+def test_time_series_keeps_shared_labels_without_mutating_input():
+    labels = [str(day) for day in range(1000)]
+    rng = np.random.default_rng(1)
+    time_series = {
+        'sales': dict(zip(labels, rng.gamma(2.0, 100.0, 1000).tolist())),
+        'orders_count': dict(zip(labels, rng.integers(0, 50, 1000).tolist())),
+        'error_bounds': {'orders_count': 0.03},
+    }
+    snapshot = {name: dict(values) for name, values in time_series.items()}
+
+    downsampled = downsample_time_series(time_series, 100)
+    assert 2 < len(downsampled['sales']) <= 100
+    assert list(downsampled['sales']) == list(downsampled['orders_count'])
+    assert list(downsampled['sales'])[0] == '0' and list(downsampled['sales'])[-1] == '999'
+    assert downsampled['error_bounds'] == {'orders_count': 0.03}
+    assert time_series == snapshot
+    assert downsample_time_series(time_series, 0) is time_series
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from app.services.analytics import calculate_supply_chain_kpis, get_top_countries
+from modules.data_pipeline.dtype_compaction import compact_dataframe, reset_shared_dictionaries
+
+
+def _frame():
+    return pd.DataFrame({
+        'Order Country': ['France', 'Mexico', 'France', 'Mexico'] * 50,
+        'Delivery Status': ['Late delivery', 'Shipping on time'] * 100,
+        'Order Id': np.arange(200, dtype='int64'),
+        'Late_delivery_risk': [1, 0] * 100,
+        'Days for shipping (real)': np.array([3.0, 5.0] * 100),
+        'Sales': np.linspace(0.1, 999.9, 200),
+        'Benefit per order': np.array([1.5, -2.25] * 100),
+    })
+
+
+def test_compaction_reports_bytes_and_keeps_values():
+    reset_shared_dictionaries()
+    df = _frame()
+    compact, report = compact_dataframe(df)
+
+    assert isinstance(compact['Order Country'].dtype, pd.CategoricalDtype)
+    assert compact['Late_delivery_risk'].dtype == np.int8
+    assert compact['Order Id'].dtype == np.int16
+    # Whole-valued floats stay floating (float32 is lossless here)
+    assert compact['Days for shipping (real)'].dtype == np.float32
+    assert compact['Benefit per order'].dtype == np.float32
+    # Not representable in float32 without loss: stays float64
+    assert compact['Sales'].dtype == np.float64
+    assert report['total_after'] < report['total_before']
+    assert report['columns']['Order Country']['bytes_after'] < report['columns']['Order Country']['bytes_before']
+    assert calculate_supply_chain_kpis.__wrapped__(compact) == calculate_supply_chain_kpis.__wrapped__(df)
+    assert get_top_countries.__wrapped__(compact) == get_top_countries.__wrapped__(df)
+
+
+def test_shared_dictionary_is_stable_across_frames():
+    reset_shared_dictionaries()
+    first, _ = compact_dataframe(pd.DataFrame({'Order Country': ['Mexico', 'France']}))
+    second, _ = compact_dataframe(pd.DataFrame({'Country': ['Viet Nam', 'France']}))
+
+    assert list(first['Order Country'].cat.categories) == ['France', 'Mexico']
+    assert list(second['Country'].cat.categories) == ['France', 'Mexico', 'Viet Nam']
+    assert second['Country'].cat.codes.tolist() == [2, 0]
+
+
+def test_whole_valued_floats_do_not_overflow_in_arithmetic():
+    df = pd.DataFrame({'Product Price': [100.0, 120.0, 127.0], 'Order Item Quantity': [1.0, 2.0, 3.0]})
+    compact, _ = compact_dataframe(df)
+
+    assert pd.api.types.is_float_dtype(compact['Product Price'])
+    assert pd.api.types.is_float_dtype(compact['Order Item Quantity'])
+    assert (compact['Product Price'] * 2).tolist() == [200.0, 240.0, 254.0]
+    assert (compact['Product Price'] * compact['Order Item Quantity']).tolist() == [100.0, 240.0, 381.0]
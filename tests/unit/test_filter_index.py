@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.cache_manager import frame_token, tag_frame
+from app.services.filter_index import FilterIndex, filter_rows
+
+
+def _frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Order Country': rng.choice(['France', 'Mexico', 'Brasil', None], n),
+        'Category Name': pd.Categorical(rng.choice(['Cleats', 'Fishing', 'Golf'], n)),
+        'Delivery Status': rng.choice(['Late delivery', 'Shipping on time'], n),
+        'order date (DateOrders)': pd.Timestamp('2017-01-01')
+        + pd.to_timedelta(rng.integers(0, 400 * 24 * 60, n), unit='min'),
+        'Sales': rng.random(n),
+    })
+    df.loc[rng.choice(n, 40), 'order date (DateOrders)'] = pd.NaT
+    return df
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'country': 'France'},
+    {'country': 'France', 'category': 'Golf', 'delivery_status': 'Late delivery'},
+    {'category': 'Fishing', 'start_date': '2017-03-01', 'end_date': '2017-06-30'},
+    {'end_date': '2017-02-01'},
+    {'country': 'Atlantis'},
+])
+def test_select_matches_boolean_masks(filters):
+    df = _frame()
+    mask = pd.Series(True, index=df.index)
+    for name, column in (('country', 'Order Country'), ('category', 'Category Name'),
+                         ('delivery_status', 'Delivery Status')):
+        if filters.get(name):
+            mask &= df[column] == filters[name]
+    dates = df['order date (DateOrders)']
+    if filters.get('start_date'):
+        mask &= dates >= pd.to_datetime(filters['start_date'])
+    if filters.get('end_date'):
+        mask &= dates <= pd.to_datetime(filters['end_date'])
+
+    positions = FilterIndex(df).select(**filters)
+    np.testing.assert_array_equal(positions, np.flatnonzero(mask.to_numpy()))
+
+
+def test_filter_rows_tags_subset_with_stable_token():
+    df = tag_frame(_frame(), 'supply-v1')
+    first = filter_rows(df, ['Order Country', 'Sales'], country='Mexico')
+    second = filter_rows(df, ['Order Country', 'Sales'], country='Mexico')
+
+    assert list(first.columns) == ['Order Country', 'Sales']
+    assert (first['Order Country'] == 'Mexico').all()
+    assert frame_token(first) == frame_token(second) is not None
+    assert frame_token(filter_rows(df, ['Sales'], country='France')) != frame_token(first)
@@ -0,0 +1,93 @@
+import pandas as pd
+
+from modules.data_pipeline.global_dataset_loader import load_global_dataset
+
+
+def _write_global_csv(path):
+    pd.DataFrame({
+        'Country': ['FR', 'VN', 'FR', 'US'],
+        'City': ['paris', 'hanoi', 'lyon', 'austin'],
+        'region_detected': ['eu', 'APAC', 'EU', 'NA'],
+        'record_date': ['2017-03-02', '2017-03-01', '2017-04-10', '2017-03-05'],
+        'Sales': [10.0, 20.0, 30.0, 40.0],
+        'temperature_2m_mean': [12.0, None, 14.0, 25.0],
+        'Late_delivery_risk': [0, 1, 1, 0],
+    }).to_csv(path, index=False)
+
+
+def test_projection_and_region_filter(tmp_path):
+    csv_path = tmp_path / 'merged.csv'
+    _write_global_csv(csv_path)
+
+    df = load_global_dataset(str(csv_path), columns=['Region', 'Sales'], filters=[('Region', '==', 'EU')])
+
+    assert list(df.columns) == ['Region', 'Sales']
+    assert df['Sales'].tolist() == [10.0, 30.0]
+
+
+def test_date_filter_matches_full_load(tmp_path):
+    csv_path = tmp_path / 'merged.csv'
+    _write_global_csv(csv_path)
+
+    full = load_global_dataset(str(csv_path), use_columnar_cache=False)
+    sliced = load_global_dataset(str(csv_path), filters=[('record_date', '<', '2017-04-01')],
+                                 use_columnar_cache=False)
+
+    # Imputation uses full-dataset medians: Hanoi gets median(12, 14, 25), not the slice's 18.5
+    expected = full[full['record_date'] < '2017-04-01'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(sliced, expected)
+    assert full['City'].tolist()[0] == 'Hanoi'
+    assert sliced['temperature_2m_mean'].tolist()[0] == 14.0
+
+
+def test_partitioned_store_reads_only_matching_partitions(tmp_path, monkeypatch):
+    from modules.data_pipeline import columnar_store
+
+    csv_path = tmp_path / 'merged.csv'
+    _write_global_csv(csv_path)
+    full = load_global_dataset(str(csv_path))
+
+    store_dir = columnar_store.store_dir_for(csv_path, 'partitioned')
+    assert (store_dir / 'region=EU' / 'month=2017-04').is_dir()
+
+    opened = []
+    real_read_parquet = pd.read_parquet
+
+    def _tracking_read_parquet(path, *args, **kwargs):
+        opened.append(path)
+        return real_read_parquet(path, *args, **kwargs)
+
+    monkeypatch.setattr(columnar_store.pd, 'read_parquet', _tracking_read_parquet)
+    sliced = load_global_dataset(
+        str(csv_path), filters=[('Region', '==', 'EU'), ('record_date', '>=', '2017-04-01')]
+    )
+
+    assert len(opened) == 1 and 'region=EU' in opened[0] and 'month=2017-04' in opened[0]
+    expected = full[(full['Region'] == 'EU') & (full['record_date'] >= '2017-04-01')].reset_index(drop=True)
+    pd.testing.assert_frame_equal(sliced.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_chunked_filter_matches_full_load_with_missing_dates(tmp_path, monkeypatch):
+    from modules.data_pipeline import global_dataset_loader
+
+    csv_path = tmp_path / 'merged.csv'
+    pd.DataFrame({
+        'Country': ['FR', 'VN', 'FR', 'US', 'FR', 'VN'],
+        'City': ['paris', 'hanoi', 'lyon', 'austin', 'nice', 'hue'],
+        'region_detected': ['EU', 'APAC', 'EU', 'NA', 'EU', 'APAC'],
+        'record_date': [None, '2017-03-01', '2017-03-04', None, None, '2017-05-01'],
+        'Sales': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'temperature_2m_mean': [None, 30.0, 10.0, 20.0, None, None],
+    }).to_csv(csv_path, index=False)
+    monkeypatch.setattr(global_dataset_loader, 'FILTER_CHUNK_SIZE', 2)
+
+    full = load_global_dataset(str(csv_path))
+    filters = [('Region', 'in', ['EU', 'APAC']), ('record_date', '>=', '2017-03-02')]
+    expected = full[full['Region'].isin(['EU', 'APAC']) & (full['record_date'] >= '2017-03-02')].reset_index(drop=True)
+
+    # The store written by the full load supplies the medians; without it they come from the CSV
+    from_manifest = load_global_dataset(str(csv_path), filters=filters, use_columnar_cache=False)
+    pd.testing.assert_frame_equal(from_manifest, expected)
+    monkeypatch.setattr(global_dataset_loader, 'is_store_fresh', lambda *args: False)
+    from_csv = load_global_dataset(str(csv_path), filters=filters)
+    pd.testing.assert_frame_equal(from_csv, expected)
@@ -0,0 +1,139 @@
+import pandas as pd
+
+from app.services.cache_manager import clear_cache
+from app.services.data_loader import (
+    catch_up_supply_chain,
+    ingest_supply_chain_appends,
+    load_supply_chain_data,
+    supply_chain_store_build,
+)
+from modules.data_pipeline.columnar_store import read_manifest, store_dir_for
+from modules.data_pipeline.global_dataset_loader import (
+    catch_up_global,
+    global_store_build,
+    ingest_global_appends,
+    load_global_dataset,
+)
+from modules.data_pipeline.incremental_ingest import apply_delta, register_delta_listener, unregister_delta_listener
+from tests.unit.test_columnar_cache import _write_supply_csv
+
+
+def _append_lines(path, lines, encoding='latin-1'):
+    with open(path, 'a', encoding=encoding, newline='') as handle:
+        handle.write(''.join(line + '\n' for line in lines))
+
+
+def test_supply_chain_appends_only_parse_new_rows(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+    load_supply_chain_data(str(csv_path), compact=True)
+
+    received = []
+    listener = register_delta_listener('supply_chain', received.append)
+    try:
+        _append_lines(csv_path, ['7,Francia,Golf,4/2/2018 8:30,60.0,1', '8,USA,Cleats,4/3/2018 9:45,70.0,0'])
+        delta = ingest_supply_chain_appends(str(csv_path), compact=True)
+    finally:
+        unregister_delta_listener('supply_chain', listener)
+
+    assert received == [delta]
+    assert delta.start_row == 6
+    assert delta.rows['Order Id'].tolist() == [7, 8]
+    assert delta.rows['Order Country'].tolist() == ['Francia', 'United States']
+    assert delta.watermark['max_date'] == '2018-04-03T09:45:00'
+
+    store_dir = store_dir_for(csv_path, 'normalized-compact')
+    assert read_manifest(store_dir)['parts'] == ['part-00000.parquet', 'part-00001.parquet']
+
+    incremental = load_supply_chain_data(str(csv_path), compact=True)
+    assert isinstance(incremental['Order Country'].dtype, pd.CategoricalDtype)
+    full = load_supply_chain_data(str(csv_path), use_columnar_cache=False)
+    pd.testing.assert_frame_equal(
+        incremental.astype({col: full[col].dtype for col in full.columns}), full, check_exact=False
+    )
+
+    # Nothing new: empty delta, no new part
+    assert ingest_supply_chain_appends(str(csv_path), compact=True).empty
+    assert len(read_manifest(store_dir)['parts']) == 2
+
+
+def test_rewritten_source_triggers_rebuild(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path, rows=6)
+    load_supply_chain_data(str(csv_path))
+
+    _write_supply_csv(csv_path, rows=5)
+    _append_lines(csv_path, ['9,USA,Golf,5/1/2018 10:00,10.0,0', '10,USA,Golf,5/2/2018 10:00,10.0,0'])
+
+    assert ingest_supply_chain_appends(str(csv_path)) is None
+    manifest = read_manifest(store_dir_for(csv_path, 'normalized'))
+    assert manifest['rows'] == 7
+    assert manifest['parts'] == ['part-00000.parquet']
+
+
+def test_global_appends_use_stored_medians(tmp_path):
+    csv_path = tmp_path / 'merged.csv'
+    pd.DataFrame({
+        'Country': ['FR', 'FR', 'US'],
+        'City': ['paris', 'lyon', 'austin'],
+        'region_detected': ['EU', 'EU', 'NA'],
+        'record_date': ['2017-03-02', '2017-03-04', '2017-03-05'],
+        'temperature_2m_mean': [10.0, 14.0, 25.0],
+    }).to_csv(csv_path, index=False)
+    load_global_dataset(str(csv_path))
+
+    _append_lines(csv_path, ['DE,berlin,EU,2017-03-01,', 'US,boston,NA,2017-03-06,20.0'], encoding='utf-8')
+    delta = ingest_global_appends(str(csv_path))
+
+    assert delta.rows['temperature_2m_mean'].tolist() == [12.0, 20.0]
+    df = load_global_dataset(str(csv_path))
+    assert df['City'].tolist() == ['Berlin', 'Paris', 'Lyon', 'Austin', 'Boston']
+
+
+def test_frames_loaded_before_another_process_ingested_catch_up(tmp_path):
+    clear_cache()
+    csv_path = tmp_path / 'DataCoSupplyChainDataset.csv'
+    _write_supply_csv(csv_path)
+    cached = load_supply_chain_data(str(csv_path), compact=True)
+    build = supply_chain_store_build(str(csv_path), compact=True)
+
+    # CSV grew but nobody ingested yet: the store no longer covers it
+    _append_lines(csv_path, ['7,Francia,Golf,4/2/2018 8:30,60.0,1', '8,USA,Cleats,4/3/2018 9:45,70.0,0'])
+    assert catch_up_supply_chain(len(cached), build, str(csv_path), compact=True) is None
+
+    # The nightly script ingests in its own process, so no listener of ours runs
+    ingest_supply_chain_appends(str(csv_path), compact=True)
+    delta = catch_up_supply_chain(len(cached), build, str(csv_path), compact=True)
+    assert delta.rows['Order Id'].tolist() == [7, 8]
+    clear_cache()
+    pd.testing.assert_frame_equal(apply_delta(cached, delta), load_supply_chain_data(str(csv_path), compact=True))
+    assert catch_up_supply_chain(len(cached) + 2, build, str(csv_path), compact=True).empty
+
+    # A rewritten CSV means a rebuilt store: reload instead of catching up
+    _write_supply_csv(csv_path, rows=5)
+    clear_cache()
+    load_supply_chain_data(str(csv_path), compact=True)
+    assert catch_up_supply_chain(len(cached) + 2, build, str(csv_path), compact=True) is None
+
+
+def test_global_frame_catches_up_with_partitioned_appends(tmp_path):
+    csv_path = tmp_path / 'merged.csv'
+    pd.DataFrame({
+        'Country': ['FR', 'VN'],
+        'City': ['paris', 'hanoi'],
+        'region_detected': ['EU', 'APAC'],
+        'record_date': ['2017-03-02', '2017-03-05'],
+        'temperature_2m_mean': [10.0, 25.0],
+    }).to_csv(csv_path, index=False)
+    cached = load_global_dataset(str(csv_path))
+    build = global_store_build(str(csv_path))
+
+    _append_lines(csv_path, ['DE,berlin,EU,2017-04-01,', 'VN,hue,APAC,2017-03-06,20.0'], encoding='utf-8')
+    ingest_global_appends(str(csv_path))
+    delta = catch_up_global(len(cached), build, str(csv_path))
+
+    assert sorted(delta.rows['City'].tolist()) == ['Berlin', 'Hue']
+    caught_up = apply_delta(cached, delta).sort_values('record_date', kind='stable', ignore_index=True)
+    pd.testing.assert_frame_equal(caught_up, load_global_dataset(str(csv_path)))
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.join_index import SupplyWeatherJoin
+
+
+def _frames(seed=0):
+    rng = np.random.default_rng(seed)
+    supply = pd.DataFrame({
+        'Order Customer Id': rng.integers(0, 50, 2000).astype(np.int32),
+        'order date (DateOrders)': pd.Timestamp('2017-01-01')
+        + pd.to_timedelta(rng.integers(0, 30 * 1440, 2000), unit='min'),
+        'Late_delivery_risk': rng.integers(0, 2, 2000),
+    })
+    supply.loc[::50, 'order date (DateOrders)'] = pd.NaT
+    # Duplicate (customer, day) keys on the weather side give several pairs per supply row
+    weather = pd.DataFrame({
+        'customer_id': rng.integers(0, 50, 900),
+        'order_date': (pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 30, 900), unit='D')).astype(str),
+        'temperature_2m_mean': rng.normal(15.0, 8.0, 900),
+    })
+    return supply, weather
+
+
+def test_join_pairs_match_inner_merge():
+    supply, weather = _frames()
+    join = SupplyWeatherJoin(supply, weather)
+
+    merged = supply.reset_index().assign(day=supply['order date (DateOrders)'].dt.normalize()).dropna(
+        subset=['day']
+    ).merge(
+        weather.reset_index().assign(day=pd.to_datetime(weather['order_date'])),
+        left_on=['Order Customer Id', 'day'], right_on=['customer_id', 'day'], suffixes=('_supply', '_weather'),
+    )
+    expected = sorted(zip(merged['index_supply'], merged['index_weather']))
+    assert sorted(zip(join.supply_positions, join.weather_positions)) == expected
+    assert join.merge_rate == pytest.approx(len(merged) / len(supply) * 100)
+
+    aligned = join.aligned(supply, weather)
+    assert aligned.correlation('Late_delivery_risk', 'temperature_2m_mean') == pytest.approx(
+        merged['Late_delivery_risk'].corr(merged['temperature_2m_mean'])
+    )
+
+
+def test_join_without_key_columns_is_unavailable():
+    supply, weather = _frames()
+    join = SupplyWeatherJoin(supply.drop(columns=['Order Customer Id']), weather)
+    assert not join.available and len(join) == 0
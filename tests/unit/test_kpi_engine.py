@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.kpi_engine import Metric, compute, plan
+
+
+def _frame(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'country': rng.choice(['France', 'Mexico', None], n),
+        'status': pd.Categorical(rng.choice(['Late delivery', 'Shipping on time'], n)),
+        'sales': np.where(rng.random(n) < 0.1, np.nan, rng.normal(100.0, 30.0, n)),
+        'late': rng.integers(0, 2, n),
+        'date': pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 10 ** 6, n), unit='min'),
+    })
+    df.loc[::9, 'date'] = pd.NaT
+    return df
+
+
+def test_plan_shares_primitives_per_grouping():
+    by = ('country',)
+    passes = plan([
+        Metric('sales_mean', 'mean', 'sales', by),
+        Metric('sales_sum', 'sum', 'sales', by),
+        Metric('sales_std', 'std', 'sales', by),
+        Metric('rows', 'size', by=by),
+        Metric('total', 'sum', 'sales'),
+    ])
+    assert [scan.by for scan in passes] == [by, ()]
+    assert passes[0].primitives == [('sum', 'sales'), ('count', 'sales'), ('sumsq', 'sales'), ('size', None)]
+    with pytest.raises(ValueError):
+        Metric('bad', 'median', 'sales')
+
+
+def test_compute_matches_pandas_without_mutating_input():
+    df = _frame()
+    snapshot = df.copy()
+    by = ('country', 'status')
+    result = compute(df, [
+        Metric('rows', 'size', by=by),
+        Metric('sales_sum', 'sum', 'sales', by),
+        Metric('sales_mean', 'mean', 'sales', by),
+        Metric('sales_std', 'std', 'sales', by),
+        Metric('late', 'sum', 'late', by),
+        Metric('first', 'min', 'date', by),
+        Metric('last', 'max', 'date', by),
+        Metric('late_rate', 'mean', 'late'),
+        Metric('missing_dates', 'missing', 'date'),
+        Metric('missing_column', 'sum', 'not_there'),
+    ])
+
+    expected = df.groupby(list(by), dropna=False, observed=True, sort=False).agg(
+        rows=('sales', 'size'), sales_sum=('sales', 'sum'), sales_mean=('sales', 'mean'),
+        sales_std=('sales', 'std'), late=('late', 'sum'), first=('date', 'min'), last=('date', 'max'),
+    ).reset_index()
+    table = result.table(by)
+    assert result.passes == 2
+    assert table['country'].fillna('-').tolist() == expected['country'].fillna('-').tolist()
+    measures = ['sales_sum', 'sales_mean', 'sales_std']
+    np.testing.assert_allclose(table[measures], expected[measures])
+    np.testing.assert_array_equal(table['rows'], expected['rows'])
+    np.testing.assert_array_equal(table['late'], expected['late'])
+    np.testing.assert_array_equal(table['first'], expected['first'])
+    np.testing.assert_array_equal(table['last'], expected['last'])
+
+    assert result['late_rate'] == pytest.approx(df['late'].mean())
+    assert result['missing_dates'] == df['date'].isna().sum()
+    assert 'missing_column' not in result.scalars
+    pd.testing.assert_frame_equal(df, snapshot)
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.sections import run_sections
+
+
+def test_sections_run_concurrently_off_the_event_loop():
+    def slow(value, seconds):
+        return lambda: (time.sleep(seconds), value)[1]
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results, timed_out = await run_sections(
+            {'a': slow(1, 0.3), 'b': slow(2, 0.3), 'late': slow(3, 2.0)},
+            defaults={'late': 'fallback'},
+            timeouts={'late': 0.5},
+        )
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        return results, timed_out, elapsed, ticks
+
+    results, timed_out, elapsed, ticks = asyncio.run(main())
+    assert results == {'a': 1, 'b': 2, 'late': 'fallback'}
+    assert timed_out == ['late']
+    assert elapsed < 1.0  # slowest finished section is 0.3s, the late one is cut at 0.5s
+    assert len(ticks) > 20  # event loop kept running while sections slept in threads
+
+
+def test_section_errors_propagate():
+    def broken():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_sections({'ok': lambda: 1, 'broken': broken}))
+
+
+def test_abandoned_sections_do_not_starve_blocking_work():
+    from app.services.sections import DEFAULT_SECTION_WORKERS, run_blocking
+
+    async def main():
+        slow = {f's{i}': (lambda: time.sleep(1.0)) for i in range(DEFAULT_SECTION_WORKERS * 2)}
+        _, timed_out = await run_sections(slow, timeout=0.05)
+        start = time.perf_counter()
+        value = await run_blocking(lambda: 'loaded')
+        return timed_out, value, time.perf_counter() - start
+
+    timed_out, value, elapsed = asyncio.run(main())
+    assert len(timed_out) == DEFAULT_SECTION_WORKERS * 2
+    assert value == 'loaded' and elapsed < 0.5  # section pool is still busy with the abandoned work
+
+
+def test_timeout_counts_from_when_a_section_starts(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services import sections as sections_module
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(sections_module, '_section_executor', pool)
+    ran = []
+
+    def work(name, seconds):
+        return lambda: (ran.append(name), time.sleep(seconds), name)[2]
+
+    # Four 0.2s sections on two threads: the second pair queues for 0.2s but still fits 0.3s once started
+    results, timed_out = asyncio.run(run_sections({f'q{i}': work(f'q{i}', 0.2) for i in range(4)}, timeout=0.3))
+    assert timed_out == [] and results == {f'q{i}': f'q{i}' for i in range(4)}
+
+    # Sections still queued when their timeout expires are cancelled and never run
+    ran.clear()
+    blockers = {f'b{i}': work(f'b{i}', 0.5) for i in range(2)}
+    queued = {f'w{i}': work(f'w{i}', 0.01) for i in range(3)}
+    _, timed_out = asyncio.run(run_sections({**blockers, **queued}, timeout=0.1))
+    pool.shutdown(wait=True)
+    assert sorted(timed_out) == ['b0', 'b1', 'w0', 'w1', 'w2']
+    assert sorted(ran) == ['b0', 'b1']
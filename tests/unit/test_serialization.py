@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from app.services.serialization import largest_positions, to_records
+
+
+def test_to_records_converts_columns_and_missing_values():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2017-01-02 03:04:05', None]),
+        'sales': [1.5, np.nan],
+        'late': pd.array([1, None], dtype='Int64'),
+        'id': [7, 8],
+        'name': ['a', None],
+    })
+    records = to_records(df, {'id': 'str', 'late': 'int'}, rename={'sales': 'value'})
+
+    assert records == [
+        {'date': '2017-01-02 03:04:05', 'value': 1.5, 'late': 1, 'id': '7', 'name': 'a'},
+        {'date': None, 'value': None, 'late': None, 'id': '8', 'name': None},
+    ]
+    assert type(records[0]['late']) is int and type(records[0]['value']) is float
+    assert to_records(pd.DataFrame({'x': ['2.5', 'n/a']}), default='float') == [{'x': 2.5}, {'x': 0.0}]
+
+
+def test_largest_positions_matches_descending_sort():
+    rng = np.random.default_rng(0)
+    dates = pd.Series(pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 500, 2000), unit='h'))
+    dates[rng.choice(2000, 30)] = pd.NaT
+    expected = dates.sort_values(ascending=False, na_position='last', kind='stable').index[:25]
+    np.testing.assert_array_equal(largest_positions(dates.to_numpy(), 25), expected)
+
+    values = np.array([3.0, np.nan, 5.0, 3.0, 1.0])
+    np.testing.assert_array_equal(largest_positions(values, 10), [2, 0, 3, 4, 1])
+    assert len(largest_positions(values, 0)) == 0
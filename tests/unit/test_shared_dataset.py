@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from modules.data_pipeline import shared_dataset
+
+
+def test_segment_is_built_once_and_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setenv(shared_dataset.DIR_ENV, str(tmp_path))
+    shared_dataset.detach()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({'Sales': np.arange(5, dtype='float64'), 'Order Country': list('abcde')})
+
+    first = shared_dataset.get_or_build('unit', 'token-1', build)
+    shared_dataset.detach()
+    second = shared_dataset.get_or_build('unit', 'token-1', build)
+
+    assert calls == [1]
+    assert second['Sales'].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert second['Order Country'].tolist() == list('abcde')
+    # Numeric columns are read-only views over the mapping, not private copies
+    assert not second['Sales'].to_numpy().flags.writeable
+    assert first['Sales'].sum() == second['Sales'].sum()
+
+
+def test_new_token_rebuilds_segment(tmp_path, monkeypatch):
+    monkeypatch.setenv(shared_dataset.DIR_ENV, str(tmp_path))
+    shared_dataset.detach()
+
+    shared_dataset.get_or_build('unit', 'aaaa', lambda: pd.DataFrame({'x': [1]}))
+    df = shared_dataset.get_or_build('unit', 'bbbb', lambda: pd.DataFrame({'x': [2]}))
+
+    assert df['x'].tolist() == [2]
+    assert [p.name for p in tmp_path.glob('unit-*.arrow')] == ['unit-bbbb.arrow']
+
+
+def test_attached_frame_keeps_loader_dtypes(tmp_path, monkeypatch):
+    monkeypatch.setenv(shared_dataset.DIR_ENV, str(tmp_path))
+    shared_dataset.detach()
+    df = pd.DataFrame({
+        'Order Id': np.arange(4, dtype='int32'),
+        'Sales': [1.0, None, 3.0, 4.0],
+        'Customer Fname': ['Ann', None, 'Bo', 'Cy'],
+        'Order Country': pd.Categorical(['France', 'Mexico', 'France', None]),
+        'order date (DateOrders)': pd.to_datetime(['2017-01-01', None, '2017-01-03', '2017-01-04']),
+    })
+
+    shared = shared_dataset.get_or_build('dtypes', 'token-1', lambda: df)
+
+    pd.testing.assert_frame_equal(shared, df)
+    assert not shared['Order Country'].cat.codes.to_numpy().flags.writeable  # codes stay shared